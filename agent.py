@@ -0,0 +1,175 @@
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import requests
+
+from services.container_metrics import ContainerMetrics, container_tags
+from services.docker_stats import DockerStatsCollector
+from services.ingest_format import MSGPACK_AVAILABLE, encode_payload
+from services.system_sampler import system_sampler
+
+AGENT_INTERVAL = float(os.environ.get("AGENT_INTERVAL", 5.0))
+AGENT_BUFFER_TICKS = int(os.environ.get("AGENT_BUFFER_TICKS", 720))
+# Points par requête, sous le plafond serveur (INGEST_MAX_POINTS, 5000 par défaut)
+AGENT_MAX_POINTS = int(os.environ.get("AGENT_MAX_POINTS", 1000))
+# 4xx qui ne dépendent pas du lot : réessayés tels quels (les autres 4xx rejettent le lot lui-même)
+RETRYABLE_STATUS = (401, 403, 408, 429)
+
+
+class PushAgent:
+    """Agent sans Flask : échantillonne avec les collecteurs du serveur et pousse vers /api/ingest.
+
+    Une session HTTP keep-alive unique sert tous les envois. Si le serveur est
+    injoignable, les ticks restent en mémoire (au plus `buffer_ticks`, les plus
+    anciens sont abandonnés) et repartent au retour du serveur, en lots d'au plus
+    `max_points` points. Un lot refusé (4xx) est coupé en deux ; un tick seul
+    refusé est abandonné, pour ne jamais bloquer la file.
+    """
+
+    def __init__(self, server: str, token: str, host: Optional[str] = None, interval: float = AGENT_INTERVAL,
+                 encoding: str = "auto", docker_client=None, buffer_ticks: int = AGENT_BUFFER_TICKS,
+                 timeout: float = 10.0, session: Optional[requests.Session] = None,
+                 max_points: int = AGENT_MAX_POINTS):
+        self.url = server.rstrip("/") + "/api/ingest"
+        self.host = host or socket.gethostname()
+        self.interval = interval
+        if encoding == "auto":
+            encoding = "msgpack" if MSGPACK_AVAILABLE else "json"
+        self.encoding = encoding
+        self.timeout = timeout
+        self.max_points = max(1, max_points)
+        self.session = session or requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {token}"
+        self.docker = DockerStatsCollector(docker_client) if docker_client else None
+        self.container_metrics = ContainerMetrics()
+        self.buffer: deque = deque(maxlen=max(1, buffer_ticks))
+        self._stop = threading.Event()
+        self.pushed_ticks = 0
+        self.failed_pushes = 0
+        self.dropped_ticks = 0
+
+    def collect_once(self):
+        now = time.time()
+        snapshot = system_sampler.sample()
+        tick = {"system": [now, {k: v for k, v in snapshot.items() if k != "timestamp"}]}
+        if self.docker:
+            # Le tag host est ajouté par le serveur ; image / projet compose viennent de l'agent
+            meta = {c.name: container_tags(c) for c in self.docker.containers()}
+            samples = self.docker.snapshot()
+            tick["docker"] = [[now, name, self.container_metrics.compute(name, stats), meta.get(name, {})]
+                              for name, stats in samples]
+            self.container_metrics.retain(name for name, _ in samples)
+        self.buffer.append(tick)
+
+    def build_payload(self, ticks) -> dict:
+        payload = {"host": self.host, "system": [t["system"] for t in ticks]}
+        if self.docker:
+            payload["docker"] = [entry for t in ticks for entry in t.get("docker", [])]
+        return payload
+
+    def chunks(self, ticks):
+        """Découpe les ticks en lots d'au plus `max_points` points (un tick n'est jamais coupé)."""
+        chunk, points = [], 0
+        for tick in ticks:
+            n = 1 + len(tick.get("docker", ()))
+            if chunk and points + n > self.max_points:
+                yield chunk
+                chunk, points = [], 0
+            chunk.append(tick)
+            points += n
+        if chunk:
+            yield chunk
+
+    def push(self) -> bool:
+        if not self.buffer:
+            return True
+        pending = list(self.chunks(list(self.buffer)))
+        while pending:
+            ticks = pending.pop(0)
+            body, content_type = encode_payload(self.build_payload(ticks), self.encoding)
+            try:
+                resp = self.session.post(self.url, data=body, headers={"Content-Type": content_type}, timeout=self.timeout)
+                if resp.status_code >= 500 or resp.status_code in RETRYABLE_STATUS:
+                    resp.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                self.failed_pushes += 1
+                print(f"[agent] envoi échoué ({len(self.buffer)} ticks en attente): {e}")
+                return False
+            if resp.status_code >= 400:
+                if len(ticks) > 1:
+                    # Lot refusé : chaque moitié est renvoyée séparément
+                    half = len(ticks) // 2
+                    pending[:0] = [ticks[:half], ticks[half:]]
+                    continue
+                self.dropped_ticks += 1
+                print(f"[agent] tick refusé par le serveur ({resp.status_code}), abandonné")
+            else:
+                self.pushed_ticks += len(ticks)
+            # Seuls les ticks traités sont retirés ; ceux collectés entre-temps restent
+            for _ in ticks:
+                self.buffer.popleft()
+        return True
+
+    def run(self):
+        if self.docker:
+            self.docker.start()
+        # Amorce cpu_percent(interval=None) et les compteurs de débit
+        system_sampler.sample()
+        next_tick = time.monotonic() + self.interval
+        try:
+            while not self._stop.wait(max(0.0, next_tick - time.monotonic())):
+                next_tick += self.interval
+                try:
+                    self.collect_once()
+                except Exception as e:
+                    print(f"[agent] collecte: {e}")
+                self.push()
+                if next_tick < time.monotonic():
+                    next_tick = time.monotonic() + self.interval
+        finally:
+            if self.docker:
+                self.docker.stop()
+
+    def stop(self):
+        self._stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent SkyMonitor : pousse les métriques locales vers le serveur central")
+    parser.add_argument("--server", default=os.environ.get("SKYMONITOR_SERVER"), help="URL du serveur, ex: http://monitor:5000")
+    parser.add_argument("--token", default=os.environ.get("INGEST_TOKEN"), help="Jeton d'ingestion (INGEST_TOKEN du serveur)")
+    parser.add_argument("--host", default=os.environ.get("HOSTNAME"), help="Nom d'hôte rapporté")
+    parser.add_argument("--interval", type=float, default=AGENT_INTERVAL, help="Secondes entre deux échantillons")
+    parser.add_argument("--encoding", choices=("auto", "json", "msgpack"), default="auto", help="Encodage des lots")
+    parser.add_argument("--docker", action="store_true", help="Collecter aussi les conteneurs Docker locaux")
+    args = parser.parse_args()
+
+    if not args.server or not args.token:
+        print("[!] --server et --token (ou SKYMONITOR_SERVER / INGEST_TOKEN) sont requis")
+        sys.exit(1)
+
+    docker_client = None
+    if args.docker:
+        try:
+            import docker
+            docker_client = docker.from_env()
+        except Exception as e:
+            print(f"[!] Docker indisponible: {e}")
+
+    agent = PushAgent(args.server, args.token, host=args.host, interval=args.interval,
+                      encoding=args.encoding, docker_client=docker_client)
+    print(f"[i] Agent {agent.host} -> {agent.url} toutes les {agent.interval:g}s ({agent.encoding})")
+    try:
+        agent.run()
+    except KeyboardInterrupt:
+        agent.stop()
+
+
+if __name__ == "__main__":
+    main()
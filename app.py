@@ -1,7 +1,16 @@
-from flask import Flask, render_template, jsonify, request, send_from_directory, redirect, url_for
-from flask_socketio import SocketIO
+import time
+# Début de l'import : référence de la mesure du démarrage à froid
+IMPORT_STARTED = time.time()
+
+# Mode eventlet/gevent : le monkey patching doit précéder les autres imports
+from services.runtime import ASYNC_MODE, monkey_patch, acquire_collector_lock
+monkey_patch()
+
+from flask import Flask, render_template, jsonify, request, redirect, url_for, has_request_context, g, Response
+from flask_socketio import SocketIO, join_room, leave_room
 from flask_login import LoginManager, login_user, logout_user, login_required, UserMixin, current_user
 import psutil
+import hmac
 import logging
 import os
 from dotenv import load_dotenv
@@ -11,7 +20,8 @@ from datetime import datetime
 load_dotenv()
 
 # --- Initialisation Flask + logs ---
-app = Flask(__name__, static_folder='static', template_folder='templates')
+# Route statique fournie par services.assets (empreintes, gzip/brotli, cache long), pas par Flask
+app = Flask(__name__, static_folder=None, template_folder='templates')
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'change-this-key')
 os.makedirs("logs", exist_ok=True)
 
@@ -22,8 +32,21 @@ logging.basicConfig(
     datefmt="%Y-%m-%d %H:%M:%S",
 )
 
-# --- SocketIO ---
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+# Plusieurs instances (derrière un répartiteur à sessions collantes) partagent les diffusions via SOCKETIO_MESSAGE_QUEUE
+# Plusieurs workers gunicorn partagent les diffusions via SOCKETIO_MESSAGE_QUEUE (unix://, redis://…)
+from services.message_queue import socketio_options
+socketio = SocketIO(
+    app,
+    cors_allowed_origins="*",
+    async_mode=ASYNC_MODE,
+    **socketio_options(os.environ.get("SOCKETIO_MESSAGE_QUEUE", ""))
+)
+# Chaque emit (diffusions, scans) est chronométré pour /metrics
+from services.instrumentation import (
+    registry as metrics_registry, instrument_socketio,
+    HTTP_REQUEST_SECONDS, CONTENT_TYPE as METRICS_CONTENT_TYPE, METRICS_TOKEN
+)
+instrument_socketio(socketio)
 
 # --- Authentification ---
 login_manager = LoginManager()
@@ -60,120 +83,241 @@ def login():
         return render_template("login.html", error="Identifiants invalides")
     return render_template("login.html")
 
-# --- InfluxDB ---
-try:
-    import influxdb_client
-    from influxdb_client.client.write_api import SYNCHRONOUS
-    from influxdb_client import Point
-except Exception:
-    influxdb_client = None
-    SYNCHRONOUS = None
+# --- Backends (InfluxDB, Docker) ---
+# Aucune connexion à l'import : create_app() les établit en arrière-plan, avec timeout
+from services.backends import BackendManager, connect_influxdb, check_influxdb, connect_docker, check_docker
 
 INFLUXDB_URL = os.environ.get('INFLUXDB_URL', 'http://localhost:8086')
 INFLUXDB_TOKEN = os.environ.get('INFLUXDB_TOKEN', '')
 INFLUXDB_ORG = os.environ.get('INFLUXDB_ORG', '')
 INFLUXDB_BUCKET = os.environ.get('INFLUXDB_BUCKET', '')
 
-if not all([INFLUXDB_TOKEN, INFLUXDB_BUCKET, INFLUXDB_ORG]):
-    raise ValueError("⚠️ Vérifie que TOKEN, BUCKET et ORG sont bien définis !")
-
-if influxdb_client:
-    try:
-        influx_client = influxdb_client.InfluxDBClient(
-            url=INFLUXDB_URL,
-            token=INFLUXDB_TOKEN,
-            org=INFLUXDB_ORG
-        )
-        write_api = influx_client.write_api(write_options=SYNCHRONOUS)
-        query_api = influx_client.query_api()
-        print("✅ Connexion à InfluxDB réussie !")
-    except Exception as e:
-        influx_client = None
-        write_api = None
-        query_api = None
-        print(f"❌ Erreur InfluxDB : {e}")
-else:
-    influx_client = None
-    write_api = None
-    query_api = None
-
-# Test d'écriture
-if write_api:
-    point = Point("test_metric").tag("source", "sky_monitor").field("value", 42).time(datetime.utcnow())
-    try:
-        write_api.write(bucket=INFLUXDB_BUCKET, record=point)
-        print(f"✅ Point écrit dans le bucket '{INFLUXDB_BUCKET}' !")
-    except Exception as e:
-        print(f"❌ Erreur lors de l’écriture du point : {e}")
-
-# Test de lecture
-if influx_client:
-    try:
-        query = f'from(bucket:"{INFLUXDB_BUCKET}") |> range(start: -1h) |> filter(fn: (r) => r._measurement == "test_metric")'
-        result = query_api.query(org=INFLUXDB_ORG, query=query)
-        print(f"📊 Points récupérés dans le bucket '{INFLUXDB_BUCKET}':")
-        for table in result:
-            for record in table.records:
-                print(f"  {record.get_time()} | {record.get_measurement()} | {record.get_field()} = {record.get_value()}")
-    except Exception as e:
-        print(f"❌ Erreur lors de la lecture : {e}")
-
-# --- Docker ---
-try:
-    import docker
-    docker_client = docker.from_env()
-except Exception:
-    docker_client = None
+backends = BackendManager()
+backends.register(
+    "influxdb",
+    lambda: connect_influxdb(INFLUXDB_URL, INFLUXDB_TOKEN, INFLUXDB_ORG, INFLUXDB_BUCKET),
+    check_influxdb
+)
+backends.register("docker", connect_docker, check_docker)
 
 # --- Net Discovery ---
 try:
-    from net_discovery_nmap import discover_and_scan, parse_ports
+    from net_discovery_nmap import discover_and_scan, parse_ports, ENGINES
     NET_DISCOVERY_AVAILABLE = True
 except Exception:
     discover_and_scan = None
     parse_ports = None
+    ENGINES = ("auto", "nmap", "async")
     NET_DISCOVERY_AVAILABLE = False
 
 # --- Services ---
 from services.metrics import (
+    HOSTNAME,
     collect_system_metrics,
+    collect_process_metrics,
     collect_docker_metrics,
     init_metrics,
-    write_metrics
+    write_metrics,
+    get_write_stats,
+    get_system_snapshot,
+    get_process_snapshot,
+    alert_engine,
+    history_store,
+    broadcaster
 )
+from services.broadcast import is_valid_room, MSGPACK_AVAILABLE
 from services.network_scan import (
     background_discover_and_emit,
     init_network_scan
 )
-
-init_metrics(influx_client, write_api, INFLUXDB_BUCKET, socketio)
+from services.scan_jobs import ScanJobManager
+from services.inventory import inventory_index
+from services.aletre_telegram import get_notifier
+from services.ingest import ingest_service, decode_payload, INGEST_TOKEN
+from services.flux_query import FluxQueryService
+from services.process_sampler import PROCESS_TOP_N
+
+# Sans InfluxDB, les métriques restent en mémoire et diffusées ; le writer démarre à la connexion
+init_metrics(None, None, INFLUXDB_BUCKET, socketio)
+backends.on_ready("influxdb", lambda influx: init_metrics(influx.client, influx.write_api, INFLUXDB_BUCKET, socketio))
 init_network_scan(write_metrics, socketio)
+# Historique long via InfluxDB (sous-échantillonné, mis en cache), repli sur l'historique mémoire
+flux_queries = FluxQueryService(
+    lambda: getattr(backends.get("influxdb"), "query_api", None),
+    lambda: INFLUXDB_BUCKET,
+    fallback=history_store
+)
+# Les jobs tournent dans les tâches de fond SocketIO, sous un budget de workers commun
+scan_jobs = ScanJobManager(
+    background_discover_and_emit,
+    spawn=lambda fn, *args: socketio.start_background_task(fn, *args)
+)
+
+# --- Démarrage ---
+startup = {"import_started": IMPORT_STARTED, "app_ready": None, "first_request": None}
+
+def _elapsed_ms(key):
+    return round((startup[key] - startup["import_started"]) * 1000, 1) if startup[key] else None
+
+@app.before_request
+def record_first_request():
+    if startup["first_request"] is None:
+        startup["first_request"] = time.time()
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_duration(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        # Label = endpoint Flask (cardinalité bornée), pas le chemin brut
+        HTTP_REQUEST_SECONDS.labels(
+            method=request.method, endpoint=request.endpoint or "unmatched", status=response.status_code
+        ).observe(time.perf_counter() - started)
+    return response
+
+# --- Jauges lues au scrape de /metrics (aucun coût entre deux scrapes) ---
+def _numeric(stats: dict) -> dict:
+    return {(k,): v for k, v in stats.items() if isinstance(v, (int, float)) and not isinstance(v, bool)}
+
+metrics_registry.gauge("skymonitor_write_pipeline", "État du pipeline d'écriture InfluxDB.",
+                       lambda: _numeric(get_write_stats()), ["stat"])
+metrics_registry.gauge("skymonitor_scan_jobs", "Jobs de scan réseau.", lambda: _numeric(scan_jobs.stats()), ["stat"])
+metrics_registry.gauge("skymonitor_ingest_agents", "Agents distants connus.", lambda: ingest_service.stats()["agents"])
+metrics_registry.gauge("skymonitor_broadcast_frames_sent", "Trames Socket.IO émises depuis le démarrage.",
+                       lambda: broadcaster.frames_sent)
+metrics_registry.gauge("skymonitor_uptime_seconds", "Temps depuis l'import de l'application.",
+                       lambda: round(time.time() - startup["import_started"], 1))
+
+def create_app(start_collectors=True):
+    """Point d'entrée (gunicorn `app:create_app()`, __main__) : backends et collecteurs en arrière-plan."""
+    if startup["app_ready"] is None:
+        # InfluxDB configuré mais pas encore connecté : les points partent au spool disque, rejoués ensuite
+        if all([INFLUXDB_TOKEN, INFLUXDB_ORG, INFLUXDB_BUCKET]):
+            init_metrics(None, None, INFLUXDB_BUCKET, socketio, offline_spool=True)
+        backends.start()
+        # Un seul processus collecte par répertoire de verrou (instances lancées deux fois sur le même logs/)
+        if start_collectors and acquire_collector_lock():
+            socketio.start_background_task(collect_system_metrics)
+            if PROCESS_TOP_N > 0:
+                socketio.start_background_task(collect_process_metrics)
+            backends.on_ready("docker", lambda client: socketio.start_background_task(collect_docker_metrics, client))
+        startup["app_ready"] = time.time()
+        print(f"[startup] application prête en {_elapsed_ms('app_ready')} ms")
+    return app
 
 # --- Routes API ---
+@app.route("/api/health")
+def api_health():
+    # Non authentifié (sondes de conteneur) ; aucun appel réseau, uniquement l'état mémorisé
+    health = backends.health()
+    health["startup"] = {
+        "ready_ms": _elapsed_ms("app_ready"),
+        "cold_start_ms": _elapsed_ms("first_request"),
+    }
+    health["uptime_seconds"] = round(time.time() - startup["import_started"], 1)
+    return jsonify(health), 200
+
+@app.route("/metrics")
+def prometheus_metrics():
+    # Format Prometheus ; pas de session (scraper), jeton Bearer optionnel via METRICS_TOKEN
+    if METRICS_TOKEN and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        return Response("unauthorized\n", status=401, mimetype="text/plain")
+    return Response(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route("/api/system/stats")
 @login_required
 def system_stats():
     try:
-        cpu = psutil.cpu_percent(interval=None)
-        mem = psutil.virtual_memory().percent
-        disk = psutil.disk_usage("/").percent
-        net = psutil.net_io_counters()
-
-        data = {
-            "cpu_percent": cpu,
-            "memory_percent": mem,
-            "disk_percent": disk,
-            "net_bytes_sent": getattr(net, "bytes_sent", 0),
-            "net_bytes_recv": getattr(net, "bytes_recv", 0),
-        }
-
-        logging.info(f"System stats collected: {data}")
+        # Lecture du snapshot du sampler : aucun appel psutil par requête
+        data = dict(get_system_snapshot())
         return jsonify(data), 200
 
     except Exception as e:
         logging.error(f"System stats error: {e}")
         return jsonify({"error": "Unable to collect system stats"}), 500
 
+@app.route("/api/system/processes")
+@login_required
+def system_processes():
+    # Top-N du dernier tick du collecteur de processus (vide tant qu'il n'a pas tourné)
+    return jsonify(get_process_snapshot() or {"process_count": 0, "cpu": [], "memory": [], "io": []}), 200
+
+@app.route("/api/metrics/pipeline")
+@login_required
+def metrics_pipeline_stats():
+    return jsonify({**get_write_stats(), "queries": flux_queries.stats()}), 200
+
+@app.route("/api/alerts")
+@login_required
+def api_alerts():
+    notifier = get_notifier()
+    return jsonify({
+        "active": alert_engine.active(),
+        "rules": [r.name for r in alert_engine.rules],
+        "notifier": notifier.stats() if notifier else None,
+    }), 200
+
+@app.route("/api/ingest", methods=["POST"])
+def api_ingest():
+    # Authentification des agents par jeton (pas de session) ; ingestion désactivée sans INGEST_TOKEN
+    if not INGEST_TOKEN:
+        return jsonify({"error": "ingestion désactivée (INGEST_TOKEN)"}), 403
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {INGEST_TOKEN}"):
+        return jsonify({"error": "jeton invalide"}), 401
+    try:
+        payload = decode_payload(request.get_data(), request.content_type or "")
+        accepted = ingest_service.ingest(payload)
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"accepted": accepted}), 202
+
+@app.route("/api/metrics/history")
+@login_required
+def metrics_history():
+    try:
+        measurement = request.args.get("measurement", "system_metrics")
+        fields = [f for f in request.args.get("fields", "").split(",") if f]
+        tags = {k[4:]: v for k, v in request.args.items() if k.startswith("tag.")}
+        range_s = float(request.args.get("range", 3600))
+        step = request.args.get("step", type=float)
+        agg = request.args.get("agg", "avg")
+        end = request.args.get("end", type=float)
+
+        series = history_store.query(
+            measurement, fields=fields, tags=tags,
+            start=(end or datetime.now().timestamp()) - range_s, end=end,
+            step=step, agg=agg
+        )
+        return jsonify({"measurement": measurement, "step": step, "agg": agg, "series": series}), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/metrics/query")
+@login_required
+def metrics_query():
+    """Historique InfluxDB pour les graphiques : ~1 point par pixel (`width`), agrégé côté serveur."""
+    try:
+        result = flux_queries.query(
+            request.args.get("measurement", "system_metrics"),
+            fields=[f for f in request.args.get("fields", "").split(",") if f],
+            tags={k[4:]: v for k, v in request.args.items() if k.startswith("tag.")},
+            range_s=float(request.args.get("range", 3600)),
+            end=request.args.get("end", type=float),
+            width=request.args.get("width", 800, type=int),
+            step=request.args.get("step", type=float),
+            agg=request.args.get("agg", "avg")
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except ConnectionError as e:
+        return jsonify({"error": str(e)}), 503
+    resp = jsonify(result)
+    resp.headers["X-Cache"] = "HIT" if result["cached"] else "MISS"
+    return resp, 200
+
+# Connexions simultanées du moteur asyncio par job : plafond serveur (descripteurs de fichiers)
+SCAN_ASYNC_MAX_CONCURRENCY = int(os.environ.get("SCAN_ASYNC_MAX_CONCURRENCY", 512))
+
 @app.route("/api/scan/network", methods=["POST"])
 @login_required
 def api_scan_network():
@@ -185,15 +329,101 @@ def api_scan_network():
         parallel = int(payload.get("parallel", 8))
         scan_args = payload.get("scan_args", "-sT -sV")
         ping_args = payload.get("ping_args", None)
-
-        socketio.start_background_task(
-            background_discover_and_emit, network, ports, parallel, scan_args, ping_args
-        )
-
-        return jsonify({"success": True, "message": "Scan launched"}), 202
+        bulk = bool(payload.get("bulk", False))
+        chunk_size = int(payload.get("chunk_size", 64))
+        mode = payload.get("mode", "full")
+        if mode not in ("full", "diff"):
+            return jsonify({"success": False, "error": f"mode inconnu: {mode}"}), 400
+        engine = payload.get("engine", "auto")
+        if engine not in ENGINES:
+            return jsonify({"success": False, "error": f"moteur inconnu: {engine}"}), 400
+        engine_opts = {
+            "concurrency": max(1, min(int(payload.get("concurrency", SCAN_ASYNC_MAX_CONCURRENCY)),
+                                      SCAN_ASYNC_MAX_CONCURRENCY)),
+            "timeout": float(payload.get("timeout", 1.0)),
+            "banner": bool(payload.get("banner", False)),
+        }
+        job, created = scan_jobs.submit({
+            "network": network, "ports": ports, "parallel_hosts": parallel, "scan_args": scan_args,
+            "ping_args": ping_args, "bulk": bulk, "chunk_size": chunk_size, "mode": mode,
+            "engine": engine, "engine_opts": engine_opts
+        })
+
+        body = {"success": True, "job_id": job.id, "room": job.room, "status": job.status, "mode": mode, "engine": engine}
+        if not created:
+            # Scan identique déjà en file ou en cours : on rejoint le même job
+            return jsonify({**body, "message": "Scan already in progress", "deduplicated": True}), 200
+        return jsonify({**body, "message": "Scan launched"}), 202
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route("/api/scan/jobs")
+@login_required
+def api_scan_jobs():
+    return jsonify({"jobs": scan_jobs.list(), "stats": scan_jobs.stats()}), 200
+
+@app.route("/api/scan/jobs/<job_id>")
+@login_required
+def api_scan_job(job_id):
+    job = scan_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "job inconnu"}), 404
+    offset = max(0, request.args.get("offset", 0, type=int))
+    limit = request.args.get("limit", type=int)
+    return jsonify(job.to_dict(offset=offset, limit=limit)), 200
+
+@app.route("/api/scan/jobs/<job_id>/cancel", methods=["POST"])
+@login_required
+def api_scan_job_cancel(job_id):
+    job = scan_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "job inconnu"}), 404
+    return jsonify(job.to_dict(with_results=False)), 200
+
+# --- Inventaire (serveurs, postes, conteneurs, équipements réseau) ---
+INVENTORY_FILTERS = ("role", "status", "service", "port", "q")
+INVENTORY_MAX_PAGE = int(os.environ.get("INVENTORY_MAX_PAGE", 5000))
+
+def inventory_response(collection, **fixed):
+    """Liste JSON paginée ; total dans X-Total-Count, 304 si l'ETag du client est à jour."""
+    filters = {k: request.args.get(k) for k in INVENTORY_FILTERS if request.args.get(k)}
+    filters.update(fixed)
+    offset = max(0, request.args.get("offset", 0, type=int))
+    limit = request.args.get("limit", type=int)
+    if limit is not None:
+        limit = max(0, min(limit, INVENTORY_MAX_PAGE))
+
+    etag = inventory_index.etag(collection, {**filters, "offset": offset, "limit": limit})
+    if request.if_none_match.contains(etag):
+        resp = app.response_class(status=304)
+    else:
+        total, body = inventory_index.render(collection, filters, offset, limit)
+        resp = app.response_class(body, mimetype="application/json")
+        resp.headers["X-Total-Count"] = str(total)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+@app.route("/api/serveurs")
+@login_required
+def api_serveurs():
+    return inventory_response("devices", role="serveur")
+
+@app.route("/api/postes")
+@login_required
+def api_postes():
+    return inventory_response("devices", role="poste")
+
+@app.route("/api/conteneurs")
+@login_required
+def api_conteneurs():
+    return inventory_response("containers")
+
+@app.route("/api/network/devices")
+@login_required
+def api_network_devices():
+    return inventory_response("devices")
+
 @app.route("/test/socket")
 @login_required
 def test_socket():
@@ -205,9 +435,10 @@ def test_socket():
 def index():
     return render_template("index.html")
 
-@app.route("/static/<path:filename>")
-def static_files(filename):
-    return send_from_directory(app.static_folder, filename)
+from services.assets import init_assets
+init_assets(app, os.path.join(app.root_path, "static"))
+# Le topic system et system_metrics mélangent serveur et agents : le front sélectionne l'hôte local
+app.jinja_env.globals["local_host"] = HOSTNAME
 
 @app.errorhandler(404)
 def not_found(e):
@@ -223,10 +454,45 @@ def handle_connect():
 
 @socketio.on("disconnect")
 def handle_disconnect():
+    if has_request_context():
+        broadcaster.remove_subscriber(request.sid)
     print("[socket] client disconnected")
 
+@socketio.on("subscribe")
+def handle_subscribe(data=None):
+    data = data or {}
+    topics = data.get("rooms") or ([data["room"]] if data.get("room") else [])
+    encoding = data.get("encoding", "json")
+    if encoding != "msgpack" or not MSGPACK_AVAILABLE:
+        encoding = "json"
+
+    joined = []
+    for topic in topics:
+        if not is_valid_room(topic):
+            continue
+        # Les événements de scan ne sont pas des trames delta : toujours en JSON
+        enc = "json" if topic.startswith("scan/") else encoding
+        join_room(broadcaster.add_subscriber(topic, request.sid, enc))
+        if not topic.startswith("scan/"):
+            broadcaster.send_snapshot(topic, request.sid, enc)
+        joined.append(topic)
+    return {"rooms": joined, "encoding": encoding}
+
+@socketio.on("unsubscribe")
+def handle_unsubscribe(data=None):
+    data = data or {}
+    topics = data.get("rooms") or ([data["room"]] if data.get("room") else [])
+    for topic in topics:
+        for enc in ("json", "msgpack"):
+            leave_room(broadcaster.room_name(topic, enc))
+        broadcaster.remove_subscriber(request.sid, topic)
+    return {"rooms": topics}
+
+@socketio.on("topics")
+def handle_topics():
+    return broadcaster.topics()
+
 # --- Run ---
 if __name__ == "__main__":
-    socketio.start_background_task(collect_system_metrics)
-    socketio.start_background_task(collect_docker_metrics, docker_client)
+    create_app()
     socketio.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 5000)), debug=False)
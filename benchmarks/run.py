@@ -0,0 +1,124 @@
+"""Pilote de benchmarks : exécute les scénarios et écrit les résultats en JSON.
+
+    python -m benchmarks.run                       # tous les scénarios
+    python -m benchmarks.run --quick --only nmap_xml,broadcast
+    python -m benchmarks.run --compare benchmarks/results/baseline.json
+
+Code de sortie 1 si une mesure régresse au-delà de --tolerance par rapport à
+la référence (`*_per_s` : plus haut = mieux, `*_ms` : plus bas = mieux).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+# L'application exige la config InfluxDB à l'import : valeurs factices, jamais contactées
+for key, value in {"INFLUXDB_URL": "http://127.0.0.1:1", "INFLUXDB_TOKEN": "bench",
+                   "INFLUXDB_ORG": "bench", "INFLUXDB_BUCKET": "bench"}.items():
+    os.environ.setdefault(key, value)
+
+from benchmarks.scenarios import SCENARIOS  # noqa: E402
+
+DEFAULT_OUT = os.path.join(ROOT, "benchmarks", "results")
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def run_scenarios(names, quick: bool = False) -> dict:
+    results = {}
+    for name in names:
+        fn, quick_kwargs = SCENARIOS[name]
+        print(f"[bench] {name} ...", flush=True)
+        start = time.perf_counter()
+        try:
+            results[name] = fn(**(quick_kwargs if quick else {}))
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+        results[name]["wall_s"] = round(time.perf_counter() - start, 3)
+        print(f"[bench] {name}: {json.dumps(results[name])}", flush=True)
+    return results
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Liste des régressions : (scénario, mesure, référence, actuel, écart relatif)."""
+    regressions = []
+    for name, metrics in current.items():
+        base = baseline.get(name) or {}
+        for metric, value in metrics.items():
+            ref = base.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(ref, (int, float)) or isinstance(value, bool) or not ref:
+                continue
+            if metric.endswith("_per_s"):
+                change = (ref - value) / ref
+            elif metric.endswith("_ms"):
+                change = (value - ref) / ref
+            else:
+                continue
+            if change > tolerance:
+                regressions.append((name, metric, ref, value, change))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks SkyMonitor")
+    parser.add_argument("--only", default="", help=f"scénarios séparés par des virgules ({', '.join(SCENARIOS)})")
+    parser.add_argument("--quick", action="store_true", help="tailles réduites (CI, fumée)")
+    parser.add_argument("--out", default=DEFAULT_OUT, help="fichier ou répertoire de sortie JSON")
+    parser.add_argument("--compare", help="résultats JSON de référence")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="régression tolérée (0.2 = 20 %%)")
+    args = parser.parse_args(argv)
+
+    names = [n.strip() for n in args.only.split(",") if n.strip()] or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"scénario inconnu : {', '.join(unknown)}")
+
+    meta = {
+        "git_rev": _git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "quick": args.quick,
+    }
+    report = {"meta": meta, "results": run_scenarios(names, args.quick)}
+
+    out = args.out
+    if not out.endswith(".json"):
+        os.makedirs(out, exist_ok=True)
+        out = os.path.join(out, f"bench-{meta['timestamp'].replace(':', '')}-{meta['git_rev']}.json")
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[bench] résultats : {out}")
+
+    status = 1 if any("error" in r for r in report["results"].values()) else 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f).get("results", {})
+        regressions = compare(report["results"], baseline, args.tolerance)
+        for name, metric, ref, value, change in regressions:
+            print(f"[bench] REGRESSION {name}.{metric}: {ref:.3f} -> {value:.3f} ({change:+.0%})")
+        if regressions:
+            status = 1
+        else:
+            print(f"[bench] aucune régression au-delà de {args.tolerance:.0%}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
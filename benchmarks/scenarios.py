@@ -0,0 +1,378 @@
+"""Scénarios de benchmark : chaque fonction renvoie un dict de mesures (voir benchmarks/run.py).
+
+Conventions de nommage des mesures (utilisées par la comparaison) :
+`*_per_s` plus haut = mieux, `*_ms` plus bas = mieux, le reste est informatif.
+"""
+import io
+import os
+import socket
+import statistics
+import stat
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(predicate, timeout: float = 30.0, interval: float = 0.005) -> bool:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(interval)
+    return True
+
+
+# --- InfluxDB factice ---
+class StubInflux:
+    """Serveur HTTP local qui accepte /api/v2/write (204) et compte les lignes reçues."""
+
+    def __init__(self):
+        self.lines = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stub._lock:
+                    stub.requests += 1
+                    stub.lines += body.count(b"\n") + 1 if body else 0
+                self.send_response(204)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@contextmanager
+def _batch_writer(writer):
+    from services import metrics
+    previous = metrics.batch_writer
+    metrics.batch_writer = writer
+    try:
+        yield
+    finally:
+        metrics.batch_writer = previous
+
+
+def bench_write_metrics(points: int = 50000, hosts: int = 50, batch_size: int = 5000) -> dict:
+    """write_metrics -> BatchWriter -> client InfluxDB réel -> serveur HTTP factice."""
+    import influxdb_client
+    from influxdb_client.client.write_api import SYNCHRONOUS
+    from services.metrics import write_metrics
+    from services.write_pipeline import BatchWriter
+
+    with StubInflux() as stub:
+        client = influxdb_client.InfluxDBClient(url=stub.url, token="bench", org="bench")
+        writer = BatchWriter(client.write_api(write_options=SYNCHRONOUS), "bench",
+                             batch_size=batch_size, flush_interval=0.05, max_queue=points)
+        writer.start()
+        try:
+            with _batch_writer(writer):
+                start = time.perf_counter()
+                for i in range(points):
+                    write_metrics("bench_metrics", {"value": float(i), "count": i}, {"host": f"h{i % hosts}"})
+                submitted = time.perf_counter() - start
+                delivered = _wait_for(lambda: stub.lines >= points)
+                total = time.perf_counter() - start
+        finally:
+            writer.stop()
+            client.close()
+    return {
+        "points": points,
+        "delivered": delivered,
+        "submit_points_per_s": points / submitted,
+        "end_to_end_points_per_s": points / total,
+        "http_requests": stub.requests,
+        "avg_flush_ms": writer.stats()["avg_flush_ms"],
+    }
+
+
+# --- nmap ---
+def make_nmap_xml(hosts: int = 2000, ports: int = 20) -> bytes:
+    """Sortie `nmap -oX` synthétique, au format du fixture tests/fixtures/nmap_bulk.xml."""
+    out = io.StringIO()
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n<nmaprun scanner="nmap" version="7.94">\n')
+    for h in range(hosts):
+        ip = f"10.{h // 65536 % 256}.{h // 256 % 256}.{h % 256}"
+        out.write(f'<host><status state="up" reason="syn-ack"/><address addr="{ip}" addrtype="ipv4"/>'
+                  f'<address addr="AA:BB:CC:{h // 65536 % 256:02X}:{h // 256 % 256:02X}:{h % 256:02X}" '
+                  f'addrtype="mac" vendor="Dell"/><hostnames><hostname name="host-{h}.local" type="PTR"/></hostnames><ports>')
+        for p in range(ports):
+            state = "open" if p % 3 == 0 else "closed"
+            out.write(f'<port protocol="tcp" portid="{1000 + p}"><state state="{state}" reason="syn-ack"/>'
+                      f'<service name="svc{p}" product="Product {p}" version="1.{p}" method="probed" conf="10"/></port>')
+        out.write('</ports></host>\n')
+    out.write('<runstats><finished elapsed="1.0"/><hosts up="%d" down="0" total="%d"/></runstats></nmaprun>\n' % (hosts, hosts))
+    return out.getvalue().encode()
+
+
+def make_nmap_text(ports: int = 1000) -> str:
+    lines = ["Starting Nmap 7.94", "Nmap scan report for 10.0.0.1", "Host is up (0.00012s latency).",
+             "PORT      STATE  SERVICE VERSION"]
+    for p in range(ports):
+        lines.append(f"{1000 + p}/tcp {'open' if p % 3 == 0 else 'closed'} svc{p} Product {p} 1.{p}")
+    lines.append("Nmap done: 1 IP address (1 host up) scanned in 1.00 seconds")
+    return "\n".join(lines) + "\n"
+
+
+def bench_nmap_xml(hosts: int = 2000, ports: int = 20, repeat: int = 3) -> dict:
+    from net_discovery_nmap import parse_nmap_xml
+
+    data = make_nmap_xml(hosts, ports)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parsed = sum(1 for _ in parse_nmap_xml(io.BytesIO(data)))
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {
+        "hosts": parsed,
+        "xml_bytes": len(data),
+        "parse_ms": best * 1000,
+        "hosts_per_s": parsed / best,
+        "mb_per_s": len(data) / best / 2**20,
+    }
+
+
+@contextmanager
+def _fake_nmap(output: str):
+    """Exécutable `nmap` factice en tête du PATH, qui rejoue une sortie enregistrée."""
+    with tempfile.TemporaryDirectory() as tmp:
+        recorded = os.path.join(tmp, "nmap_output.txt")
+        with open(recorded, "w") as f:
+            f.write(output)
+        script = os.path.join(tmp, "nmap")
+        with open(script, "w") as f:
+            f.write(f'#!/bin/sh\ncat "{recorded}"\n')
+        os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+        previous = os.environ.get("PATH", "")
+        os.environ["PATH"] = tmp + os.pathsep + previous
+        try:
+            yield
+        finally:
+            os.environ["PATH"] = previous
+
+
+def bench_scan_subprocess(runs: int = 20, ports: int = 1000) -> dict:
+    from net_discovery_nmap import scan_host_with_subprocess
+
+    port_list = list(range(1000, 1000 + ports))
+    timings = []
+    with _fake_nmap(make_nmap_text(ports)):
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = scan_host_with_subprocess("10.0.0.1", port_list)
+            timings.append(time.perf_counter() - start)
+    return {
+        "runs": runs,
+        "ports_parsed": len(result.get("ports", [])),
+        "call_p50_ms": statistics.median(timings) * 1000,
+        "call_max_ms": max(timings) * 1000,
+        "ports_per_s": len(result.get("ports", [])) / statistics.median(timings),
+    }
+
+
+# --- Docker ---
+class _NullWriteApi:
+    def write(self, bucket, record):
+        pass
+
+
+def _container_stats(i: int, tick: int) -> dict:
+    return {
+        "read": f"2024-01-01T00:00:{tick:02d}Z",
+        "cpu_stats": {"cpu_usage": {"total_usage": 10**9 + tick * 10**7}, "system_cpu_usage": 10**12 + tick * 10**9,
+                      "online_cpus": 4},
+        "precpu_stats": {"cpu_usage": {"total_usage": 10**9}, "system_cpu_usage": 10**12},
+        "memory_stats": {"usage": (100 + i) * 2**20, "limit": 2**30, "stats": {"inactive_file": 2**20}},
+        "networks": {"eth0": {"rx_bytes": tick * 1000 * (i + 1), "tx_bytes": tick * 500}},
+        "blkio_stats": {"io_service_bytes_recursive": [{"op": "read", "value": tick * 4096},
+                                                        {"op": "write", "value": tick * 8192}]},
+        "pids_stats": {"current": 5 + i % 10},
+    }
+
+
+class FakeContainer:
+    def __init__(self, i: int, latency: float):
+        self.id = f"c{i:06d}"
+        self.name = f"bench_{i}"
+        self.latency = latency
+        self.attrs = {"Config": {"Image": f"image:{i % 5}", "Labels": {"com.docker.compose.project": "bench"}}}
+        self.tick = 0
+
+    def stats(self, stream=False, decode=False):
+        time.sleep(self.latency)
+        self.tick += 1
+        return _container_stats(int(self.id[1:]), self.tick)
+
+
+class FakeDockerClient:
+    def __init__(self, containers):
+        self.containers = type("Containers", (), {"list": staticmethod(lambda: list(containers))})()
+
+
+def bench_docker_collect(containers: int = 200, latency: float = 0.005, ticks: int = 5) -> dict:
+    """Balayage run_once (stats en parallèle) puis coût CPU d'un tick du collecteur en flux."""
+    from services.metrics import collect_docker_metrics, publish_docker_samples
+    from services.write_pipeline import BatchWriter
+
+    fakes = [FakeContainer(i, latency) for i in range(containers)]
+    client = FakeDockerClient(fakes)
+    writer = BatchWriter(_NullWriteApi(), "bench", max_queue=containers * (ticks + 2) * 2)
+    with _batch_writer(writer):
+        start = time.perf_counter()
+        collect_docker_metrics(client, run_once=True)
+        sweep = time.perf_counter() - start
+
+        tick_timings = []
+        for tick in range(2, ticks + 2):
+            samples = [(c.name, _container_stats(i, tick)) for i, c in enumerate(fakes)]
+            start = time.perf_counter()
+            publish_docker_samples(samples, fakes, host="bench")
+            tick_timings.append(time.perf_counter() - start)
+    return {
+        "containers": containers,
+        "api_latency_ms": latency * 1000,
+        "run_once_sweep_ms": sweep * 1000,
+        "stream_tick_ms": statistics.median(tick_timings) * 1000,
+        "containers_per_s": containers / statistics.median(tick_timings),
+        "points_queued": writer.queue_depth,
+    }
+
+
+# --- Processus ---
+def bench_process_sampler(extra_processes: int = 2000, ticks: int = 5) -> dict:
+    """Coût d'un tick du collecteur top-N avec `extra_processes` processus endormis en plus."""
+    import subprocess
+    from services.process_sampler import ProcessSampler
+
+    sleepers = [subprocess.Popen(["sleep", "300"]) for _ in range(extra_processes)]
+    try:
+        sampler = ProcessSampler()
+        sampler.sample()
+        timings = []
+        for _ in range(ticks):
+            start = time.perf_counter()
+            result = sampler.sample()
+            timings.append(time.perf_counter() - start)
+        fds = sampler._open_fds
+        sampler.stop()
+    finally:
+        for p in sleepers:
+            p.kill()
+        for p in sleepers:
+            p.wait()
+    tick = statistics.median(timings)
+    return {
+        "processes": result["process_count"],
+        "cached_fds": fds,
+        "tick_ms": tick * 1000,
+        "processes_per_s": result["process_count"] / tick,
+    }
+
+
+# --- Diffusion Socket.IO ---
+def bench_broadcast(clients: int = 50, frames: int = 20, interval: float = 0.05) -> dict:
+    """Latence trame -> réception pour M clients WebSocket abonnés à la room `system`."""
+    import socketio as sio_client
+    import app as webapp
+    from services.metrics import broadcaster
+
+    port = _free_port()
+    threading.Thread(
+        target=lambda: webapp.socketio.run(webapp.app, host="127.0.0.1", port=port,
+                                           allow_unsafe_werkzeug=True, log_output=False),
+        daemon=True,
+    ).start()
+    _wait_for(lambda: _port_open(port), timeout=10)
+
+    latencies = []
+    received = [0]
+    lock = threading.Lock()
+    connected = []
+    for _ in range(clients):
+        c = sio_client.Client(reconnection=False)
+
+        @c.on("metrics_frame")
+        def on_frame(frame, _c=c):
+            now = time.time()
+            if frame.get("full") or "bench" not in frame.get("changes", {}):
+                return
+            with lock:
+                latencies.append((now - frame["ts"]) * 1000)
+                received[0] += 1
+
+        c.connect(f"http://127.0.0.1:{port}", transports=["websocket"])
+        c.call("subscribe", {"room": "system"}, timeout=10)
+        connected.append(c)
+
+    start = time.perf_counter()
+    for i in range(frames):
+        broadcaster.publish("system", "bench", {"value": float(i + 1)})
+        broadcaster.flush("system", complete=False)
+        time.sleep(interval)
+    expected = clients * frames
+    _wait_for(lambda: received[0] >= expected, timeout=10)
+    elapsed = time.perf_counter() - start
+    # disconnect() attend la fin du transport (~3 s par client) : en parallèle
+    closers = [threading.Thread(target=c.disconnect, daemon=True) for c in connected]
+    for t in closers:
+        t.start()
+    for t in closers:
+        t.join(timeout=10)
+    return {
+        "clients": clients,
+        "frames": frames,
+        "delivered_ratio": received[0] / expected,
+        "latency_p50_ms": _percentile(latencies, 50),
+        "latency_p95_ms": _percentile(latencies, 95),
+        "latency_max_ms": max(latencies) if latencies else 0.0,
+        "messages_per_s": received[0] / elapsed,
+    }
+
+
+def _port_open(port: int) -> bool:
+    with socket.socket() as s:
+        return s.connect_ex(("127.0.0.1", port)) == 0
+
+
+SCENARIOS = {
+    "write_metrics": (bench_write_metrics, {"points": 5000}),
+    "nmap_xml": (bench_nmap_xml, {"hosts": 200, "repeat": 1}),
+    "scan_subprocess": (bench_scan_subprocess, {"runs": 5, "ports": 200}),
+    "docker_collect": (bench_docker_collect, {"containers": 50, "ticks": 2}),
+    "process_sampler": (bench_process_sampler, {"extra_processes": 200, "ticks": 3}),
+    "broadcast": (bench_broadcast, {"clients": 10, "frames": 10}),
+}
+"""Nom -> (fonction, paramètres réduits pour --quick)."""
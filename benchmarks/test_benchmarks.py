@@ -0,0 +1,51 @@
+"""Variante pytest-benchmark des scénarios (hors `testpaths`, lancée explicitement) :
+
+    pytest benchmarks --benchmark-json=benchmarks/results/pytest-bench.json
+    pytest benchmarks --benchmark-compare   # contre la dernière sauvegarde (--benchmark-autosave)
+"""
+import io
+import os
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+for _key, _value in {"INFLUXDB_URL": "http://127.0.0.1:1", "INFLUXDB_TOKEN": "bench",
+                     "INFLUXDB_ORG": "bench", "INFLUXDB_BUCKET": "bench"}.items():
+    os.environ.setdefault(_key, _value)
+
+from benchmarks import scenarios  # noqa: E402
+from net_discovery_nmap import parse_nmap_xml, scan_host_with_subprocess  # noqa: E402
+
+
+def test_parse_nmap_xml(benchmark):
+    data = scenarios.make_nmap_xml(hosts=2000, ports=20)
+    hosts = benchmark(lambda: sum(1 for _ in parse_nmap_xml(io.BytesIO(data))))
+    benchmark.extra_info["xml_bytes"] = len(data)
+    assert hosts == 2000
+
+
+def test_scan_host_with_subprocess(benchmark):
+    ports = list(range(1000, 2000))
+    with scenarios._fake_nmap(scenarios.make_nmap_text(1000)):
+        result = benchmark(scan_host_with_subprocess, "10.0.0.1", ports)
+    assert len(result["ports"]) == 1000
+
+
+def test_write_metrics_throughput(benchmark):
+    # Scénario de bout en bout : une seule exécution mesurée, le débit part dans extra_info
+    result = benchmark.pedantic(scenarios.bench_write_metrics, kwargs={"points": 20000}, rounds=3, iterations=1)
+    benchmark.extra_info.update(result)
+    assert result["delivered"]
+
+
+def test_docker_collect(benchmark):
+    result = benchmark.pedantic(scenarios.bench_docker_collect, kwargs={"containers": 200, "ticks": 3},
+                                rounds=3, iterations=1)
+    benchmark.extra_info.update(result)
+
+
+def test_broadcast_latency(benchmark):
+    result = benchmark.pedantic(scenarios.bench_broadcast, kwargs={"clients": 20, "frames": 10}, rounds=1, iterations=1)
+    benchmark.extra_info.update(result)
+    assert result["delivered_ratio"] == 1.0
@@ -0,0 +1,31 @@
+# Configuration gunicorn de production : `gunicorn -c gunicorn.conf.py "app:create_app()"`
+import os
+import sys
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "eventlet")
+# Un seul worker par instance : collecteurs, snapshot, historique, inventaire et jobs de scan vivent
+# en mémoire du processus, et le long-polling Socket.IO exige des sessions collantes que gunicorn
+# ne sait pas assurer entre workers. Un worker eventlet tient déjà des milliers de WebSockets ;
+# au-delà, plusieurs instances derrière un répartiteur à sessions collantes (voir README).
+workers = 1
+if int(os.environ.get("WEB_CONCURRENCY", 1)) > 1:
+    print("[gunicorn] WEB_CONCURRENCY ignoré : un worker par instance (voir README, Mode production)",
+          file=sys.stderr)
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 4000))
+# Les WebSockets sont des connexions longues : pas de recyclage par timeout d'inactivité
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = 20
+keepalive = 5
+
+# L'application choisit son async_mode à l'import (services/runtime.py)
+os.environ.setdefault("ASYNC_MODE", worker_class if worker_class in ("eventlet", "gevent") else "threading")
+
+
+def when_ready(server):
+    url = os.environ.get("SOCKETIO_MESSAGE_QUEUE", "")
+    if url.startswith("unix://"):
+        # Le master (non patché, jamais recyclé) héberge le broker ; les workers s'y connectent
+        from services.message_queue import UnixSocketBroker, socket_path
+        UnixSocketBroker(socket_path(url)).start()
+        server.log.info(f"[mq] broker local sur {url}")
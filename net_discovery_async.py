@@ -0,0 +1,383 @@
+import asyncio
+import ipaddress
+import queue
+import socket
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+# Ports sondés pour la découverte : un RST (refused) suffit à prouver que l'hôte est en ligne
+DISCOVERY_PORTS = [80, 443, 22, 445, 3389, 139, 8080]
+# Période de vérification de l'annulation, indépendante de l'arrivée des résultats (réseau muet)
+CANCEL_POLL_INTERVAL = 0.2
+
+
+class RttEstimator:
+    """Estimation SRTT / RTTVAR (RFC 6298) pour dériver un timeout de connexion adaptatif."""
+
+    def __init__(self, initial: float = 1.0, min_timeout: float = 0.05, max_timeout: float = 3.0):
+        self.initial = initial
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+
+    def update(self, rtt: float):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+    def timeout(self) -> float:
+        if self.srtt is None:
+            return self.initial
+        return min(self.max_timeout, max(self.min_timeout, self.srtt + 4 * self.rttvar))
+
+
+class HostLimiter:
+    """Limite par hôte : connexions simultanées et débit de nouvelles connexions."""
+
+    def __init__(self, max_inflight: int, rate: Optional[float]):
+        self._sem = asyncio.Semaphore(max(1, max_inflight))
+        self._interval = 1.0 / rate if rate else 0.0
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self._sem.acquire()
+        if self._interval:
+            async with self._lock:
+                loop = asyncio.get_running_loop()
+                now = loop.time()
+                wait = self._next_start - now
+                self._next_start = max(now, self._next_start) + self._interval
+            if wait > 0:
+                await asyncio.sleep(wait)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._sem.release()
+
+
+def _service_name(port: int) -> str:
+    try:
+        return socket.getservbyport(port, "tcp")
+    except OSError:
+        return ""
+
+
+class AsyncScanner:
+    """Moteur TCP connect pur Python (équivalent d'un `nmap -sT` sans détection de version).
+
+    Un sémaphore global borne les connexions simultanées ; chaque hôte a sa
+    propre limite et son estimateur de RTT pour adapter le timeout.
+    """
+
+    def __init__(self, concurrency: int = 512, per_host_limit: int = 32, per_host_rate: Optional[float] = None,
+                 timeout: float = 1.0, min_timeout: float = 0.05, max_timeout: float = 3.0,
+                 banner: bool = False, banner_timeout: float = 1.0, banner_bytes: int = 256,
+                 report_closed: bool = False):
+        self.concurrency = max(1, concurrency)
+        self.per_host_limit = per_host_limit
+        self.per_host_rate = per_host_rate
+        self.timeout = timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.banner = banner
+        self.banner_timeout = banner_timeout
+        self.banner_bytes = banner_bytes
+        self.report_closed = report_closed
+        self._global: Optional[asyncio.Semaphore] = None
+        self.global_rtt = RttEstimator(timeout, min_timeout, max_timeout)
+        self.connects = 0
+        self.hosts_checked = 0
+
+    def _sem(self) -> asyncio.Semaphore:
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.concurrency)
+        return self._global
+
+    async def probe(self, ip: str, port: int, rtt: RttEstimator, grab_banner: bool = False):
+        """Renvoie (state, rtt, banner) avec state parmi open / closed / filtered."""
+        loop = asyncio.get_running_loop()
+        async with self._sem():
+            self.connects += 1
+            start = loop.time()
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), rtt.timeout())
+            except asyncio.TimeoutError:
+                return "filtered", None, None
+            except ConnectionRefusedError:
+                elapsed = loop.time() - start
+                rtt.update(elapsed)
+                return "closed", elapsed, None
+            except OSError:
+                return "filtered", None, None
+
+            elapsed = loop.time() - start
+            rtt.update(elapsed)
+            data = None
+            try:
+                if grab_banner:
+                    try:
+                        data = await asyncio.wait_for(reader.read(self.banner_bytes), self.banner_timeout)
+                    except (asyncio.TimeoutError, OSError):
+                        data = None
+            finally:
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except OSError:
+                    pass
+            return "open", elapsed, data
+
+    async def is_alive(self, ip: str, probe_ports: Iterable[int] = DISCOVERY_PORTS) -> bool:
+        tasks = [asyncio.ensure_future(self.probe(ip, p, self.global_rtt)) for p in probe_ports]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                state, _, _ = await fut
+                if state in ("open", "closed"):
+                    return True
+            return False
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def scan_host(self, ip: str, ports: List[int]) -> Dict[str, Any]:
+        rtt = RttEstimator(self.global_rtt.timeout(), self.min_timeout, self.max_timeout)
+        limiter = HostLimiter(self.per_host_limit, self.per_host_rate)
+
+        async def one(port: int):
+            async with limiter:
+                return port, await self.probe(ip, port, rtt, self.banner)
+
+        ports_info = []
+        lines = []
+        for port, (state, _, data) in await asyncio.gather(*(one(p) for p in ports)):
+            if state != "open" and not (self.report_closed and state == "closed"):
+                continue
+            banner = data.decode(errors="replace").strip() if data else ""
+            raw = f"{port}/tcp {state} {_service_name(port)} {banner}".strip()
+            ports_info.append({
+                "port": port,
+                "protocol": "tcp",
+                "state": state,
+                "service": _service_name(port),
+                "raw": raw,
+            })
+            lines.append(raw)
+        if rtt.srtt is not None:
+            self.global_rtt.update(rtt.srtt)
+        return {"ip": ip, "ports": ports_info, "raw_output": "\n".join(lines)}
+
+    async def _workers(self, items, fn, workers: int) -> AsyncIterator[Any]:
+        """`items` itérable ou itérateur asynchrone (hôtes découverts dans la même boucle)."""
+        out: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+        done = object()
+        if hasattr(items, "__anext__"):
+            lock = asyncio.Lock()
+
+            async def take():
+                async with lock:
+                    try:
+                        return await items.__anext__()
+                    except StopAsyncIteration:
+                        return done
+        else:
+            it = iter(items)
+
+            async def take():
+                return next(it, done)
+
+        async def worker():
+            while True:
+                item = await take()
+                if item is done:
+                    break
+                try:
+                    res = await fn(item)
+                except Exception as e:
+                    print(f"[net_discovery_async] {item}: {e}")
+                    continue
+                if res is not None:
+                    await out.put(res)
+            await out.put(done)
+
+        tasks = [asyncio.ensure_future(worker()) for _ in range(max(1, workers))]
+        remaining = len(tasks)
+        try:
+            while remaining:
+                item = await out.get()
+                if item is done:
+                    remaining -= 1
+                    continue
+                yield item
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if hasattr(items, "aclose"):
+                await items.aclose()
+
+    def discover(self, network: str) -> AsyncIterator[str]:
+        net = ipaddress.ip_network(network, strict=False)
+        hosts = net.hosts() if net.num_addresses > 1 else iter([net.network_address])
+
+        async def check(addr):
+            ip = str(addr)
+            try:
+                return ip if await self.is_alive(ip) else None
+            finally:
+                self.hosts_checked += 1
+
+        return self._workers(hosts, check, max(1, self.concurrency // len(DISCOVERY_PORTS)))
+
+    def scan_hosts(self, hosts: Iterable[str], ports: List[int]) -> AsyncIterator[Dict[str, Any]]:
+        per_host = max(1, min(len(ports), self.per_host_limit))
+
+        async def scan(ip):
+            try:
+                return await self.scan_host(ip, ports)
+            except Exception as e:
+                return {"ip": ip, "error": f"async scan failed: {e}"}
+
+        return self._workers(hosts, scan, max(1, self.concurrency // per_host))
+
+
+# --- Adaptateurs synchrones (threads de l'app / CLI) ---
+def _cancelled(cancel_token) -> bool:
+    return cancel_token is not None and cancel_token.cancelled
+
+
+def _iter_async(agen_factory, cancel_token=None) -> Iterator[Any]:
+    """Exécute un générateur asynchrone dans une boucle dédiée et en relaie les éléments.
+
+    L'annulation (`cancel_token.cancelled`, ou consommateur arrêté) est vérifiée
+    toutes les `CANCEL_POLL_INTERVAL` secondes, même si aucun résultat n'arrive.
+    """
+    q: "queue.Queue" = queue.Queue(maxsize=256)
+    done = object()
+    stop = threading.Event()
+
+    async def pump():
+        task = asyncio.current_task()
+
+        async def watch():
+            while not stop.is_set() and not _cancelled(cancel_token):
+                await asyncio.sleep(CANCEL_POLL_INTERVAL)
+            task.cancel()
+
+        watcher = asyncio.ensure_future(watch())
+        try:
+            async for item in agen_factory():
+                if stop.is_set():
+                    break
+                await asyncio.get_running_loop().run_in_executor(None, q.put, item)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            watcher.cancel()
+
+    def runner():
+        try:
+            asyncio.run(pump())
+        except Exception as e:
+            q.put(e)
+        finally:
+            q.put(done)
+
+    threading.Thread(target=runner, name="async-scan", daemon=True).start()
+    try:
+        while True:
+            try:
+                item = q.get(timeout=CANCEL_POLL_INTERVAL)
+            except queue.Empty:
+                if _cancelled(cancel_token):
+                    return
+                continue
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Débloque le producteur s'il attend une place dans la file
+        while True:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                break
+
+
+class AsyncDiscoveryFeed:
+    """Hôtes actifs produits au fil de la découverte asyncio (progression exposée comme `DiscoveryFeed`).
+
+    Itéré directement, il tourne dans sa propre boucle ; passé à
+    `iter_async_scan_hosts`, chaque hôte est scanné dès sa découverte, dans la
+    même boucle et sous le même plafond de connexions que la découverte.
+    """
+
+    def __init__(self, network: str, cancel_token=None, **scanner_opts):
+        self.network = network
+        self.cancel_token = cancel_token
+        self.scanner = AsyncScanner(**scanner_opts)
+        net = ipaddress.ip_network(network, strict=False)
+        self.addresses = max(1, net.num_addresses - 2) if net.num_addresses > 2 else net.num_addresses
+        self.discovered = 0
+        self.done = False
+
+    @property
+    def fraction_done(self) -> float:
+        return 1.0 if self.done else min(1.0, self.scanner.hosts_checked / self.addresses)
+
+    async def hosts(self) -> AsyncIterator[str]:
+        async for ip in self.scanner.discover(self.network):
+            self.discovered += 1
+            yield ip
+        self.done = True
+
+    def __iter__(self) -> Iterator[str]:
+        return _iter_async(self.hosts, self.cancel_token)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"addresses": self.addresses, "checked": self.scanner.hosts_checked,
+                "discovered": self.discovered, "connects": self.scanner.connects}
+
+
+def discover_hosts_async(network: str, cancel_token=None, stream: bool = False, **scanner_opts):
+    """Hôtes actifs de `network` (liste triée) ; avec `stream=True`, un `AsyncDiscoveryFeed`.
+
+    `cancel_token` (objet exposant `cancelled`) interrompt la découverte en cours de route.
+    """
+    feed = AsyncDiscoveryFeed(network, cancel_token, **scanner_opts)
+    if stream:
+        return feed
+    return sorted(feed, key=ipaddress.ip_address)
+
+
+def iter_async_scan_hosts(hosts: Iterable[str], ports: List[int], cancel_token=None,
+                          **scanner_opts) -> Iterator[Dict[str, Any]]:
+    scanner = AsyncScanner(**scanner_opts)
+    if isinstance(hosts, AsyncDiscoveryFeed):
+        def pipeline():
+            # Appelé dans la boucle : scan et découverte partagent le sémaphore global de connexions
+            scanner._global = hosts.scanner._sem()
+            return scanner.scan_hosts(hosts.hosts(), ports)
+        return _iter_async(pipeline, cancel_token or hosts.cancel_token)
+    return _iter_async(lambda: scanner.scan_hosts(hosts, ports), cancel_token)
+
+
+def scan_host_async(ip: str, ports: List[int], **scanner_opts) -> Dict[str, Any]:
+    return asyncio.run(AsyncScanner(**scanner_opts).scan_host(ip, ports))
+
+
+def discover_and_scan_async(network: str, ports: List[int], **scanner_opts) -> Dict[str, Any]:
+    start = time.time()
+    hosts = discover_hosts_async(network, **scanner_opts)
+    results = list(iter_async_scan_hosts(hosts, ports, **scanner_opts))
+    return {"network": network, "hosts_scanned": len(hosts), "results": results, "elapsed_seconds": time.time() - start}
+
@@ -1,11 +1,20 @@
 import argparse
+import csv
+import ipaddress
 import json
+import os
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict, Any, Optional
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Callable, Set
+import queue
 import shutil
 import subprocess
 import sys
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
 
 
 # Optional: python-nmap wrapper
@@ -15,27 +24,355 @@ try:
 except Exception:
     NM_AVAILABLE = False
 
+# Optional: métriques /metrics (absent quand le module est utilisé seul, hors de l'application)
+try:
+    from services.instrumentation import NMAP_RUN_SECONDS
+except ImportError:
+    NMAP_RUN_SECONDS = None
+
 
 def ensure_nmap_installed() -> bool:
     return shutil.which("nmap") is not None
 
+ENGINES = ("auto", "nmap", "async")
+
+# Découverte par sous-blocs : un nmap -sn par /24 (au plus), en parallèle adaptatif
+DISCOVERY_BLOCK_PREFIX = int(os.environ.get("DISCOVERY_BLOCK_PREFIX", 24))
+DISCOVERY_BLOCK_TIMEOUT = float(os.environ.get("DISCOVERY_BLOCK_TIMEOUT", 180))
+# Un bloc en timeout est redécoupé en deux, jusqu'à cette taille
+DISCOVERY_MIN_BLOCK_PREFIX = 28
+
+class ScanCancelled(RuntimeError):
+    pass
+
+class CancelToken:
+    """Jeton d'annulation partagé par les threads d'un scan.
+
+    Les processus nmap lancés pour le scan y sont enregistrés : `cancel()` les
+    tue immédiatement au lieu d'attendre la fin du lot en cours.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._procs = set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        self._event.set()
+        with self._lock:
+            procs = list(self._procs)
+        for proc in procs:
+            _kill(proc)
+
+    def register(self, proc):
+        with self._lock:
+            self._procs.add(proc)
+        # Annulation arrivée pendant le lancement du processus
+        if self.cancelled:
+            _kill(proc)
+
+    def unregister(self, proc):
+        with self._lock:
+            self._procs.discard(proc)
+
+    def check(self):
+        if self.cancelled:
+            raise ScanCancelled("scan annulé")
+
+def _kill(proc):
+    try:
+        if proc.poll() is None:
+            proc.kill()
+    except Exception:
+        pass
+
+def _run_nmap(args: List[str], token: Optional[CancelToken] = None, timeout: Optional[float] = None):
+    """`subprocess.run` annulable ; durée enregistrée par issue (ok / error / timeout / cancelled)."""
+    if NMAP_RUN_SECONDS is None:
+        return _run_nmap_process(args, token, timeout)
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        proc = _run_nmap_process(args, token, timeout)
+        outcome = "ok"
+        return proc
+    except ScanCancelled:
+        outcome = "cancelled"
+        raise
+    except subprocess.TimeoutExpired:
+        outcome = "timeout"
+        raise
+    finally:
+        _observe_nmap_run(outcome, start)
+
+def _observe_nmap_run(outcome: str, start: float):
+    if NMAP_RUN_SECONDS is not None:
+        NMAP_RUN_SECONDS.labels(outcome=outcome).observe(time.perf_counter() - start)
+
+def _run_nmap_process(args: List[str], token: Optional[CancelToken] = None, timeout: Optional[float] = None):
+    """`subprocess.run` annulable : le processus est enregistré auprès du jeton."""
+    if token is None:
+        if timeout is None:
+            return subprocess.run(args, capture_output=True, text=True, check=True)
+        return subprocess.run(args, capture_output=True, text=True, check=True, timeout=timeout)
+    token.check()
+    proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    token.register(proc)
+    try:
+        out, err = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill(proc)
+        proc.communicate()
+        raise
+    finally:
+        token.unregister(proc)
+    token.check()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, args, out, err)
+    return subprocess.CompletedProcess(args, proc.returncode, out, err)
+
+def resolve_engine(engine: str = "auto") -> str:
+    """`auto` choisit nmap s'il est installé, sinon le moteur asyncio TCP connect."""
+    if engine not in ENGINES:
+        raise ValueError(f"Moteur inconnu: {engine} (attendu: {', '.join(ENGINES)})")
+    if engine == "auto":
+        return "nmap" if ensure_nmap_installed() else "async"
+    return engine
+
+
+def _ping_args(network: str, ping_args: Optional[str] = None) -> List[str]:
+    if ping_args:
+        return ["nmap"] + ping_args.split() + ["-sn", network]
+    return ["nmap", "-sn", network]
+
+def _parse_ping_output(out: str) -> List[str]:
+    ips = []
+    for line in out.splitlines():
+        if line.strip().startswith("Nmap scan report for"):
+            parts = line.split()
+            ips.append(parts[-1].strip("()"))
+    return ips
+
+def split_network(network: str, block_prefix: int = DISCOVERY_BLOCK_PREFIX) -> List[str]:
+    """Sous-blocs IPv4 de `block_prefix` ; toute autre cible (nom, plage nmap, IPv6) reste entière."""
+    try:
+        net = ipaddress.ip_network(network.strip(), strict=False)
+    except ValueError:
+        return [network]
+    if net.version != 4 or net.prefixlen >= block_prefix:
+        return [str(net)]
+    return [str(sub) for sub in net.subnets(new_prefix=block_prefix)]
+
+class AdaptiveLimit:
+    """Nombre de nmap de découverte simultanés, ajusté comme une fenêtre TCP (AIMD).
 
-def discover_hosts_nmap(network: str, ping_args: Optional[str] = None) -> List[str]:
+    Un bloc en timeout ou en erreur divise la limite par deux. Après `limit`
+    blocs réussis d'affilée, elle augmente de 1, sauf si le dernier bloc a été
+    nettement plus lent que la moyenne (réseau ou hôte local saturé).
+    """
+
+    def __init__(self, maximum: int, initial: Optional[int] = None, minimum: int = 1):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.current = min(self.maximum, max(self.minimum, initial if initial is not None else 2))
+        self.avg_elapsed: Optional[float] = None
+        self.successes = 0
+        self.timeouts = 0
+        self._streak = 0
+        self._lock = threading.Lock()
+
+    def record(self, ok: bool, elapsed: float):
+        with self._lock:
+            if not ok:
+                self.timeouts += 1
+                self._streak = 0
+                self.current = max(self.minimum, self.current // 2)
+                return
+            self.successes += 1
+            slow = self.avg_elapsed is not None and elapsed > 2 * self.avg_elapsed
+            self.avg_elapsed = elapsed if self.avg_elapsed is None else 0.8 * self.avg_elapsed + 0.2 * elapsed
+            if slow:
+                self._streak = 0
+                return
+            self._streak += 1
+            if self._streak >= self.current:
+                self._streak = 0
+                self.current = min(self.maximum, self.current + 1)
+
+class DiscoveryFeed:
+    """Découverte `nmap -sn` par sous-blocs, consommable pendant qu'elle avance.
+
+    Les hôtes de chaque bloc sont disponibles dès que son nmap se termine :
+    `iter_scan_hosts` peut commencer à scanner avant la fin de la découverte.
+    Un bloc en timeout est redécoupé en deux moitiés, remises en tête de file.
+    """
+
+    _END = object()
+    PENDING = object()
+
+    def __init__(self, network: str, ping_args: Optional[str] = None, cancel_token: Optional[CancelToken] = None,
+                 parallel: int = 8, block_prefix: int = DISCOVERY_BLOCK_PREFIX,
+                 block_timeout: float = DISCOVERY_BLOCK_TIMEOUT, exclude: Optional[Set[str]] = None,
+                 slots: Optional[threading.Semaphore] = None):
+        self.network = network
+        # Processus nmap partagés avec le scan du même job (voir `nmap_slots`)
+        self.slots = slots
+        # Hôtes déjà traités (reprise d'un run) : découverts mais pas remis au scan
+        self.exclude = exclude or set()
+        self.skipped = 0
+        self.ping_args = ping_args
+        self.cancel_token = cancel_token
+        self.block_timeout = block_timeout
+        self.limit = AdaptiveLimit(maximum=max(1, parallel))
+        self.blocks = split_network(network, block_prefix)
+        self.addresses_total = sum(self._size(b) for b in self.blocks)
+        self.addresses_done = 0
+        self.discovered = 0
+        self.failed_blocks: List[str] = []
+        self.error: Optional[str] = None
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _size(block: str) -> int:
+        try:
+            return ipaddress.ip_network(block, strict=False).num_addresses
+        except ValueError:
+            return 1
+
+    @property
+    def done(self) -> bool:
+        return self._thread is not None and not self._thread.is_alive()
+
+    @property
+    def fraction_done(self) -> float:
+        return self.addresses_done / self.addresses_total if self.addresses_total else 1.0
+
+    def start(self) -> "DiscoveryFeed":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="nmap-discovery", daemon=True)
+            self._thread.start()
+        return self
+
+    def _discover_block(self, block: str):
+        with self.slots or nullcontext():
+            return self._run_block(block)
+
+    def _run_block(self, block: str):
+        # Chronométré après l'obtention du slot : l'attente ne doit pas passer pour de la lenteur réseau
+        start = time.perf_counter()
+        try:
+            proc = _run_nmap(_ping_args(block, self.ping_args), self.cancel_token, timeout=self.block_timeout)
+            return "ok", _parse_ping_output(proc.stdout), time.perf_counter() - start, None
+        except subprocess.TimeoutExpired:
+            return "timeout", [], time.perf_counter() - start, None
+        except subprocess.CalledProcessError as e:
+            return "error", [], time.perf_counter() - start, e.stderr or e.stdout
+
+    def _run(self):
+        pending = deque(self.blocks)
+        try:
+            with ThreadPoolExecutor(max_workers=self.limit.maximum) as ex:
+                running = {}
+                while True:
+                    while pending and len(running) < self.limit.current:
+                        if self.cancel_token and self.cancel_token.cancelled:
+                            pending.clear()
+                            break
+                        block = pending.popleft()
+                        running[ex.submit(self._discover_block, block)] = block
+                    if not running:
+                        return
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        block = running.pop(fut)
+                        try:
+                            status, ips, elapsed, message = fut.result()
+                        except ScanCancelled:
+                            pending.clear()
+                            continue
+                        self.limit.record(status == "ok", elapsed)
+                        if status == "timeout":
+                            try:
+                                net = ipaddress.ip_network(block, strict=False)
+                            except ValueError:
+                                net = None
+                            if net is not None and net.version == 4 and net.prefixlen < DISCOVERY_MIN_BLOCK_PREFIX:
+                                # Bloc trop lent : ses deux moitiés passent en priorité, avec moins de parallélisme
+                                pending.extendleft(reversed([str(h) for h in net.subnets(prefixlen_diff=1)]))
+                                continue
+                            self.failed_blocks.append(block)
+                        elif status == "error":
+                            self.failed_blocks.append(block)
+                            self.error = message or f"nmap -sn {block} a échoué"
+                        self.addresses_done += self._size(block)
+                        self.discovered += len(ips)
+                        for ip in ips:
+                            if ip in self.exclude:
+                                self.skipped += 1
+                                continue
+                            self._queue.put(ip)
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self._queue.put(self._END)
+
+    def take(self, block: bool = True):
+        """IP suivante ; None à la fin, `PENDING` si rien n'est prêt et `block` est faux."""
+        try:
+            item = self._queue.get(block=block)
+        except queue.Empty:
+            return self.PENDING
+        if item is self._END:
+            # Reposé pour les appels suivants (plusieurs consommateurs, ou take() après la fin)
+            self._queue.put(self._END)
+            if self.error and not self.discovered:
+                raise RuntimeError(f"Erreur discovery nmap: {self.error}")
+            return None
+        return item
+
+    def __iter__(self) -> Iterator[str]:
+        self.start()
+        while True:
+            ip = self.take()
+            if ip is None:
+                return
+            yield ip
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "blocks": len(self.blocks),
+            "failed_blocks": len(self.failed_blocks),
+            "discovered": self.discovered,
+            "skipped": self.skipped,
+            "parallel": self.limit.current,
+            "timeouts": self.limit.timeouts,
+        }
+
+def discover_hosts_nmap(network: str, ping_args: Optional[str] = None, cancel_token: Optional[CancelToken] = None,
+                        parallel: int = 8, stream: bool = False, exclude: Optional[Set[str]] = None,
+                        slots: Optional[threading.Semaphore] = None):
+    """Hôtes actifs de `network`.
+
+    Les grands réseaux IPv4 sont découpés en blocs (`DISCOVERY_BLOCK_PREFIX`)
+    découverts en parallèle. Avec `stream=True`, renvoie un `DiscoveryFeed`
+    déjà démarré, à passer directement à `iter_scan_hosts` ; les IP de
+    `exclude` n'y sont pas remises. `slots` borne les nmap -sn avec ceux du scan.
+    """
     if not ensure_nmap_installed():
         raise RuntimeError("nmap non installé. Installez 'nmap' via votre gestionnaire de paquets.")
-    args = ["nmap", "-sn", network]
-    if ping_args:
-        args = ["nmap"] + ping_args.split() + ["-sn", network]
+    if stream:
+        return DiscoveryFeed(network, ping_args, cancel_token, parallel=parallel, exclude=exclude, slots=slots).start()
+    if len(split_network(network)) > 1:
+        feed = DiscoveryFeed(network, ping_args, cancel_token, parallel=parallel, slots=slots)
+        return sorted(feed, key=ipaddress.ip_address)
     try:
-        proc = subprocess.run(args, capture_output=True, text=True, check=True)
-        out = proc.stdout
-        ips = []
-        for line in out.splitlines():
-            if line.strip().startswith("Nmap scan report for"):
-                parts = line.split()
-                ip = parts[-1].strip("()")
-                ips.append(ip)
-        return ips
+        proc = _run_nmap(_ping_args(network, ping_args), cancel_token)
+        return _parse_ping_output(proc.stdout)
     except subprocess.CalledProcessError as e:
         raise RuntimeError(f"Erreur discovery nmap: {e.stderr or e.stdout}")
 
@@ -69,11 +406,11 @@ def scan_host_with_python_nmap(ip: str, ports: List[int], scan_args: str = "-sT
     result["raw"] = scanner[ip] if ip in scanner.all_hosts() else {}
     return result
 
-def scan_host_with_subprocess(ip: str, ports: List[int], scan_args: str = "-sT -sV") -> Dict[str, Any]:
+def scan_host_with_subprocess(ip: str, ports: List[int], scan_args: str = "-sT -sV", cancel_token: Optional[CancelToken] = None) -> Dict[str, Any]:
     ports_str = ",".join(str(p) for p in ports)
     args = ["nmap"] + scan_args.split() + ["-p", ports_str, ip]
     try:
-        proc = subprocess.run(args, capture_output=True, text=True, check=True)
+        proc = _run_nmap(args, cancel_token)
         out = proc.stdout
         ports_info = []
         for line in out.splitlines():
@@ -112,68 +449,460 @@ def parse_ports(ports_str: str) -> List[int]:
             ports.add(int(part))
     return sorted(p for p in ports if 1 <= p <= 65535)
 
-def discover_and_scan(network: str, ports: List[int], parallel_hosts: int = 8, scan_args: str = "-sT -sV", ping_args: Optional[str] = None) -> Dict[str, Any]:
-    if not ensure_nmap_installed():
+# --- Mode bulk : un seul nmap par lot d'hôtes, sortie XML parsée en flux ---
+def _parse_host_element(host: ET.Element) -> Optional[Dict[str, Any]]:
+    ip = None
+    mac = None
+    for addr in host.findall("address"):
+        addrtype = addr.get("addrtype")
+        if addrtype in ("ipv4", "ipv6") and ip is None:
+            ip = addr.get("addr")
+        elif addrtype == "mac":
+            mac = addr.get("addr")
+    if ip is None:
+        return None
+
+    status = host.find("status")
+    hostname = host.find("hostnames/hostname")
+    ports_info = []
+    for port in host.findall("ports/port"):
+        state = port.find("state")
+        service = port.find("service")
+        try:
+            portnum = int(port.get("portid", ""))
+        except ValueError:
+            continue
+        ports_info.append({
+            "port": portnum,
+            "protocol": port.get("protocol", "tcp"),
+            "state": state.get("state", "") if state is not None else "",
+            "service": (service.get("name") or "") if service is not None else "",
+            "product": (service.get("product") or "") if service is not None else "",
+            "version": (service.get("version") or "") if service is not None else "",
+            "extrainfo": (service.get("extrainfo") or "") if service is not None else "",
+        })
+
+    result = {"ip": ip, "ports": ports_info}
+    if status is not None:
+        result["status"] = status.get("state", "")
+    if hostname is not None:
+        result["hostname"] = hostname.get("name", "")
+    if mac:
+        result["mac"] = mac
+    return result
+
+def parse_nmap_xml(stream) -> Iterator[Dict[str, Any]]:
+    """Parse incrémental d'une sortie `nmap -oX` : un dict par <host>, mémoire constante."""
+    root = None
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+            continue
+        if elem.tag == "host":
+            res = _parse_host_element(elem)
+            elem.clear()
+            if root is not None:
+                root.clear()
+            if res:
+                yield res
+
+def _chunks(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def scan_chunk_with_xml(hosts: List[str], ports: List[int], scan_args: str = "-sT -sV", cancel_token: Optional[CancelToken] = None) -> Iterator[Dict[str, Any]]:
+    ports_str = ",".join(str(p) for p in ports)
+    args = ["nmap"] + scan_args.split() + ["-p", ports_str, "-oX", "-", "-iL", "-"]
+    seen = set()
+    with tempfile.TemporaryFile() as err:
+        if cancel_token:
+            cancel_token.check()
+        # Même histogramme que _run_nmap (ok / error / cancelled), du lancement à la fin du processus
+        start = time.perf_counter()
+        outcome = "error"
+        proc = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=err)
+        if cancel_token:
+            cancel_token.register(proc)
+        try:
+            proc.stdin.write(("\n".join(hosts) + "\n").encode())
+            proc.stdin.close()
+            for res in parse_nmap_xml(proc.stdout):
+                seen.add(res["ip"])
+                yield res
+            outcome = "ok"
+        except GeneratorExit:
+            # Consommateur arrêté (annulation du scan) : le processus est tué ci-dessous
+            outcome = "cancelled"
+            raise
+        except ET.ParseError as e:
+            # Sortie XML tronquée par un kill : ce n'est pas une erreur de scan
+            if cancel_token:
+                cancel_token.check()
+            err.seek(0)
+            message = err.read().decode(errors="replace").strip() or str(e)
+            for ip in hosts:
+                if ip not in seen:
+                    seen.add(ip)
+                    yield {"ip": ip, "error": f"nmap bulk failed: {message}"}
+        finally:
+            if cancel_token:
+                cancel_token.unregister(proc)
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+            if cancel_token and cancel_token.cancelled:
+                outcome = "cancelled"
+            elif outcome == "ok" and proc.returncode:
+                outcome = "error"
+            _observe_nmap_run(outcome, start)
+    if cancel_token:
+        cancel_token.check()
+    # Hôtes absents de la sortie XML (ex. tombés entre découverte et scan)
+    for ip in hosts:
+        if ip not in seen:
+            yield {"ip": ip, "ports": [], "status": "down"}
+
+def scan_hosts_bulk(hosts: Iterable[str], ports: List[int], scan_args: str = "-sT -sV", chunk_size: int = 64, nmap_procs: int = 4, cancel_token: Optional[CancelToken] = None, slots: Optional[threading.Semaphore] = None) -> Iterator[Dict[str, Any]]:
+    """Scanne par lots de `chunk_size` hôtes avec au plus `nmap_procs` nmap simultanés."""
+    results: "queue.Queue" = queue.Queue(maxsize=chunk_size * max(1, nmap_procs))
+    chunk_iter = _chunks(hosts, max(1, chunk_size))
+    lock = threading.Lock()
+    closed = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        # Le consommateur peut abandonner le générateur : ne pas bloquer indéfiniment
+        while not closed.is_set():
+            try:
+                results.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker():
+        while True:
+            with lock:
+                stop = closed.is_set() or (cancel_token and cancel_token.cancelled)
+                chunk = None if stop else next(chunk_iter, None)
+            if chunk is None:
+                put(done)
+                return
+            try:
+                extra = (cancel_token,) if cancel_token else ()
+                with slots or nullcontext():
+                    for res in scan_chunk_with_xml(chunk, ports, scan_args, *extra):
+                        if not put(res):
+                            return
+            except ScanCancelled:
+                continue
+            except Exception as e:
+                for ip in chunk:
+                    if not put({"ip": ip, "error": str(e)}):
+                        return
+
+    workers = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, nmap_procs))]
+    for t in workers:
+        t.start()
+    remaining = len(workers)
+    try:
+        while remaining:
+            item = results.get()
+            if item is done:
+                remaining -= 1
+                continue
+            yield item
+    finally:
+        closed.set()
+
+def scan_host(ip: str, ports: List[int], scan_args: str, cancel_token: Optional[CancelToken] = None) -> Dict[str, Any]:
+    # python-nmap ne donne pas accès à son processus : un scan annulable passe par le subprocess
+    if NM_AVAILABLE and cancel_token is None:
+        return scan_host_with_python_nmap(ip, ports, scan_args)
+    return scan_host_with_subprocess(ip, ports, scan_args, cancel_token)
+
+def nmap_slots(parallel_hosts: int) -> threading.Semaphore:
+    """Budget de processus nmap d'un job : découverte, scan et sondes -sV y puisent ensemble.
+
+    Un job réserve `parallel_hosts` workers (ScanJobManager) ; sans ce partage, la
+    découverte en pipeline ou les sondes du mode diff s'ajouteraient à ce nombre.
+    """
+    return threading.Semaphore(max(1, parallel_hosts))
+
+def scan_host_limited(slots: Optional[threading.Semaphore], ip: str, ports: List[int], scan_args: str,
+                      cancel_token: Optional[CancelToken] = None) -> Dict[str, Any]:
+    with slots or nullcontext():
+        if cancel_token is not None:
+            return scan_host(ip, ports, scan_args, cancel_token)
+        return scan_host(ip, ports, scan_args)
+
+def iter_scan_hosts(hosts: Iterable[str], ports: List[int], parallel_hosts: int = 8, scan_args: str = "-sT -sV", bulk: bool = False, chunk_size: int = 64, cancel_token: Optional[CancelToken] = None, slots: Optional[threading.Semaphore] = None) -> Iterator[Dict[str, Any]]:
+    """Produit chaque résultat d'hôte dès que son scan se termine.
+
+    Au plus `2 * parallel_hosts` scans sont soumis à la fois : la mémoire reste
+    bornée quelle que soit la taille du réseau. En mode `bulk`, `parallel_hosts`
+    devient le nombre de processus nmap, chacun traitant `chunk_size` hôtes.
+    Après `cancel_token.cancel()`, plus aucun hôte n'est soumis. Avec un
+    `DiscoveryFeed`, les hôtes sont soumis au fil de la découverte. Avec `slots`
+    (voir `nmap_slots`), chaque nmap attend un slot du budget partagé.
+    """
+    if bulk:
+        yield from scan_hosts_bulk(hosts, ports, scan_args, chunk_size=chunk_size, nmap_procs=parallel_hosts, cancel_token=cancel_token, slots=slots)
+        return
+    parallel_hosts = max(1, parallel_hosts)
+    # Découverte en cours : prise non bloquante tant que des scans tournent, pour ne pas retarder leurs résultats
+    take = hosts.start().take if isinstance(hosts, DiscoveryFeed) else None
+    host_iter = iter(hosts) if take is None else None
+    exhausted = False
+    with ThreadPoolExecutor(max_workers=parallel_hosts) as ex:
+        futures = {}
+
+        def refill():
+            nonlocal exhausted
+            while not exhausted and len(futures) < parallel_hosts * 2:
+                if cancel_token and cancel_token.cancelled:
+                    return
+                ip = take(block=not futures) if take else next(host_iter, None)
+                if ip is DiscoveryFeed.PENDING:
+                    return
+                if ip is None:
+                    exhausted = True
+                    return
+                if slots is not None:
+                    futures[ex.submit(scan_host_limited, slots, ip, ports, scan_args, cancel_token)] = ip
+                elif cancel_token:
+                    futures[ex.submit(scan_host, ip, ports, scan_args, cancel_token)] = ip
+                else:
+                    futures[ex.submit(scan_host, ip, ports, scan_args)] = ip
+
+        refill()
+        while futures:
+            done, _ = wait(futures, timeout=None if exhausted else 0.2, return_when=FIRST_COMPLETED)
+            for fut in done:
+                ip = futures.pop(fut)
+                try:
+                    res = fut.result()
+                except ScanCancelled:
+                    continue
+                except Exception as e:
+                    res = {"ip": ip, "error": str(e)}
+                yield res
+            refill()
+
+def discover_and_scan(network: str, ports: List[int], parallel_hosts: int = 8, scan_args: str = "-sT -sV", ping_args: Optional[str] = None, on_host: Optional[Callable[[Dict[str, Any]], None]] = None, bulk: bool = False, chunk_size: int = 64, engine: str = "nmap", engine_opts: Optional[Dict[str, Any]] = None, skip_hosts: Optional[Set[str]] = None) -> Dict[str, Any]:
+    engine = resolve_engine(engine)
+    skip_hosts = skip_hosts or set()
+    skipped = 0
+    if engine == "nmap" and not ensure_nmap_installed():
         raise RuntimeError("nmap non installé sur le système. Installez 'nmap' d'abord.")
     start = time.time()
-    hosts = discover_hosts_nmap(network, ping_args=ping_args)
-    if not hosts:
-        return {"network": network, "hosts_scanned": 0, "results": [], "elapsed_seconds": time.time() - start}
+    if engine == "async":
+        from net_discovery_async import discover_hosts_async, iter_async_scan_hosts
+        hosts = discover_hosts_async(network, **(engine_opts or {}))
+        skipped = sum(1 for ip in hosts if ip in skip_hosts)
+        hosts = [ip for ip in hosts if ip not in skip_hosts]
+        scanner = iter_async_scan_hosts(hosts, ports, **(engine_opts or {}))
+    else:
+        # Découverte et scan en pipeline, dans un même budget de `parallel_hosts` processus nmap
+        slots = nmap_slots(parallel_hosts)
+        hosts = discover_hosts_nmap(network, ping_args=ping_args, parallel=parallel_hosts, stream=True,
+                                    exclude=skip_hosts, slots=slots)
+        scanner = iter_scan_hosts(hosts, ports, parallel_hosts, scan_args, bulk=bulk, chunk_size=chunk_size,
+                                  slots=slots)
+    if isinstance(hosts, list) and not hosts:
+        return {"network": network, "hosts_scanned": 0, "hosts_skipped": skipped, "results": [],
+                "elapsed_seconds": time.time() - start}
 
+    # Avec un callback, les résultats ne sont pas conservés en mémoire
     results = []
-    with ThreadPoolExecutor(max_workers=parallel_hosts) as ex:
-        futures = {}
-        for ip in hosts:
-            if NM_AVAILABLE:
-                futures[ex.submit(scan_host_with_python_nmap, ip, ports, scan_args)] = ip
-            else:
-                futures[ex.submit(scan_host_with_subprocess, ip, ports, scan_args)] = ip
-        for fut in as_completed(futures):
-            ip = futures[fut]
-            try:
-                res = fut.result()
-            except Exception as e:
-                res = {"ip": ip, "error": str(e)}
+    for res in scanner:
+        if on_host:
+            on_host(res)
+        else:
             results.append(res)
     elapsed = time.time() - start
-    return {"network": network, "hosts_scanned": len(hosts), "results": results, "elapsed_seconds": elapsed}
+    if isinstance(hosts, DiscoveryFeed):
+        hosts_scanned, skipped = hosts.discovered - hosts.skipped, hosts.skipped
+    else:
+        hosts_scanned = len(hosts)
+    return {"network": network, "hosts_scanned": hosts_scanned, "hosts_skipped": skipped, "results": results,
+            "elapsed_seconds": elapsed}
+
+# --- Sortie CLI : écriture au fil de l'eau, reprise d'un run interrompu ---
+
+OUTPUT_FORMATS = ("ndjson", "csv", "json")
+CSV_FIELDS = ["ip", "hostname", "error", "port", "protocol", "state", "service", "product", "version"]
+
+
+def _csv_rows(host: Dict[str, Any]) -> List[Dict[str, Any]]:
+    base = {"ip": host.get("ip"), "hostname": host.get("hostname", ""), "error": host.get("error", "")}
+    ports = host.get("ports") or []
+    if not ports:
+        return [base]
+    return [dict(base, **{k: p.get(k, "") for k in CSV_FIELDS[3:]}) for p in ports]
+
+
+class ResultWriter:
+    """Écrit les résultats hôte par hôte dans `path` ('-' pour stdout), vidé après chaque hôte.
+
+    ndjson : un objet JSON compact par ligne. csv : une ligne par port (une seule
+    pour un hôte sans port). json : un document compact dont le tableau `results`
+    est écrit au fil de l'eau et refermé par `close()`.
+    """
+
+    def __init__(self, path: str, fmt: str = "ndjson", append: bool = False, network: Optional[str] = None):
+        self.fmt = fmt
+        self.count = 0
+        if path == "-":
+            self._file, self._owned = sys.stdout, False
+        else:
+            self._file, self._owned = open(path, "a" if append else "w", newline="", encoding="utf-8"), True
+        if fmt == "csv":
+            self._csv = csv.DictWriter(self._file, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            if not (append and self._file.tell()):
+                self._csv.writeheader()
+        elif fmt == "json":
+            self._file.write('{"network":%s,"results":[' % json.dumps(network))
 
-def main():
+    def write(self, host: Dict[str, Any]):
+        # raw_output (sortie nmap complète) alourdit chaque ligne sans rien ajouter à "ports"
+        host = {k: v for k, v in host.items() if k != "raw_output"}
+        if self.fmt == "csv":
+            self._csv.writerows(_csv_rows(host))
+        else:
+            line = json.dumps(host, separators=(",", ":"), default=str)
+            if self.fmt == "ndjson":
+                self._file.write(line + "\n")
+            else:
+                self._file.write(("," if self.count else "") + line)
+        self.count += 1
+        self._file.flush()
+
+    def close(self, summary: Optional[Dict[str, Any]] = None):
+        if self.fmt == "json":
+            tail = {k: v for k, v in (summary or {}).items() if k not in ("network", "results")}
+            fields = json.dumps(tail, separators=(",", ":"), default=str)[1:-1]
+            self._file.write("]" + ("," + fields if fields else "") + "}\n")
+        self._file.flush()
+        if self._owned:
+            self._file.close()
+
+
+def load_completed_hosts(path: str, fmt: str = "ndjson") -> Set[str]:
+    """IP déjà scannées sans erreur dans un fichier ndjson ou csv existant.
+
+    Une dernière ligne incomplète (run coupé en pleine écriture) est retirée du
+    fichier, pour que la reprise ajoute ses lignes à la suite d'une ligne propre.
+    Les hôtes en erreur ne sont pas retenus : ils seront rescannés.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    header = None
+    with open(path, "rb+") as f:
+        valid = 0
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            valid += len(raw)
+            line = raw.decode("utf-8", "replace")
+            if fmt == "csv":
+                row = next(csv.reader([line]), None)
+                if not row:
+                    continue
+                if header is None:
+                    header = row
+                    continue
+                rec = dict(zip(header, row))
+            else:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+            if isinstance(rec, dict) and rec.get("ip") and not rec.get("error"):
+                done.add(rec["ip"])
+        f.truncate(valid)
+    return done
+
+
+def _print_host(host: Dict[str, Any], out=None):
+    out = out or sys.stdout
+    if host.get("error"):
+        print(f"- {host.get('ip')} ERROR: {host.get('error')}", file=out)
+        return
+    open_ports = [p for p in host.get("ports", []) if p.get("state","") == "open" or p.get("open", False)]
+    print(f"- {host['ip']}  open_ports={len(open_ports)}", file=out)
+    for p in open_ports:
+        svc = p.get("service") or p.get("product") or ""
+        ver = p.get("version") or ""
+        raw = p.get("raw", "")
+        print(f"    -> {p['port']}/{p.get('protocol','tcp')}  {svc} {ver} {raw}", file=out)
+
+def main(argv: Optional[List[str]] = None):
     parser = argparse.ArgumentParser(description="Discovery + nmap scan")
     parser.add_argument("--network", "-n", required=True, help="CIDR réseau ex: 192.168.1.0/24")
     parser.add_argument("--ports", "-p", default="22,80,443", help="Ports ou plages: 22,80,8000-8010")
     parser.add_argument("--parallel", type=int, default=8, help="Hôtes scannés en parallèle")
     parser.add_argument("--scan-args", default="-sT -sV", help="Arguments nmap pour le scan")
     parser.add_argument("--ping-args", default=None, help="Args nmap pour la découverte")
-    parser.add_argument("--json", action="store_true", help="Sauvegarder la sortie JSON")
-    args = parser.parse_args()
+    parser.add_argument("--bulk", action="store_true", help="Un seul nmap par lot d'hôtes (sortie XML)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Hôtes par processus nmap en mode bulk")
+    parser.add_argument("--engine", choices=ENGINES, default="auto", help="Moteur de scan (auto: nmap si installé, sinon asyncio)")
+    parser.add_argument("--concurrency", type=int, default=512, help="Connexions simultanées max (moteur async)")
+    parser.add_argument("--timeout", type=float, default=1.0, help="Timeout initial en secondes (moteur async)")
+    parser.add_argument("--banner", action="store_true", help="Lire la bannière des ports ouverts (moteur async)")
+    parser.add_argument("--output", "-o", default=None, help="Fichier de résultats écrit hôte par hôte ('-' = stdout)")
+    parser.add_argument("--format", "-f", choices=OUTPUT_FORMATS, default="ndjson", help="Format de --output (json: document compact)")
+    parser.add_argument("--resume", action="store_true", help="Reprendre un run : saute les hôtes déjà présents dans --output")
+    parser.add_argument("--json", action="store_true", help="Alias de --format json --output scan_results_nmap.json")
+    args = parser.parse_args(argv)
+    if args.json and not args.output:
+        args.output, args.format = "scan_results_nmap.json", "json"
+    if args.resume and (not args.output or args.output == "-" or args.format == "json"):
+        parser.error("--resume requiert --output FICHIER au format ndjson ou csv")
 
+    # Résultats sur stdout : le texte lisible passe sur stderr
+    log = sys.stderr if args.output == "-" else sys.stdout
     ports = parse_ports(args.ports)
-    print(f"[i] Network: {args.network} | Ports: {ports[:10]}{'...' if len(ports)>10 else ''}")
+    print(f"[i] Network: {args.network} | Ports: {ports[:10]}{'...' if len(ports)>10 else ''}", file=log)
+    skip = load_completed_hosts(args.output, args.format) if args.resume else set()
+    if skip:
+        print(f"[i] Reprise: {len(skip)} hôtes déjà traités dans {args.output}", file=log)
+    writer = ResultWriter(args.output, args.format, append=args.resume, network=args.network) if args.output else None
+
+    def on_host(host):
+        if writer:
+            writer.write(host)
+        _print_host(host, log)
+
     try:
-        summary = discover_and_scan(args.network, ports, parallel_hosts=args.parallel, scan_args=args.scan_args, ping_args=args.ping_args)
+        engine_opts = {"concurrency": args.concurrency, "timeout": args.timeout, "banner": args.banner}
+        summary = discover_and_scan(args.network, ports, parallel_hosts=args.parallel, scan_args=args.scan_args, ping_args=args.ping_args, on_host=on_host, bulk=args.bulk, chunk_size=args.chunk_size, engine=args.engine, engine_opts=engine_opts, skip_hosts=skip)
+    except KeyboardInterrupt:
+        if writer:
+            writer.close()
+        print(f"\n[!] Interrompu après {writer.count if writer else 0} hôtes"
+              + (f" — relancer avec --resume -o {args.output}" if writer and args.format != "json" else ""), file=log)
+        sys.exit(130)
     except Exception as e:
-        print(f"[!] Erreur: {e}")
+        if writer:
+            writer.close()
+        print(f"[!] Erreur: {e}", file=log)
         sys.exit(1)
 
-    print(f"\nScan terminé en {summary['elapsed_seconds']:.2f}s — hôtes trouvés: {summary['hosts_scanned']}\n")
-    for host in summary["results"]:
-        if host.get("error"):
-            print(f"- {host.get('ip')} ERROR: {host.get('error')}")
-            continue
-        open_ports = [p for p in host.get("ports", []) if p.get("state","") == "open" or p.get("open", False)]
-        print(f"- {host['ip']}  open_ports={len(open_ports)}")
-        for p in open_ports:
-            svc = p.get("service") or p.get("product") or ""
-            ver = p.get("version") or ""
-            raw = p.get("raw", "")
-            print(f"    -> {p['port']}/{p.get('protocol','tcp')}  {svc} {ver} {raw}")
-
-    if args.json:
-        fname = "scan_results_nmap.json"
-        with open(fname, "w") as f:
-            json.dump(summary, f, indent=2)
-        print(f"[i] Résultats sauvegardés dans {fname}")
+    if writer:
+        writer.close(summary)
+    print(f"\nScan terminé en {summary['elapsed_seconds']:.2f}s — hôtes scannés: {summary['hosts_scanned']}"
+          + (f" (déjà traités: {summary['hosts_skipped']})" if summary.get("hosts_skipped") else ""), file=log)
+    if writer and args.output != "-":
+        print(f"[i] Résultats sauvegardés dans {args.output}", file=log)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,205 @@
+import json
+import operator
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+ALERT_RULES_FILE = os.environ.get("ALERT_RULES_FILE", "")
+
+OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+RULE_TYPES = ("threshold", "rate")
+
+# Règles par défaut si aucun fichier n'est fourni
+DEFAULT_RULES = [
+    {"name": "cpu_high", "measurement": "system_metrics", "field": "cpu_percent",
+     "op": ">", "threshold": 90, "clear": 80, "for": 60, "severity": "warning"},
+    {"name": "memory_high", "measurement": "system_metrics", "field": "memory_percent",
+     "op": ">", "threshold": 90, "clear": 85, "for": 60, "severity": "warning"},
+    {"name": "disk_full", "measurement": "system_metrics", "field": "disk_percent",
+     "op": ">", "threshold": 90, "clear": 88, "severity": "critical"},
+]
+
+
+class Rule:
+    """Règle de seuil ou de variation (par seconde, sur `window` secondes).
+
+    `clear` fixe le seuil de retour à la normale (hystérésis) ; `for` impose
+    que la condition tienne N secondes avant de déclencher ; `repeat` relance
+    la notification d'une alerte toujours active.
+    """
+
+    def __init__(self, spec: dict):
+        self.name = spec["name"]
+        self.measurement = spec.get("measurement", "*")
+        self.field = spec["field"]
+        self.type = spec.get("type", "threshold")
+        if self.type not in RULE_TYPES:
+            raise ValueError(f"type de règle inconnu: {self.type}")
+        self.op_name = spec.get("op", ">")
+        if self.op_name not in OPERATORS:
+            raise ValueError(f"opérateur inconnu: {self.op_name}")
+        self.op = OPERATORS[self.op_name]
+        self.threshold = float(spec["threshold"])
+        self.clear = float(spec.get("clear", self.threshold))
+        self.for_seconds = float(spec.get("for", 0))
+        self.window = float(spec.get("window", 60))
+        self.repeat = float(spec.get("repeat", 0))
+        self.tags = spec.get("tags") or {}
+        self.severity = spec.get("severity", "warning")
+        self.channel = spec.get("channel")
+
+    def matches(self, tags: dict) -> bool:
+        return all(tags.get(k) == v for k, v in self.tags.items())
+
+    def cleared(self, value: float) -> bool:
+        # Retour sous (ou au-dessus de) `clear`, dans le sens opposé à l'opérateur
+        if self.op_name in (">", ">="):
+            return value < self.clear
+        return value > self.clear
+
+
+class SeriesState:
+    __slots__ = ("window", "pending_since", "firing", "fired_at", "notified_at")
+
+    def __init__(self):
+        self.window: deque = deque()
+        self.pending_since: Optional[float] = None
+        self.firing = False
+        self.fired_at: Optional[float] = None
+        self.notified_at: Optional[float] = None
+
+
+class AlertEngine:
+    """Évalue les règles au fil des échantillons, en O(1) amorti par échantillon et par règle.
+
+    Seules les transitions (déclenchement, résolution) produisent un événement :
+    une alerte active n'est pas renotifiée à chaque échantillon.
+    """
+
+    def __init__(self, rules: Optional[List[dict]] = None, on_event: Optional[Callable[[dict], None]] = None):
+        self.on_event = on_event
+        self._rules: Dict[str, List[Rule]] = {}
+        self._states: Dict[Tuple, SeriesState] = {}
+        self._lock = threading.Lock()
+        self.set_rules(rules or [])
+
+    def set_rules(self, specs: List[dict]):
+        by_measurement: Dict[str, List[Rule]] = {}
+        for spec in specs:
+            rule = Rule(spec)
+            by_measurement.setdefault(rule.measurement, []).append(rule)
+        with self._lock:
+            self._rules = by_measurement
+            self._states.clear()
+
+    @property
+    def rules(self) -> List[Rule]:
+        return [r for rules in self._rules.values() for r in rules]
+
+    def observe(self, measurement: str, fields: dict, tags: Optional[dict] = None,
+                ts: Optional[float] = None) -> List[dict]:
+        rules = self._rules.get(measurement, []) + self._rules.get("*", [])
+        if not rules:
+            return []
+        ts = time.time() if ts is None else ts
+        tags = tags or {}
+        events = []
+        with self._lock:
+            for rule in rules:
+                value = fields.get(rule.field)
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or not rule.matches(tags):
+                    continue
+                key = (rule.name, measurement, tuple(sorted(tags.items())))
+                state = self._states.get(key)
+                if state is None:
+                    state = self._states[key] = SeriesState()
+                event = self._evaluate(rule, state, float(value), ts)
+                if event:
+                    event.update(measurement=measurement, tags=dict(tags))
+                    events.append(event)
+        for event in events:
+            if self.on_event:
+                try:
+                    self.on_event(event)
+                except Exception as e:
+                    print(f"[alerts] on_event: {e}")
+        return events
+
+    def _evaluate(self, rule: Rule, state: SeriesState, value: float, ts: float) -> Optional[dict]:
+        if rule.type == "rate":
+            window = state.window
+            window.append((ts, value))
+            while len(window) > 1 and ts - window[0][0] > rule.window:
+                window.popleft()
+            first_ts, first_value = window[0]
+            if ts <= first_ts:
+                return None
+            value = (value - first_value) / (ts - first_ts)
+
+        if state.firing:
+            if rule.cleared(value):
+                state.firing = False
+                state.pending_since = None
+                return self._event(rule, "resolved", value, ts, state)
+            if rule.repeat and ts - state.notified_at >= rule.repeat:
+                state.notified_at = ts
+                return self._event(rule, "firing", value, ts, state, repeated=True)
+            return None
+
+        if not rule.op(value, rule.threshold):
+            state.pending_since = None
+            return None
+        if state.pending_since is None:
+            state.pending_since = ts
+        if ts - state.pending_since < rule.for_seconds:
+            return None
+        state.firing = True
+        state.fired_at = state.notified_at = ts
+        return self._event(rule, "firing", value, ts, state)
+
+    @staticmethod
+    def _event(rule: Rule, status: str, value: float, ts: float, state: SeriesState, repeated: bool = False) -> dict:
+        return {
+            "rule": rule.name,
+            "status": status,
+            "severity": rule.severity,
+            "field": rule.field,
+            "type": rule.type,
+            "op": rule.op_name,
+            "threshold": rule.threshold,
+            "value": round(value, 3),
+            "since": state.fired_at,
+            "ts": ts,
+            "channel": rule.channel,
+            "repeated": repeated,
+        }
+
+    def active(self) -> List[dict]:
+        with self._lock:
+            return [
+                {"rule": key[0], "measurement": key[1], "tags": dict(key[2]), "since": state.fired_at}
+                for key, state in self._states.items() if state.firing
+            ]
+
+
+def load_rules(path: str = ALERT_RULES_FILE) -> List[dict]:
+    if not path:
+        return list(DEFAULT_RULES)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"[alerts] règles {path}: {e} — règles par défaut utilisées")
+        return list(DEFAULT_RULES)
+
+
+def format_alert(event: dict) -> str:
+    tags = " ".join(f"{k}={v}" for k, v in sorted(event.get("tags", {}).items()))
+    metric = f"{event['measurement']}.{event['field']}" + ("/s" if event["type"] == "rate" else "")
+    if event["status"] == "resolved":
+        return f"✅ Résolu {event['rule']} : {metric} = {event['value']} {tags}".strip()
+    icon = "🚨" if event["severity"] == "critical" else "⚠️"
+    return f"{icon} [{event['severity']}] {event['rule']} : {metric} = {event['value']} " \
+           f"({event['op']} {event['threshold']:g}) {tags}".strip()
@@ -1,5 +1,30 @@
-import requests
 import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL", "https://api.telegram.org")
+TELEGRAM_TIMEOUT = float(os.environ.get("TELEGRAM_TIMEOUT", 5.0))
+TELEGRAM_BATCH_WINDOW = float(os.environ.get("TELEGRAM_BATCH_WINDOW", 2.0))
+TELEGRAM_RATE_PER_MINUTE = float(os.environ.get("TELEGRAM_RATE_PER_MINUTE", 20))
+MAX_MESSAGE_LENGTH = 4096
+
+_session: Optional[requests.Session] = None
+notifier = None
+
+
+def get_session() -> requests.Session:
+    """Session HTTP partagée : connexions TLS réutilisées d'un envoi à l'autre."""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        _session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        _session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+    return _session
+
 
 def send_telegram_alert(message: str):
     token = os.environ.get("TELEGRAM_BOT_TOKEN")
@@ -8,11 +33,177 @@ def send_telegram_alert(message: str):
         print("⚠️ Token ou chat_id Telegram manquant.")
         return
 
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
+    url = f"{TELEGRAM_API_URL}/bot{token}/sendMessage"
     payload = {"chat_id": chat_id, "text": message}
     try:
-        response = requests.post(url, json=payload)
+        response = get_session().post(url, json=payload, timeout=TELEGRAM_TIMEOUT)
         response.raise_for_status()
         print("📨 Alerte Telegram envoyée.")
     except requests.exceptions.RequestException as e:
         print(f"❌ Erreur Telegram: {e}")
+
+
+def build_digest(messages: List[str]) -> List[str]:
+    """Regroupe une rafale en un message (découpé sous la limite Telegram de 4096 caractères)."""
+    if len(messages) == 1:
+        return [messages[0][:MAX_MESSAGE_LENGTH]]
+    header = f"📋 {len(messages)} alertes :"
+    chunks, current = [], header
+    for msg in messages:
+        line = msg[:MAX_MESSAGE_LENGTH - len(header) - 1]
+        if len(current) + 1 + len(line) > MAX_MESSAGE_LENGTH:
+            chunks.append(current)
+            current = header
+        current += "\n" + line
+    chunks.append(current)
+    return chunks
+
+
+class TelegramNotifier:
+    """File d'envoi en arrière-plan : `submit()` ne bloque jamais l'appelant.
+
+    Par canal (chat_id), les messages arrivés pendant `batch_window` secondes
+    sont fusionnés en un digest, et les envois sont espacés pour respecter
+    `rate_per_minute`. Erreurs réseau, 5xx et 429 sont retentés avec backoff.
+    """
+
+    def __init__(self, token: str, default_chat_id: str, api_url: str = TELEGRAM_API_URL,
+                 timeout: float = TELEGRAM_TIMEOUT, batch_window: float = TELEGRAM_BATCH_WINDOW,
+                 rate_per_minute: float = TELEGRAM_RATE_PER_MINUTE, max_retries: int = 3,
+                 max_queue: int = 1000, session: Optional[requests.Session] = None):
+        self.url = f"{api_url.rstrip('/')}/bot{token}/sendMessage"
+        self.default_chat_id = default_chat_id
+        self.timeout = timeout
+        self.batch_window = batch_window
+        self.min_interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self.max_retries = max_retries
+        self.max_queue = max_queue
+        self.session = session or get_session()
+
+        self._pending: Dict[str, List[Tuple[float, str]]] = {}
+        self._next_allowed: Dict[str, float] = {}
+        self._queued = 0
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+        self.sent_messages = 0
+        self.sent_alerts = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retries = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["TelegramNotifier"]:
+        token = os.environ.get("TELEGRAM_BOT_TOKEN")
+        chat_id = os.environ.get("TELEGRAM_CHAT_ID")
+        if not token or not chat_id:
+            return None
+        return cls(token, chat_id)
+
+    # --- Cycle de vie ---
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="telegram-notifier", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def submit(self, message: str, chat_id: Optional[str] = None) -> bool:
+        if not self._running:
+            self.start()
+        chat = str(chat_id or self.default_chat_id)
+        with self._cond:
+            if self._queued >= self.max_queue:
+                self.dropped += 1
+                return False
+            self._pending.setdefault(chat, []).append((time.monotonic(), message))
+            self._queued += 1
+            self._cond.notify()
+        return True
+
+    # --- Boucle d'envoi ---
+    def _due(self, now: float) -> Tuple[List[Tuple[str, List[str]]], Optional[float]]:
+        """Canaux prêts (fenêtre de batch écoulée et débit respecté) et prochaine échéance."""
+        ready, next_due = [], None
+        for chat, items in list(self._pending.items()):
+            due = max(items[0][0] + self.batch_window, self._next_allowed.get(chat, 0.0))
+            # À l'arrêt, on vide la file sans attendre la fenêtre de batch
+            if due <= now or not self._running:
+                ready.append((chat, [m for _, m in items]))
+                self._queued -= len(items)
+                del self._pending[chat]
+            elif next_due is None or due < next_due:
+                next_due = due
+        return ready, next_due
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._running and not self._pending:
+                    return
+                ready, next_due = self._due(time.monotonic())
+                if not ready:
+                    self._cond.wait(max(0.0, next_due - time.monotonic()))
+                    continue
+            for chat, messages in ready:
+                for text in build_digest(messages):
+                    if self._send(chat, text):
+                        self.sent_messages += 1
+                    else:
+                        self.failed += 1
+                self.sent_alerts += len(messages)
+                self._next_allowed[chat] = time.monotonic() + self.min_interval
+
+    def _send(self, chat_id: str, text: str) -> bool:
+        delay = 1.0
+        for attempt in range(self.max_retries + 1):
+            try:
+                resp = self.session.post(self.url, json={"chat_id": chat_id, "text": text}, timeout=self.timeout)
+                if resp.status_code == 429:
+                    try:
+                        delay = float(resp.json().get("parameters", {}).get("retry_after", delay))
+                    except ValueError:
+                        pass
+                elif resp.status_code < 500:
+                    if resp.status_code >= 400:
+                        print(f"[telegram] rejeté ({resp.status_code}): {resp.text[:200]}")
+                        return False
+                    return True
+            except requests.exceptions.RequestException as e:
+                print(f"[telegram] {e}")
+            if attempt < self.max_retries:
+                self.retries += 1
+                time.sleep(delay)
+                delay = min(delay * 2, 30.0)
+        return False
+
+    def stats(self) -> dict:
+        with self._cond:
+            queued = self._queued
+        return {
+            "queued": queued,
+            "sent_messages": self.sent_messages,
+            "sent_alerts": self.sent_alerts,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "retries": self.retries,
+        }
+
+
+def get_notifier() -> Optional[TelegramNotifier]:
+    """Notifier partagé, créé à la première alerte si TELEGRAM_BOT_TOKEN / TELEGRAM_CHAT_ID sont définis."""
+    global notifier
+    if notifier is None:
+        notifier = TelegramNotifier.from_env()
+    return notifier
@@ -0,0 +1,168 @@
+import gzip
+import hashlib
+import io
+import mimetypes
+import os
+import re
+import stat
+import threading
+from typing import Dict, Optional, Tuple
+
+from flask import abort, current_app, has_app_context, request, send_file
+from werkzeug.security import safe_join
+
+# Optional: brotli (sinon gzip seul)
+try:
+    import brotli  # type: ignore
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# URL à empreinte (/static/css/style.<hash>.css) : le contenu ne change jamais, cache d'un an
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# URL sans empreinte ou périmée : revalidation par ETag à chaque usage
+REVALIDATE_CACHE = "no-cache"
+# Pages HTML derrière login : cache navigateur uniquement, revalidé (304 si le rendu est identique)
+PAGE_CACHE = "private, no-cache"
+
+HASH_LENGTH = 12
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+COMPRESS_MIN_SIZE = 512
+_FINGERPRINTED = re.compile(r"^(?P<stem>.+)\.(?P<digest>[0-9a-f]{%d})(?P<ext>\.[^./]+)$" % HASH_LENGTH)
+
+class Asset:
+    """Fichier statique : empreinte du contenu et variantes précompressées (texte uniquement, en mémoire)."""
+
+    __slots__ = ("path", "mtime", "size", "digest", "mimetype", "variants")
+
+    def __init__(self, path: str, st: os.stat_result):
+        with open(path, "rb") as f:
+            data = f.read()
+        self.path = path
+        self.mtime = st.st_mtime_ns
+        self.size = st.st_size
+        self.digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+        self.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        # Les binaires (images) restent sur disque, servis par send_file
+        self.variants: Dict[str, bytes] = {}
+        if self.mimetype.startswith(COMPRESSIBLE_TYPES):
+            self.variants["identity"] = data
+            if len(data) >= COMPRESS_MIN_SIZE:
+                candidates = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+                if BROTLI_AVAILABLE:
+                    candidates["br"] = brotli.compress(data, quality=11)
+                self.variants.update({k: v for k, v in candidates.items() if len(v) < len(data)})
+
+    def encoding_for(self, accept_encodings) -> str:
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and accept_encodings[encoding]:
+                return encoding
+        return "identity"
+
+
+class AssetManifest:
+    """Index des fichiers de `folder`, calculé au démarrage.
+
+    Chaque accès vérifie mtime/taille : un fichier modifié (développement) est
+    réindexé, son empreinte et donc son URL changent.
+    """
+
+    def __init__(self, folder: str):
+        self.folder = os.path.abspath(folder)
+        self._assets: Dict[str, Asset] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._assets)
+
+    def scan(self) -> "AssetManifest":
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                self.get(os.path.relpath(os.path.join(root, name), self.folder).replace(os.sep, "/"))
+        return self
+
+    def get(self, filename: str) -> Optional[Asset]:
+        path = safe_join(self.folder, filename)
+        if path is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        asset = self._assets.get(filename)
+        if asset is None or asset.mtime != st.st_mtime_ns or asset.size != st.st_size:
+            asset = Asset(path, st)
+            with self._lock:
+                self._assets[filename] = asset
+        return asset
+
+    def url(self, filename: str) -> str:
+        asset = self.get(filename)
+        stem, ext = os.path.splitext(filename)
+        if asset is None or not ext:
+            return f"/static/{filename}"
+        return f"/static/{stem}.{asset.digest}{ext}"
+
+    def resolve(self, filename: str) -> Tuple[Optional[Asset], bool]:
+        """(asset, immuable) : l'URL à empreinte n'est immuable que si l'empreinte est la bonne."""
+        asset = self.get(filename)
+        if asset is not None:
+            return asset, False
+        match = _FINGERPRINTED.match(filename)
+        if not match:
+            return None, False
+        asset = self.get(match.group("stem") + match.group("ext"))
+        # Empreinte périmée (page en cache plus ancienne que l'asset) : contenu actuel, non immuable
+        return asset, asset is not None and asset.digest == match.group("digest")
+
+    def response(self, filename: str):
+        asset, immutable = self.resolve(filename)
+        if asset is None:
+            abort(404)
+        encoding = asset.encoding_for(request.accept_encodings)
+        etag = asset.digest if encoding == "identity" else f"{asset.digest}-{encoding}"
+        if asset.variants:
+            resp = send_file(
+                io.BytesIO(asset.variants[encoding]), mimetype=asset.mimetype, etag=etag, conditional=True,
+                last_modified=asset.mtime / 1e9, max_age=None
+            )
+            if encoding != "identity":
+                resp.headers["Content-Encoding"] = encoding
+            if len(asset.variants) > 1:
+                resp.vary.add("Accept-Encoding")
+        else:
+            resp = send_file(asset.path, mimetype=asset.mimetype, etag=etag, conditional=True, max_age=None)
+        resp.headers["Cache-Control"] = IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE
+        return resp
+
+
+def asset_url(filename: str) -> str:
+    """Équivalent de url_for('static') avec empreinte du contenu ; exposé aux templates."""
+    manifest = current_app.extensions.get("assets") if has_app_context() else None
+    if manifest is None:
+        return f"/static/{filename}"
+    return manifest.url(filename)
+
+
+def cache_page(response):
+    """Pages HTML (y compris celles chargées par le routeur SPA) : ETag du rendu, 304 si inchangé."""
+    if (request.method == "GET" and response.status_code == 200 and response.mimetype == "text/html"
+            and not response.direct_passthrough):
+        response.add_etag()
+        response.headers["Cache-Control"] = PAGE_CACHE
+        response.vary.add("Cookie")
+        response.make_conditional(request)
+    return response
+
+
+def init_assets(app, folder: Optional[str] = None):
+    """Remplace la route statique de Flask : empreintes, variantes gzip/brotli, cache long."""
+    manifest = AssetManifest(folder or os.path.join(app.root_path, "static")).scan()
+    app.extensions["assets"] = manifest
+    app.add_url_rule("/static/<path:filename>", endpoint="static", view_func=manifest.response)
+    app.jinja_env.globals["asset_url"] = asset_url
+    app.after_request(cache_page)
+    print(f"[assets] {len(manifest)} fichiers indexés (gzip{', brotli' if BROTLI_AVAILABLE else ''})")
+    return manifest
@@ -0,0 +1,191 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+# Établissement / vérification de la connexion uniquement
+BACKEND_TIMEOUT = float(os.environ.get("BACKEND_TIMEOUT", 3.0))
+# Écritures par lots et requêtes Flux (query_stream) : délai du client InfluxDB (10 s, son défaut)
+INFLUXDB_TIMEOUT = float(os.environ.get("INFLUXDB_TIMEOUT", 10.0))
+BACKEND_RETRY_MAX = float(os.environ.get("BACKEND_RETRY_MAX", 60.0))
+BACKEND_HEALTH_INTERVAL = float(os.environ.get("BACKEND_HEALTH_INTERVAL", 30.0))
+
+
+class BackendDisabled(Exception):
+    """Backend non configuré : pas de nouvelle tentative."""
+
+
+class Backend:
+    def __init__(self, name: str, connect: Callable[[], Any], check: Optional[Callable[[Any], Any]] = None):
+        self.name = name
+        self.connect = connect
+        self.check = check
+        self.client = None
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.latency_ms: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.attempts = 0
+        self.ready_callbacks: List[Callable[[Any], None]] = []
+
+    def to_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "error": self.error,
+            "latency_ms": self.latency_ms,
+            "checked_at": self.checked_at,
+            "attempts": self.attempts,
+        }
+
+
+class BackendManager:
+    """Connexions aux backends (InfluxDB, Docker) établies en arrière-plan, jamais à l'import.
+
+    Chaque backend a son thread : connexion avec timeout, nouvelles tentatives
+    en backoff exponentiel, puis vérification périodique. Les callbacks
+    `on_ready` sont appelés une fois, à la première connexion réussie.
+    """
+
+    def __init__(self, retry_max: float = BACKEND_RETRY_MAX, health_interval: float = BACKEND_HEALTH_INTERVAL):
+        self.retry_max = retry_max
+        self.health_interval = health_interval
+        self._backends: Dict[str, Backend] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._started = False
+
+    def register(self, name: str, connect: Callable[[], Any], check: Optional[Callable[[Any], Any]] = None):
+        self._backends[name] = Backend(name, connect, check)
+
+    def on_ready(self, name: str, callback: Callable[[Any], None]):
+        backend = self._backends[name]
+        with self._lock:
+            client = backend.client if backend.status == "up" else None
+            if client is None:
+                backend.ready_callbacks.append(callback)
+        if client is not None:
+            callback(client)
+
+    def get(self, name: str):
+        backend = self._backends.get(name)
+        return backend.client if backend else None
+
+    def start(self):
+        if self._started:
+            return
+        self._started = True
+        self._stop.clear()
+        for backend in self._backends.values():
+            threading.Thread(target=self._run, args=(backend,), name=f"backend-{backend.name}", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def connect_now(self, name: str) -> bool:
+        """Connexion synchrone (CLI, tests) ; renvoie True si le backend est disponible."""
+        backend = self._backends[name]
+        if backend.status != "up":
+            self._attempt(backend)
+        return backend.status == "up"
+
+    def _attempt(self, backend: Backend):
+        backend.attempts += 1
+        backend.status = "connecting" if backend.client is None else backend.status
+        start = time.perf_counter()
+        try:
+            client = backend.connect()
+            if backend.check:
+                backend.check(client)
+        except BackendDisabled as e:
+            backend.status, backend.error = "disabled", str(e)
+            return
+        except Exception as e:
+            backend.status, backend.error = "down", str(e)
+            backend.checked_at = time.time()
+            print(f"[backends] {backend.name} indisponible: {e}")
+            return
+        backend.latency_ms = (time.perf_counter() - start) * 1000
+        backend.checked_at = time.time()
+        backend.error = None
+        with self._lock:
+            backend.client = client
+            backend.status = "up"
+            callbacks, backend.ready_callbacks = backend.ready_callbacks, []
+        print(f"[backends] {backend.name} connecté en {backend.latency_ms:.0f} ms")
+        for callback in callbacks:
+            try:
+                callback(client)
+            except Exception as e:
+                print(f"[backends] {backend.name} on_ready: {e}")
+
+    def _health_check(self, backend: Backend):
+        start = time.perf_counter()
+        try:
+            if backend.check:
+                backend.check(backend.client)
+            backend.status, backend.error = "up", None
+            backend.latency_ms = (time.perf_counter() - start) * 1000
+        except Exception as e:
+            backend.status, backend.error = "down", str(e)
+        backend.checked_at = time.time()
+
+    def _run(self, backend: Backend):
+        delay = 1.0
+        while not self._stop.is_set():
+            if backend.client is None:
+                self._attempt(backend)
+                if backend.status == "disabled":
+                    return
+                if backend.client is None:
+                    self._stop.wait(delay)
+                    delay = min(self.retry_max, delay * 2)
+                    continue
+            # Connecté : le client est conservé, seule la disponibilité est revérifiée
+            if self._stop.wait(self.health_interval):
+                return
+            self._health_check(backend)
+
+    def health(self) -> dict:
+        backends = {name: b.to_dict() for name, b in self._backends.items()}
+        statuses = {b["status"] for b in backends.values()}
+        if statuses <= {"up", "disabled"}:
+            status = "ok"
+        elif statuses & {"pending", "connecting"} and not statuses & {"down"}:
+            status = "starting"
+        else:
+            status = "degraded"
+        return {"status": status, "backends": backends}
+
+
+# --- Connecteurs ---
+def connect_influxdb(url: str, token: str, org: str, bucket: str, timeout: float = INFLUXDB_TIMEOUT):
+    if not all([token, org, bucket]):
+        raise BackendDisabled("INFLUXDB_TOKEN / INFLUXDB_ORG / INFLUXDB_BUCKET non définis")
+    # Import tardif : le client InfluxDB est lourd à importer
+    import influxdb_client
+    from influxdb_client.client.write_api import SYNCHRONOUS
+    client = influxdb_client.InfluxDBClient(url=url, token=token, org=org, timeout=int(timeout * 1000))
+    return SimpleNamespace(client=client, url=url, write_api=client.write_api(write_options=SYNCHRONOUS),
+                           query_api=client.query_api())
+
+
+def check_influxdb(influx, timeout: float = BACKEND_TIMEOUT):
+    # /ping avec son propre délai court : celui du client vaut pour les écritures et les requêtes
+    from influxdb_client.service.ping_service import PingService
+    try:
+        PingService(influx.client.api_client).get_ping(_request_timeout=int(timeout * 1000))
+    except Exception as e:
+        raise ConnectionError(f"InfluxDB injoignable ({influx.url}) : {e}")
+
+
+def connect_docker(timeout: float = BACKEND_TIMEOUT):
+    try:
+        import docker
+    except ImportError:
+        raise BackendDisabled("module docker absent")
+    return docker.from_env(timeout=int(max(1, timeout)))
+
+
+def check_docker(client):
+    client.ping()
@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+from typing import Dict, Optional, Set
+
+# Optional: encodage binaire compact
+try:
+    import msgpack  # type: ignore
+    MSGPACK_AVAILABLE = True
+except Exception:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+FRAME_EVENT = "metrics_frame"
+ROOM_PREFIXES = ("system", "docker/", "processes/", "scan/")
+# Multi-workers : trame d'état complète réémise par la file toutes les N secondes
+KEYFRAME_INTERVAL = float(os.environ.get("BROADCAST_KEYFRAME_INTERVAL", 15.0))
+
+
+def is_valid_room(room: str) -> bool:
+    return isinstance(room, str) and any(
+        (room.startswith(p) and len(room) > len(p)) if p.endswith("/") else room == p
+        for p in ROOM_PREFIXES
+    )
+
+
+def _changed(old, new, epsilon: float) -> bool:
+    if isinstance(new, (int, float)) and not isinstance(new, bool) \
+            and isinstance(old, (int, float)) and not isinstance(old, bool):
+        return abs(new - old) > epsilon
+    return old != new
+
+
+class Broadcaster:
+    """Regroupe chaque tick en une trame par topic et n'envoie que les deltas.
+
+    Les collecteurs appellent `publish(topic, key, fields)` pour chaque entité
+    puis `flush(topic)` en fin de tick. Les clients rejoignent une room par topic
+    (`system`, `docker/<host>`, `scan/<job>`) et reçoivent à l'abonnement une
+    trame complète, puis uniquement les champs ayant bougé de plus d'`epsilon`.
+
+    Avec une file de messages partagée (`shared`, plusieurs workers), les abonnés
+    sont sur d'autres workers que le collecteur : les trames partent toujours
+    vers la room, et l'état complet est réémis toutes les `keyframe_interval`
+    secondes, puisque les autres workers n'ont pas d'état à envoyer à l'abonnement.
+    """
+
+    def __init__(self, sio=None, epsilon: float = 0.05, shared: bool = False,
+                 keyframe_interval: float = KEYFRAME_INTERVAL):
+        self.socketio = sio
+        self.epsilon = epsilon
+        self.shared = shared
+        self.keyframe_interval = keyframe_interval
+        self._keyframe_at: Dict[str, float] = {}
+        self._pending: Dict[str, Dict[str, dict]] = {}
+        self._sent: Dict[str, Dict[str, dict]] = {}
+        self._seq: Dict[str, int] = {}
+        self._subscribers: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.frames_sent = 0
+
+    # --- Rooms ---
+    @staticmethod
+    def room_name(topic: str, encoding: str = "json") -> str:
+        return topic if encoding == "json" else f"{topic}#{encoding}"
+
+    def add_subscriber(self, topic: str, sid: str, encoding: str = "json") -> str:
+        room = self.room_name(topic, encoding)
+        with self._lock:
+            self._subscribers.setdefault(room, set()).add(sid)
+        return room
+
+    def remove_subscriber(self, sid: str, topic: Optional[str] = None):
+        with self._lock:
+            for room, sids in list(self._subscribers.items()):
+                if topic is None or room.split("#", 1)[0] == topic:
+                    sids.discard(sid)
+                    if not sids:
+                        del self._subscribers[room]
+
+    def subscriber_count(self, topic: str) -> int:
+        with self._lock:
+            return sum(len(s) for r, s in self._subscribers.items() if r.split("#", 1)[0] == topic)
+
+    def topics(self):
+        with self._lock:
+            return sorted(set(self._sent) | set(self._pending))
+
+    # --- Publication ---
+    def publish(self, topic: str, key: str, fields: dict):
+        with self._lock:
+            self._pending.setdefault(topic, {}).setdefault(key, {}).update(fields)
+
+    def flush(self, topic: str, complete: bool = True) -> Optional[dict]:
+        """Calcule et émet la trame delta du topic ; `complete` retire les clés absentes du tick."""
+        with self._lock:
+            pending = self._pending.pop(topic, {})
+            sent = self._sent.setdefault(topic, {})
+            changes = {}
+            for key, fields in pending.items():
+                previous = sent.get(key)
+                if previous is None:
+                    changes[key] = dict(fields)
+                    sent[key] = dict(fields)
+                    continue
+                diff = {f: v for f, v in fields.items() if f not in previous or _changed(previous[f], v, self.epsilon)}
+                if diff:
+                    changes[key] = diff
+                    previous.update(diff)
+            removed = [k for k in sent if k not in pending] if complete else []
+            for k in removed:
+                del sent[k]
+            now = time.time()
+            keyframe = self.shared and now - self._keyframe_at.get(topic, 0.0) >= self.keyframe_interval
+            if not changes and not removed and not keyframe:
+                return None
+            if self.shared:
+                # Abonnés possibles sur n'importe quel worker : émission par la file, sans compter les locaux
+                rooms = [self.room_name(topic, enc) for enc in self._encodings()]
+            else:
+                rooms = [r for r in self._subscribers if r.split("#", 1)[0] == topic]
+                if not rooms:
+                    return None
+            seq = self._seq[topic] = self._seq.get(topic, 0) + 1
+            if keyframe:
+                self._keyframe_at[topic] = now
+                # Topic alimenté par plusieurs sources (complete=False, ex. agents sur d'autres workers) :
+                # l'état est fusionné côté client, pas remplacé
+                frame = {"topic": topic, "seq": seq, "ts": now, "full": complete,
+                         "changes": {k: dict(v) for k, v in sent.items()}}
+            else:
+                frame = {"topic": topic, "seq": seq, "ts": now, "full": False, "changes": changes}
+                if removed:
+                    frame["removed"] = removed
+
+        self._emit(frame, rooms)
+        return frame
+
+    @staticmethod
+    def _encodings():
+        return ("json", "msgpack") if MSGPACK_AVAILABLE else ("json",)
+
+    def send_snapshot(self, topic: str, sid: str, encoding: str = "json"):
+        with self._lock:
+            state = {k: dict(v) for k, v in self._sent.get(topic, {}).items()}
+            seq = self._seq.get(topic, 0)
+        if self.shared and not state:
+            # Worker sans collecteur : l'état arrive par la prochaine trame complète de la file
+            return
+        frame = {"topic": topic, "seq": seq, "ts": time.time(), "full": True, "changes": state}
+        self._emit_one(frame, sid, encoding)
+
+    # --- Encodage ---
+    @staticmethod
+    def encode(frame: dict, encoding: str):
+        if encoding == "msgpack" and MSGPACK_AVAILABLE:
+            return msgpack.packb(frame, use_bin_type=True)
+        return frame
+
+    def _emit(self, frame: dict, rooms):
+        if not self.socketio:
+            return
+        for room in rooms:
+            encoding = room.split("#", 1)[1] if "#" in room else "json"
+            self.socketio.emit(FRAME_EVENT, self.encode(frame, encoding), to=room)
+            self.frames_sent += 1
+
+    def _emit_one(self, frame: dict, sid: str, encoding: str):
+        if self.socketio:
+            self.socketio.emit(FRAME_EVENT, self.encode(frame, encoding), to=sid)
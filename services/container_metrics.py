@@ -0,0 +1,132 @@
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+
+# Une seule measurement pour tous les conteneurs : le nom devient un tag
+CONTAINER_MEASUREMENT = "docker_container"
+COMPOSE_PROJECT_LABEL = "com.docker.compose.project"
+
+
+def _parse_read(value) -> Optional[float]:
+    """Horodatage `read` de Docker (RFC 3339, nanosecondes) -> epoch en secondes."""
+    if not value or value.startswith("0001-"):
+        return None
+    try:
+        base, _, frac = value.rstrip("Z").partition(".")
+        ts = datetime.strptime(base, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+        digits = "".join(ch for ch in frac if ch.isdigit())
+        return ts + (int(digits[:9].ljust(9, "0")) / 1e9 if digits else 0.0)
+    except ValueError:
+        return None
+
+
+def _online_cpus(cpu_stats: dict) -> int:
+    return cpu_stats.get("online_cpus") or len(cpu_stats.get("cpu_usage", {}).get("percpu_usage") or []) or 1
+
+
+def _blkio_totals(stats: dict):
+    read = write = 0
+    for entry in (stats.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []:
+        op = (entry.get("op") or "").lower()
+        if op == "read":
+            read += entry.get("value", 0)
+        elif op == "write":
+            write += entry.get("value", 0)
+    return read, write
+
+
+def _network_totals(stats: dict):
+    rx = tx = 0
+    for iface in (stats.get("networks") or {}).values():
+        rx += iface.get("rx_bytes", 0)
+        tx += iface.get("tx_bytes", 0)
+    return rx, tx
+
+
+def _rate(current: float, previous: Optional[float], elapsed: float) -> float:
+    # Compteur remis à zéro (redémarrage du conteneur) : pas de débit négatif
+    if previous is None or elapsed <= 0 or current < previous:
+        return 0.0
+    return (current - previous) / elapsed
+
+
+def container_tags(container, host: Optional[str] = None) -> dict:
+    """Tags tirés de l'objet SDK déjà en mémoire (attrs de `containers.list()`), sans appel API."""
+    attrs = getattr(container, "attrs", None) or {}
+    config = attrs.get("Config") or {}
+    labels = config.get("Labels") or getattr(container, "labels", None) or {}
+    tags = {"name": container.name, "image": config.get("Image") or attrs.get("Image", "")}
+    if labels.get(COMPOSE_PROJECT_LABEL):
+        tags["compose_project"] = labels[COMPOSE_PROJECT_LABEL]
+    if host:
+        tags["host"] = host
+    return {k: v for k, v in tags.items() if v}
+
+
+class ContainerMetrics:
+    """Champs d'un conteneur calculés depuis un seul payload `stats`.
+
+    CPU et mémoire viennent du payload lui-même (precpu_stats, cache) ; les
+    débits réseau et disque utilisent le précédent échantillon de chaque
+    conteneur, gardé en mémoire ici.
+    """
+
+    def __init__(self):
+        self._previous: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def compute(self, key: str, stats: dict, now: Optional[float] = None) -> dict:
+        fields = {}
+        cpu, precpu = stats.get("cpu_stats") or {}, stats.get("precpu_stats") or {}
+        try:
+            cpu_delta = cpu["cpu_usage"]["total_usage"] - precpu["cpu_usage"]["total_usage"]
+            sys_delta = cpu["system_cpu_usage"] - precpu["system_cpu_usage"]
+            if sys_delta > 0 and cpu_delta >= 0:
+                cores = _online_cpus(cpu)
+                # sys_delta couvre tous les CPU de l'hôte : le ratio est déjà une part de la capacité totale
+                fields["cpu_percent"] = cpu_delta / sys_delta * 100.0
+                fields["cpu_cores"] = cpu_delta / sys_delta * cores
+                fields["online_cpus"] = cores
+        except (KeyError, TypeError):
+            pass
+
+        mem = stats.get("memory_stats") or {}
+        if mem.get("usage") is not None:
+            detail = mem.get("stats") or {}
+            # Même calcul que `docker stats` : le cache de pages récupérable n'est pas compté
+            cache = detail.get("inactive_file", detail.get("total_inactive_file", detail.get("cache", 0)))
+            used = max(0, mem["usage"] - (cache or 0))
+            fields["memory_used_bytes"] = used
+            if mem.get("limit"):
+                fields["memory_limit_bytes"] = mem["limit"]
+                fields["memory_percent"] = used / mem["limit"] * 100.0
+
+        pids = (stats.get("pids_stats") or {}).get("current")
+        if pids is not None:
+            fields["pids"] = pids
+
+        ts = _parse_read(stats.get("read"))
+        if ts is None:
+            ts = time.time() if now is None else now
+        rx, tx = _network_totals(stats)
+        blk_read, blk_write = _blkio_totals(stats)
+        with self._lock:
+            previous = self._previous.get(key)
+            if previous is None or ts > previous[0]:
+                self._previous[key] = (ts, rx, tx, blk_read, blk_write)
+        # Même échantillon relu (flux en pause) : pas de débit plutôt qu'un faux zéro
+        if previous is not None and ts > previous[0]:
+            elapsed = ts - previous[0]
+            fields["net_rx_bytes_per_s"] = _rate(rx, previous[1], elapsed)
+            fields["net_tx_bytes_per_s"] = _rate(tx, previous[2], elapsed)
+            fields["blk_read_bytes_per_s"] = _rate(blk_read, previous[3], elapsed)
+            fields["blk_write_bytes_per_s"] = _rate(blk_write, previous[4], elapsed)
+        return fields
+
+    def retain(self, keys: Iterable[str]):
+        """Oublie l'état des conteneurs disparus."""
+        keep = set(keys)
+        with self._lock:
+            for key in [k for k in self._previous if k not in keep]:
+                del self._previous[key]
@@ -0,0 +1,179 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from services.instrumentation import DOCKER_STATS_CALL_SECONDS, DOCKER_STATS_SAMPLES
+
+
+def sample_containers_parallel(containers, max_workers: int = 16) -> List[tuple]:
+    """Un seul passage `stats(stream=False)` sur un pool borné : ~1 appel de latence au lieu de N."""
+    if not containers:
+        return []
+
+    def _one(c):
+        try:
+            with DOCKER_STATS_CALL_SECONDS.time():
+                return c.name, c.stats(stream=False)
+        except Exception as e:
+            print(f"[docker_stats] {getattr(c, 'name', '?')}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(containers)))) as ex:
+        return [r for r in ex.map(_one, containers) if r]
+
+
+class DockerStatsCollector:
+    """Garde un flux `stats(stream=True)` par conteneur actif.
+
+    Les flux sont attachés / détachés au fil des événements Docker (start, die,
+    destroy) ; `snapshot()` renvoie le dernier échantillon de chaque conteneur
+    sans aucun appel à l'API Docker.
+    """
+
+    ATTACH_EVENTS = ("start", "unpause", "restart")
+    DETACH_EVENTS = ("die", "stop", "kill", "pause", "destroy")
+
+    def __init__(self, docker_client, resync_interval: float = 60.0):
+        self.docker_client = docker_client
+        self.resync_interval = resync_interval
+        self._latest: Dict[str, dict] = {}
+        self._streams: Dict[str, threading.Event] = {}
+        self._containers: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._running = False
+        self._events = None
+        self._events_thread: Optional[threading.Thread] = None
+        self._last_resync = 0.0
+
+    # --- Cycle de vie ---
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self.resync()
+        self._events_thread = threading.Thread(target=self._watch_events, name="docker-events", daemon=True)
+        self._events_thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._events is not None:
+            try:
+                self._events.close()
+            except Exception:
+                pass
+        with self._lock:
+            for stop_flag in self._streams.values():
+                stop_flag.set()
+            self._streams.clear()
+
+    # --- Abonnements ---
+    def resync(self):
+        """Aligne les flux sur la liste des conteneurs actifs (démarrage ou perte du flux d'événements)."""
+        self._last_resync = time.monotonic()
+        try:
+            containers = self.docker_client.containers.list()
+        except Exception as e:
+            print(f"[docker_stats] list: {e}")
+            return
+        running = set()
+        for c in containers:
+            running.add(c.id)
+            self.attach(c)
+        with self._lock:
+            gone = [cid for cid in self._streams if cid not in running]
+        for cid in gone:
+            self.detach(cid)
+
+    def attach(self, container):
+        with self._lock:
+            if container.id in self._streams:
+                return
+            stop_flag = threading.Event()
+            self._streams[container.id] = stop_flag
+            self._containers[container.id] = container
+        t = threading.Thread(
+            target=self._follow, args=(container, stop_flag),
+            name=f"docker-stats-{container.name}", daemon=True
+        )
+        t.start()
+
+    def detach(self, container_id: str):
+        with self._lock:
+            stop_flag = self._streams.pop(container_id, None)
+            self._latest.pop(container_id, None)
+            self._containers.pop(container_id, None)
+        if stop_flag:
+            stop_flag.set()
+
+    def _follow(self, container, stop_flag: threading.Event):
+        try:
+            for stats in container.stats(stream=True, decode=True):
+                if stop_flag.is_set() or not self._running:
+                    break
+                DOCKER_STATS_SAMPLES.inc()
+                with self._lock:
+                    if container.id in self._streams:
+                        self._latest[container.id] = {
+                            "name": container.name,
+                            "stats": stats,
+                            "received_at": time.time(),
+                        }
+        except Exception as e:
+            if not stop_flag.is_set():
+                print(f"[docker_stats] stream {container.name}: {e}")
+        finally:
+            with self._lock:
+                if self._streams.get(container.id) is stop_flag:
+                    self._streams.pop(container.id, None)
+                    self._latest.pop(container.id, None)
+                    self._containers.pop(container.id, None)
+
+    def _watch_events(self):
+        # Si le flux d'événements tombe, snapshot() repasse en resynchronisation périodique
+        while self._running:
+            try:
+                self._events = self.docker_client.events(
+                    decode=True, filters={"type": "container"}
+                )
+                for event in self._events:
+                    if not self._running:
+                        return
+                    self._handle_event(event)
+            except Exception as e:
+                if self._running:
+                    print(f"[docker_stats] events: {e}")
+                return
+            if self._running:
+                self.resync()
+
+    def _handle_event(self, event: dict):
+        action = (event.get("Action") or event.get("status") or "").split(":")[0]
+        cid = event.get("id") or event.get("Actor", {}).get("ID")
+        if not cid:
+            return
+        if action in self.ATTACH_EVENTS:
+            try:
+                self.attach(self.docker_client.containers.get(cid))
+            except Exception as e:
+                print(f"[docker_stats] attach {cid[:12]}: {e}")
+        elif action in self.DETACH_EVENTS:
+            self.detach(cid)
+
+    # --- Lecture ---
+    def snapshot(self) -> List[tuple]:
+        events_alive = self._events_thread is not None and self._events_thread.is_alive()
+        if not events_alive and time.monotonic() - self._last_resync >= self.resync_interval:
+            self.resync()
+        with self._lock:
+            return [(s["name"], s["stats"]) for s in self._latest.values()]
+
+    def containers(self) -> list:
+        """Conteneurs actuellement suivis (objets SDK, sans appel à l'API)."""
+        with self._lock:
+            return list(self._containers.values())
+
+    @property
+    def stream_count(self) -> int:
+        with self._lock:
+            return len(self._streams)
@@ -0,0 +1,214 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+FLUX_CACHE_SIZE = int(os.environ.get("FLUX_CACHE_SIZE", 256))
+FLUX_CACHE_TTL = float(os.environ.get("FLUX_CACHE_TTL", 15.0))
+FLUX_CACHE_TTL_PAST = float(os.environ.get("FLUX_CACHE_TTL_PAST", 300.0))
+FLUX_MAX_POINTS = int(os.environ.get("FLUX_MAX_POINTS", 200000))
+FLUX_MAX_WIDTH = 4000
+
+# avg → mean : mêmes noms d'agrégation que /api/metrics/history
+FLUX_FUNCTIONS = {"avg": "mean", "min": "min", "max": "max", "last": "last"}
+# Pas "ronds" : les requêtes proches retombent sur le même pas, donc la même clé de cache
+NICE_STEPS = (1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 10800,
+              21600, 43200, 86400, 172800, 604800)
+# Colonnes Flux qui ne sont pas des tags
+RESERVED_COLUMNS = {"result", "table", "_start", "_stop", "_time", "_value", "_field", "_measurement"}
+TAG_KEY_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_.\-]*$")
+
+
+def pick_step(range_s: float, width: int, min_step: Optional[float] = None) -> int:
+    """Plus petit pas « rond » qui donne au plus un point par pixel."""
+    width = max(1, min(int(width), FLUX_MAX_WIDTH))
+    wanted = max(range_s / width, min_step or 0, 1)
+    for step in NICE_STEPS:
+        if step >= wanted:
+            return step
+    return int(math.ceil(wanted / NICE_STEPS[-1]) * NICE_STEPS[-1])
+
+
+def align_range(start: float, end: float, step: float) -> Tuple[float, float]:
+    """Bornes alignées sur le pas : deux tableaux de bord ouverts à quelques secondes d'écart partagent la clé."""
+    return math.floor(start / step) * step, math.ceil(end / step) * step
+
+
+def build_flux(measurement: str, fields: List[str], tags: Dict[str, str], agg: str) -> str:
+    """Requête paramétrée : les valeurs passent par `params`, seuls les noms de tags (validés) sont inlinés."""
+    if agg not in FLUX_FUNCTIONS:
+        raise ValueError(f"agg inconnu: {agg} (attendu: {', '.join(FLUX_FUNCTIONS)})")
+    lines = [
+        "from(bucket: params.bucket)",
+        "  |> range(start: params.start, stop: params.stop)",
+        "  |> filter(fn: (r) => r._measurement == params.measurement)",
+    ]
+    if fields:
+        lines.append("  |> filter(fn: (r) => contains(value: r._field, set: params.fields))")
+    for i, key in enumerate(sorted(tags)):
+        if not TAG_KEY_RE.match(key):
+            raise ValueError(f"nom de tag invalide: {key}")
+        lines.append(f'  |> filter(fn: (r) => r["{key}"] == params.tag{i})')
+    lines.append(f"  |> aggregateWindow(every: params.every, fn: {FLUX_FUNCTIONS[agg]}, createEmpty: false)")
+    return "\n".join(lines)
+
+
+def flux_params(bucket: str, measurement: str, fields: List[str], tags: Dict[str, str],
+                start: float, end: float, step: float) -> dict:
+    params = {
+        "bucket": bucket,
+        "measurement": measurement,
+        "start": datetime.fromtimestamp(start, tz=timezone.utc),
+        "stop": datetime.fromtimestamp(end, tz=timezone.utc),
+        "every": timedelta(seconds=step),
+    }
+    if fields:
+        params["fields"] = list(fields)
+    for i, key in enumerate(sorted(tags)):
+        params[f"tag{i}"] = str(tags[key])
+    return params
+
+
+def read_series(records, measurement: str, max_points: int = FLUX_MAX_POINTS) -> Tuple[List[dict], bool]:
+    """Regroupe un flux de FluxRecord en séries au fil de la lecture, sans matérialiser les tables.
+
+    Renvoie (séries, tronqué) ; la lecture s'arrête à `max_points`.
+    """
+    series: Dict[tuple, dict] = {}
+    n = 0
+    truncated = False
+    for record in records:
+        value = record.get_value()
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if n >= max_points:
+            truncated = True
+            break
+        values = record.values
+        tags = tuple(sorted((k, str(v)) for k, v in values.items()
+                            if k not in RESERVED_COLUMNS and v is not None))
+        key = (record.get_field(), tags)
+        entry = series.get(key)
+        if entry is None:
+            entry = series[key] = {"measurement": measurement, "field": key[0], "tags": dict(tags), "points": []}
+        entry["points"].append([record.get_time().timestamp(), float(value)])
+        n += 1
+    close = getattr(records, "close", None)
+    if close:
+        close()  # libère la réponse HTTP si la lecture a été interrompue
+    return [series[k] for k in sorted(series)], truncated
+
+
+class TTLCache:
+    """LRU borné dont les entrées expirent individuellement."""
+
+    def __init__(self, size: int = FLUX_CACHE_SIZE):
+        self.size = size
+        self._data: "OrderedDict[tuple, Tuple[float, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, ttl: float, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._data[key] = (now + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "size": self.size, "hits": self.hits, "misses": self.misses}
+
+
+class FluxQueryService:
+    """Proxy /api/metrics/query : sous-échantillonnage côté InfluxDB (aggregateWindow) et cache LRU+TTL.
+
+    Sans InfluxDB (backend absent ou requête en échec), la même requête est
+    servie depuis l'historique mémoire, avec le même pas.
+    """
+
+    def __init__(self, get_query_api, bucket_getter, fallback=None, cache_size: int = FLUX_CACHE_SIZE,
+                 ttl: float = FLUX_CACHE_TTL, ttl_past: float = FLUX_CACHE_TTL_PAST,
+                 max_points: int = FLUX_MAX_POINTS):
+        self.get_query_api = get_query_api
+        self.bucket_getter = bucket_getter
+        self.fallback = fallback
+        self.cache = TTLCache(cache_size)
+        self.ttl = ttl
+        self.ttl_past = ttl_past
+        self.max_points = max_points
+        self.queries = 0
+        self.errors = 0
+
+    def query(self, measurement: str, fields: Optional[List[str]] = None, tags: Optional[dict] = None,
+              range_s: float = 3600, end: Optional[float] = None, width: int = 800,
+              step: Optional[float] = None, agg: str = "avg") -> dict:
+        if agg not in FLUX_FUNCTIONS:
+            raise ValueError(f"agg inconnu: {agg} (attendu: {', '.join(FLUX_FUNCTIONS)})")
+        if range_s <= 0:
+            raise ValueError("range doit être positif")
+        now = time.time()
+        end = now if end is None else end
+        step = pick_step(range_s, width, step)
+        start, end = align_range(end - range_s, end, step)
+        fields = sorted(set(fields or []))
+        tags = {str(k): str(v) for k, v in (tags or {}).items()}
+
+        key = (measurement, tuple(fields), tuple(sorted(tags.items())), agg, start, end, step)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+        flux = build_flux(measurement, fields, tags, agg)
+        result = {"measurement": measurement, "agg": agg, "step": step, "start": start, "end": end}
+        query_api = self.get_query_api()
+        series = None
+        if query_api is not None:
+            try:
+                params = flux_params(self.bucket_getter(), measurement, fields, tags, start, end, step)
+                self.queries += 1
+                series, truncated = read_series(query_api.query_stream(flux, params=params),
+                                                measurement, self.max_points)
+                result.update(source="influxdb", truncated=truncated)
+            except Exception as e:
+                self.errors += 1
+                print(f"[flux] requête échouée, repli sur l'historique mémoire: {e}")
+        if series is None:
+            if self.fallback is None:
+                raise ConnectionError("InfluxDB indisponible")
+            series = self.fallback.query(measurement, fields=fields, tags=tags, start=start, end=end,
+                                         step=step, agg=agg)
+            result.update(source="memory", truncated=False)
+        result["series"] = series
+
+        # Fenêtre entièrement passée : le résultat ne bougera plus, on le garde plus longtemps
+        ttl = self.ttl_past if end + step < now else self.ttl
+        if result["source"] == "influxdb":
+            self.cache.put(key, result, ttl)
+        return {**result, "cached": False}
+
+    def stats(self) -> dict:
+        return {"queries": self.queries, "errors": self.errors, "cache": self.cache.stats()}
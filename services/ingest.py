@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+from typing import Optional, Set
+
+from services.container_metrics import CONTAINER_MEASUREMENT
+from services.ingest_format import MSGPACK_AVAILABLE, MSGPACK_TYPE, decode_payload, encode_payload
+from services.metrics import broadcaster, write_metrics
+
+INGEST_TOKEN = os.environ.get("INGEST_TOKEN", "")
+INGEST_MAX_POINTS = int(os.environ.get("INGEST_MAX_POINTS", 5000))
+INGEST_FLUSH_INTERVAL = float(os.environ.get("INGEST_FLUSH_INTERVAL", 1.0))
+
+
+def _fields(value) -> dict:
+    if not isinstance(value, dict):
+        raise ValueError("champs invalides")
+    return value
+
+
+class IngestService:
+    """Répartit les échantillons des agents vers le pipeline d'écriture et la diffusion.
+
+    Les trames Socket.IO ne sont pas émises par requête : les topics touchés
+    sont regroupés et vidés toutes les `flush_interval` secondes, ce qui borne
+    le nombre de trames quel que soit le nombre d'agents.
+    """
+
+    def __init__(self, flush_interval: float = INGEST_FLUSH_INTERVAL, max_points: int = INGEST_MAX_POINTS):
+        self.flush_interval = flush_interval
+        self.max_points = max_points
+        self._dirty: Set[str] = set()
+        self._complete: Set[str] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.agents = {}
+        self.points = 0
+        self.requests = 0
+
+    def ingest(self, payload: dict) -> int:
+        host = str(payload["host"])
+        system = payload.get("system") or []
+        docker = payload.get("docker") or []
+        points = payload.get("points") or []
+        total = len(system) + len(docker) + len(points)
+        if total > self.max_points:
+            raise ValueError(f"trop de points ({total} > {self.max_points})")
+
+        # Tout le lot est validé avant la première écriture : un 400 ne laisse aucun point
+        # déjà écrit, que l'agent dupliquerait en renvoyant le lot
+        tags = {"host": host}
+        docker_topic = f"docker/{host}"
+        writes, publishes = [], []
+        try:
+            for ts, fields in system:
+                fields = _fields(fields)
+                writes.append(("system_metrics", fields, tags, float(ts)))
+                publishes.append(("system", host, fields))
+            for entry in docker:
+                ts, name, fields = entry[:3]
+                fields = _fields(fields)
+                extra = entry[3] if len(entry) > 3 and isinstance(entry[3], dict) else {}
+                writes.append((CONTAINER_MEASUREMENT, fields, {**extra, "name": str(name), **tags}, float(ts)))
+                publishes.append((docker_topic, str(name), fields))
+            for ts, measurement, point_tags, fields in points:
+                writes.append((str(measurement), _fields(fields), {**(point_tags or {}), **tags}, float(ts)))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"entrée invalide : {e}")
+        for args in writes:
+            write_metrics(*args)
+        for args in publishes:
+            broadcaster.publish(*args)
+
+        with self._lock:
+            if system:
+                self._dirty.add("system")
+            if "docker" in payload:
+                # Chaque envoi contient la liste complète des conteneurs de l'agent
+                self._dirty.add(docker_topic)
+                self._complete.add(docker_topic)
+            self.agents[host] = {"last_seen": time.time(), "points": total}
+            self.points += total
+            self.requests += 1
+        self._ensure_flusher()
+        return total
+
+    def _ensure_flusher(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="ingest-flush", daemon=True)
+                    self._thread.start()
+
+    def flush(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            complete, self._complete = self._complete, set()
+        for topic in dirty:
+            broadcaster.flush(topic, complete=topic in complete)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[ingest] flush: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"agents": len(self.agents), "points": self.points, "requests": self.requests}
+
+
+ingest_service = IngestService()
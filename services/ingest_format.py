@@ -0,0 +1,36 @@
+import json
+
+try:
+    import msgpack  # type: ignore
+    MSGPACK_AVAILABLE = True
+except Exception:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+# Sans Flask ni Socket.IO : importé par le serveur (services/ingest.py) et par l'agent
+MSGPACK_TYPE = "application/msgpack"
+
+# Format (JSON ou msgpack), listes positionnelles pour rester compact :
+#   {"host": "srv-01",
+#    "system": [[ts, {champs}], ...],
+#    "docker": [[ts, "conteneur", {champs}, {tags optionnels}], ...],
+#    "points": [[ts, "measurement", {tags}, {champs}], ...]}
+
+
+def decode_payload(body: bytes, content_type: str = "") -> dict:
+    if MSGPACK_TYPE in (content_type or ""):
+        if not MSGPACK_AVAILABLE:
+            raise ValueError("msgpack non disponible sur le serveur")
+        payload = msgpack.unpackb(body, raw=False)
+    else:
+        payload = json.loads(body or b"{}")
+    if not isinstance(payload, dict) or not payload.get("host"):
+        raise ValueError("payload invalide : 'host' requis")
+    return payload
+
+
+def encode_payload(payload: dict, encoding: str = "json"):
+    """Renvoie (corps, content-type) ; utilisé par l'agent."""
+    if encoding == "msgpack" and MSGPACK_AVAILABLE:
+        return msgpack.packb(payload, use_bin_type=True), MSGPACK_TYPE
+    return json.dumps(payload, separators=(",", ":")).encode(), "application/json"
@@ -0,0 +1,286 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# Format d'exposition texte Prometheus 0.0.4
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+LOG_SAMPLE_INTERVAL = float(os.environ.get("LOG_SAMPLE_INTERVAL", 60.0))
+
+# Secondes : de la micro-opération (write_metrics) à la requête HTTP lente
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Sous-processus nmap : de la découverte rapide au scan de services de plusieurs minutes
+LONG_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._children: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values, **kwargs):
+        """Série d'une combinaison de labels (créée au premier appel, puis en cache)."""
+        key = tuple(str(v) for v in values) if values else tuple(str(kwargs[n]) for n in self.label_names)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for key, child in sorted(self._children.items()):
+            yield from self._render_child(key, child)
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _render_child(self, key, child):
+        yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(child.value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        # Coût d'une observation : une recherche dichotomique et trois incréments
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self, **labels):
+        return self.labels(**labels).time()
+
+    def _render_child(self, key, child):
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            le = f'le="{_format_value(bound) if bound != float("inf") else "+Inf"}"'
+            yield f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}"
+        labels = _format_labels(self.label_names, key)
+        yield f"{self.name}_sum{labels} {_format_value(total)}"
+        yield f"{self.name}_count{labels} {count}"
+
+
+class Gauge(_Metric):
+    """Jauge lue au scrape : `fn()` renvoie un nombre ou {(valeurs de labels): nombre}."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable, labels: Iterable[str] = ()):
+        super().__init__(name, help, labels)
+        self.fn = fn
+
+    def render(self):
+        try:
+            value = self.fn()
+        except Exception as e:
+            print(f"[instrumentation] {self.name}: {e}")
+            return
+        if value is None:
+            return
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for key, v in items:
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(v)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable, labels: Iterable[str] = ()) -> Gauge:
+        with self._lock:
+            # Une jauge peut être rebranchée (ex. nouveau BatchWriter après init_metrics)
+            self._metrics[name] = Gauge(name, help, fn, labels)
+            return self._metrics[name]
+
+    def render(self) -> str:
+        """Texte Prometheus ; tout le travail de mise en forme est fait ici, au scrape."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def timed(histogram: Histogram, **labels):
+    """Décorateur : durée de chaque appel dans `histogram` (exceptions comprises)."""
+    def decorator(fn):
+        child = histogram.labels(**labels)
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+# --- Journalisation échantillonnée ---
+_log_lock = threading.Lock()
+_log_state: Dict[str, list] = {}
+
+
+def sampled_print(key: str, message: str, interval: Optional[float] = None):
+    """print() limité à une ligne par `interval` secondes et par clé, avec le nombre de lignes omises."""
+    interval = LOG_SAMPLE_INTERVAL if interval is None else interval
+    now = time.monotonic()
+    with _log_lock:
+        state = _log_state.setdefault(key, [float("-inf"), 0])
+        if now - state[0] < interval:
+            state[1] += 1
+            LOG_SUPPRESSED.labels(key=key).inc()
+            return False
+        suppressed, state[0], state[1] = state[1], now, 0
+    print(f"{message} (+{suppressed} lignes omises)" if suppressed else message)
+    return True
+
+
+# --- Registre de l'application ---
+registry = Registry()
+
+COLLECTOR_CYCLE_SECONDS = registry.histogram(
+    "skymonitor_collector_cycle_seconds", "Durée d'un cycle de collecte.", ["collector"])
+COLLECTOR_OVERRUNS = registry.counter(
+    "skymonitor_collector_overruns_total", "Cycles de collecte plus longs que la période.", ["collector"])
+DOCKER_STATS_CALL_SECONDS = registry.histogram(
+    "skymonitor_docker_stats_call_seconds", "Appel stats(stream=False) de l'API Docker, par conteneur.")
+DOCKER_STATS_SAMPLES = registry.counter(
+    "skymonitor_docker_stats_samples_total", "Échantillons reçus des flux stats Docker.")
+WRITE_METRICS_SECONDS = registry.histogram(
+    "skymonitor_write_metrics_seconds", "Durée de write_metrics (historique, alertes, mise en file).", ["measurement"])
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "skymonitor_http_request_seconds", "Durée des requêtes HTTP par route.", ["method", "endpoint", "status"])
+SOCKET_EMIT_SECONDS = registry.histogram(
+    "skymonitor_socketio_emit_seconds", "Durée de socketio.emit par événement.", ["event"])
+NMAP_RUN_SECONDS = registry.histogram(
+    "skymonitor_nmap_run_seconds", "Durée des sous-processus nmap.", ["outcome"], buckets=LONG_BUCKETS)
+LOG_SUPPRESSED = registry.counter(
+    "skymonitor_log_lines_suppressed_total", "Lignes de log omises par l'échantillonnage.", ["key"])
+
+
+def instrument_socketio(socketio):
+    """Chronomètre chaque `socketio.emit` de l'instance (diffusions, progression des scans…)."""
+    emit = socketio.emit
+    if getattr(emit, "_instrumented", False):
+        return socketio
+
+    @wraps(emit)
+    def timed_emit(event, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return emit(event, *args, **kwargs)
+        finally:
+            SOCKET_EMIT_SECONDS.labels(event=event).observe(time.perf_counter() - start)
+
+    timed_emit._instrumented = True
+    socketio.emit = timed_emit
+    return socketio
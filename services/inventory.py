@@ -0,0 +1,267 @@
+import hashlib
+import ipaddress
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+COLLECTIONS = ("devices", "containers")
+
+# Ports qui font d'un hôte un serveur ; à défaut, ceux d'un poste de travail
+SERVER_PORTS = {22, 25, 53, 80, 110, 143, 389, 443, 636, 993, 1433, 1521, 2049, 3306,
+                5432, 6379, 8080, 8443, 9200, 11211, 27017}
+WORKSTATION_PORTS = {135, 139, 445, 3389, 5357, 5900}
+
+
+def classify_role(open_ports: Iterable[int]) -> str:
+    ports = set(open_ports)
+    if ports & SERVER_PORTS:
+        return "serveur"
+    if ports & WORKSTATION_PORTS:
+        return "poste"
+    return "device"
+
+
+def _ip_sort_key(record: dict):
+    try:
+        addr = ipaddress.ip_address(record["ip"])
+        return (addr.version, int(addr))
+    except ValueError:
+        return (9, record["ip"])
+
+
+class InventoryIndex:
+    """Inventaire en mémoire des équipements (clé IP) et conteneurs (clé ID Docker).
+
+    Index secondaires : MAC, rôle, service, port et statut. Chaque collection a
+    un numéro de version incrémenté uniquement quand un enregistrement change
+    réellement ; l'ETag en dérive, donc un tableau de bord qui repoll sans
+    changement reçoit un 304 sans qu'aucune requête ne soit réévaluée.
+    """
+
+    INDEXED = ("role", "status")
+
+    def __init__(self, loader: Optional[Callable[["InventoryIndex"], None]] = None, cache_size: int = 64):
+        self.generation = uuid.uuid4().hex[:8]
+        self._records: Dict[str, Dict[str, dict]] = {c: {} for c in COLLECTIONS}
+        self._by_mac: Dict[str, str] = {}
+        self._index: Dict[str, Dict[Tuple[str, str], Set[str]]] = {c: defaultdict(set) for c in COLLECTIONS}
+        self._versions = {c: 0 for c in COLLECTIONS}
+        self._sorted: Dict[str, Tuple[int, List[str]]] = {}
+        self._cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.RLock()
+        self._loader = loader
+        self._loaded = loader is None
+
+    # --- Mises à jour incrémentales ---
+    def upsert_host(self, host: dict, now: Optional[float] = None) -> bool:
+        """Intègre un résultat de scan ; renvoie True si l'inventaire a changé."""
+        ip = host.get("ip")
+        if not ip or host.get("error"):
+            return False
+        if host.get("status") == "down":
+            return self.mark_down(ip, now)
+        ports = host.get("ports") or []
+        open_ports = sorted({int(p["port"]) for p in ports if p.get("state") == "open" or p.get("open", False)})
+        services = sorted({(p.get("service") or "").lower() for p in ports
+                           if p.get("service") and (p.get("state") == "open" or p.get("open", False))})
+        with self._lock:
+            previous = self._records["devices"].get(ip, {})
+            hostname = host.get("hostname") or previous.get("hostname") or ""
+            record = {
+                "id": ip,
+                "ip": ip,
+                "ip_address": ip,
+                "mac": host.get("mac") or previous.get("mac") or "",
+                "hostname": hostname,
+                "name": hostname or ip,
+                "status": "online",
+                "role": classify_role(open_ports),
+                "ports": open_ports,
+                "services": services,
+            }
+            return self._put("devices", ip, record, now)
+
+    def mark_down(self, ip: str, now: Optional[float] = None) -> bool:
+        with self._lock:
+            previous = self._records["devices"].get(ip)
+            if previous is None or previous["status"] == "offline":
+                return False
+            return self._put("devices", ip, {**previous, "status": "offline"}, now, touch=False)
+
+    def sync_containers(self, containers: Iterable, host: str = "", now: Optional[float] = None) -> int:
+        """Aligne les conteneurs sur la liste courante (objets Docker SDK) ; renvoie le nombre de changements."""
+        changes = 0
+        seen = set()
+        with self._lock:
+            for c in containers:
+                cid = getattr(c, "id", None) or c.name
+                attrs = getattr(c, "attrs", None) or {}
+                # attrs plutôt que c.image : pas d'appel supplémentaire à l'API Docker
+                image = (attrs.get("Config") or {}).get("Image") or ""
+                record = {
+                    "id": cid,
+                    "name": c.name,
+                    "image": image,
+                    "status": getattr(c, "status", "") or attrs.get("State", {}).get("Status", ""),
+                    "host": host,
+                }
+                seen.add(cid)
+                changes += self._put("containers", cid, record, now)
+            for cid in [cid for cid in self._records["containers"] if cid not in seen]:
+                self._remove("containers", cid)
+                changes += 1
+        return changes
+
+    def _put(self, collection: str, key: str, record: dict, now: Optional[float], touch: bool = True) -> bool:
+        records = self._records[collection]
+        previous = records.get(key)
+        last_seen = time.time() if now is None else now
+        if previous is not None:
+            if not touch:
+                last_seen = previous.get("last_seen")
+            if {k: v for k, v in previous.items() if k != "last_seen"} == record:
+                previous["last_seen"] = last_seen
+                return False
+            self._unindex(collection, key, previous)
+        record["last_seen"] = last_seen
+        records[key] = record
+        self._reindex(collection, key, record)
+        self._versions[collection] += 1
+        return True
+
+    def _remove(self, collection: str, key: str):
+        previous = self._records[collection].pop(key, None)
+        if previous is not None:
+            self._unindex(collection, key, previous)
+            self._versions[collection] += 1
+
+    def _index_entries(self, record: dict) -> List[Tuple[str, str]]:
+        entries = [(name, str(record[name])) for name in self.INDEXED if record.get(name)]
+        entries += [("service", s) for s in record.get("services", ())]
+        entries += [("port", str(p)) for p in record.get("ports", ())]
+        return entries
+
+    def _reindex(self, collection: str, key: str, record: dict):
+        index = self._index[collection]
+        for entry in self._index_entries(record):
+            index[entry].add(key)
+        if record.get("mac"):
+            self._by_mac[record["mac"].lower()] = key
+
+    def _unindex(self, collection: str, key: str, record: dict):
+        index = self._index[collection]
+        for entry in self._index_entries(record):
+            keys = index.get(entry)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[entry]
+        if record.get("mac") and self._by_mac.get(record["mac"].lower()) == key:
+            del self._by_mac[record["mac"].lower()]
+
+    # --- Lecture ---
+    def ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            try:
+                self._loader(self)
+            except Exception as e:
+                print(f"[inventory] chargement initial: {e}")
+
+    def get(self, key: str) -> Optional[dict]:
+        """Recherche par IP, adresse MAC ou ID de conteneur."""
+        self.ensure_loaded()
+        with self._lock:
+            key = self._by_mac.get(key.lower(), key)
+            for collection in COLLECTIONS:
+                if key in self._records[collection]:
+                    return self._records[collection][key]
+        return None
+
+    def version(self, collection: str) -> int:
+        self.ensure_loaded()
+        return self._versions[collection]
+
+    def etag(self, collection: str, params: dict) -> str:
+        query = json.dumps(params, sort_keys=True, default=str)
+        digest = hashlib.sha1(query.encode()).hexdigest()[:10]
+        return f"{collection}-{self.generation}-{self.version(collection)}-{digest}"
+
+    def _sorted_keys(self, collection: str) -> List[str]:
+        version = self._versions[collection]
+        cached = self._sorted.get(collection)
+        if cached and cached[0] == version:
+            return cached[1]
+        records = self._records[collection]
+        if collection == "devices":
+            keys = sorted(records, key=lambda k: _ip_sort_key(records[k]))
+        else:
+            keys = sorted(records, key=lambda k: (records[k]["name"], k))
+        self._sorted[collection] = (version, keys)
+        return keys
+
+    def query(self, collection: str, filters: Optional[dict] = None, offset: int = 0,
+              limit: Optional[int] = None) -> Tuple[int, List[dict]]:
+        """Renvoie (total filtré, page). Filtres indexés : role, status, service, port ; `q` = sous-chaîne."""
+        if collection not in COLLECTIONS:
+            raise ValueError(f"collection inconnue: {collection}")
+        self.ensure_loaded()
+        filters = {k: v for k, v in (filters or {}).items() if v not in (None, "")}
+        with self._lock:
+            records = self._records[collection]
+            keys = self._sorted_keys(collection)
+            wanted: Optional[Set[str]] = None
+            for name in ("role", "status", "service", "port"):
+                if name in filters:
+                    value = str(filters[name]).lower() if name == "service" else str(filters[name])
+                    matched = self._index[collection].get((name, value), set())
+                    wanted = set(matched) if wanted is None else wanted & matched
+            if wanted is not None:
+                keys = [k for k in keys if k in wanted]
+            needle = str(filters.get("q", "")).lower()
+            if needle:
+                keys = [k for k in keys if any(needle in str(records[k].get(f, "")).lower()
+                                               for f in ("ip", "hostname", "name", "mac", "image"))]
+            total = len(keys)
+            end = None if limit is None else offset + limit
+            return total, [dict(records[k]) for k in keys[offset:end]]
+
+    def render(self, collection: str, filters: dict, offset: int = 0, limit: Optional[int] = None) -> Tuple[int, bytes]:
+        """Page sérialisée en JSON, mise en cache tant que la collection ne change pas."""
+        cache_key = (collection, self.version(collection), json.dumps(filters, sort_keys=True), offset, limit)
+        with self._lock:
+            hit = self._cache.get(cache_key)
+            if hit is not None:
+                self._cache.move_to_end(cache_key)
+                return hit
+        total, items = self.query(collection, filters, offset, limit)
+        result = (total, json.dumps(items).encode())
+        with self._lock:
+            self._cache[cache_key] = result
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {c: {"count": len(self._records[c]), "version": self._versions[c]} for c in COLLECTIONS}
+
+
+def load_scan_state(index: InventoryIndex):
+    # Import tardif : network_scan importe ce module
+    from services.network_scan import get_scan_state
+    for host in get_scan_state().all_hosts():
+        index.upsert_host({"ip": host["ip"], "ports": host["ports"]}, now=host["last_seen"])
+        if host["status"] == "down":
+            index.mark_down(host["ip"])
+
+
+inventory_index = InventoryIndex(loader=load_scan_state)
@@ -0,0 +1,207 @@
+import json
+import os
+import selectors
+import socket
+import threading
+import time
+from typing import Dict, Optional
+
+from socketio import PubSubManager
+
+# File de messages locale (sans Redis) entre workers gunicorn d'une même machine :
+# un broker sur socket UNIX relaie chaque message publié à tous les abonnés.
+# Protocole : une ligne d'annonce "pub" ou "sub", puis un message JSON par ligne.
+MQ_MAX_CLIENT_BUFFER = int(os.environ.get("MQ_MAX_CLIENT_BUFFER", 8 * 1024 * 1024))
+
+
+def socket_path(url: str) -> str:
+    """unix:///tmp/skymonitor.sock -> /tmp/skymonitor.sock"""
+    return url[len("unix://"):] if url.startswith("unix://") else url
+
+
+class UnixSocketBroker:
+    """Relais pub/sub mono-thread (selectors) ; tourne dans le master gunicorn.
+
+    Un abonné trop lent (plus de `max_buffer` octets en attente) est
+    déconnecté plutôt que de faire grossir la mémoire : son manager se
+    reconnecte et reprend au fil de l'eau.
+    """
+
+    def __init__(self, path: str, max_buffer: int = MQ_MAX_CLIENT_BUFFER):
+        self.path = path
+        self.max_buffer = max_buffer
+        self._sel = selectors.DefaultSelector()
+        self._server: Optional[socket.socket] = None
+        self._clients: Dict[socket.socket, dict] = {}
+        self._stop = threading.Event()
+        self.messages = 0
+        self.dropped_clients = 0
+
+    def bind(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.path)
+        os.chmod(self.path, 0o600)
+        self._server.listen(128)
+        self._server.setblocking(False)
+        self._sel.register(self._server, selectors.EVENT_READ)
+
+    def serve_forever(self):
+        if self._server is None:
+            self.bind()
+        while not self._stop.is_set():
+            for key, events in self._sel.select(timeout=0.5):
+                if key.fileobj is self._server:
+                    self._accept()
+                    continue
+                if events & selectors.EVENT_READ:
+                    self._read(key.fileobj)
+                if events & selectors.EVENT_WRITE and key.fileobj in self._clients:
+                    self._write(key.fileobj)
+        for conn in list(self._clients):
+            self._close(conn)
+        self._sel.close()
+        self._server.close()
+
+    def start(self) -> threading.Thread:
+        self.bind()
+        thread = threading.Thread(target=self.serve_forever, name="mq-broker", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def _accept(self):
+        conn, _ = self._server.accept()
+        conn.setblocking(False)
+        self._clients[conn] = {"role": None, "inbuf": b"", "outbuf": bytearray()}
+        self._sel.register(conn, selectors.EVENT_READ)
+
+    def _close(self, conn):
+        self._clients.pop(conn, None)
+        try:
+            self._sel.unregister(conn)
+        except (KeyError, ValueError):
+            pass
+        conn.close()
+
+    def _read(self, conn):
+        client = self._clients.get(conn)
+        if client is None:
+            return
+        try:
+            data = conn.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._close(conn)
+            return
+        *lines, client["inbuf"] = (client["inbuf"] + data).split(b"\n")
+        for line in lines:
+            if client["role"] is None:
+                client["role"] = line.strip().decode() or "pub"
+            elif line:
+                self._fanout(conn, line + b"\n")
+
+    def _fanout(self, origin, line: bytes):
+        self.messages += 1
+        for conn, client in list(self._clients.items()):
+            if conn is origin or client["role"] != "sub":
+                continue
+            if len(client["outbuf"]) + len(line) > self.max_buffer:
+                self.dropped_clients += 1
+                print("[mq] abonné trop lent, déconnecté")
+                self._close(conn)
+                continue
+            was_empty = not client["outbuf"]
+            client["outbuf"] += line
+            if was_empty:
+                self._sel.modify(conn, selectors.EVENT_READ | selectors.EVENT_WRITE)
+
+    def _write(self, conn):
+        client = self._clients[conn]
+        try:
+            sent = conn.send(client["outbuf"])
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self._close(conn)
+            return
+        del client["outbuf"][:sent]
+        if not client["outbuf"]:
+            self._sel.modify(conn, selectors.EVENT_READ)
+
+
+class UnixSocketManager(PubSubManager):
+    """Client manager python-socketio branché sur le broker UNIX (équivalent local de RedisManager).
+
+    Sockets et verrous sont ceux du module (patchés par eventlet/gevent en production).
+    """
+
+    name = "unix"
+
+    def __init__(self, url: str, channel: str = "socketio", write_only: bool = False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.path = socket_path(url)
+        self._pub: Optional[socket.socket] = None
+        self._pub_lock = threading.Lock()
+
+    def _connect(self, role: str) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.path)
+        sock.sendall(f"{role}\n".encode())
+        return sock
+
+    def _publish(self, data):
+        line = (json.dumps({"channel": self.channel, "data": data}, separators=(",", ":")) + "\n").encode()
+        with self._pub_lock:
+            for attempt in range(2):
+                try:
+                    if self._pub is None:
+                        self._pub = self._connect("pub")
+                    self._pub.sendall(line)
+                    return
+                except OSError as e:
+                    if self._pub is not None:
+                        self._pub.close()
+                    self._pub = None
+                    if attempt:
+                        self._get_logger().error(f"[mq] publication impossible ({self.path}): {e}")
+
+    def _listen(self):
+        delay = 0.5
+        while True:
+            try:
+                sock = self._connect("sub")
+            except OSError:
+                time.sleep(delay)
+                delay = min(delay * 2, 10.0)
+                continue
+            delay = 0.5
+            try:
+                with sock, sock.makefile("rb") as stream:
+                    for line in stream:
+                        try:
+                            message = json.loads(line)
+                        except ValueError:
+                            continue
+                        if message.get("channel") == self.channel:
+                            yield message["data"]
+            except OSError as e:
+                self._get_logger().warning(f"[mq] connexion au broker perdue: {e}")
+            # Broker redémarré : reconnexion
+            time.sleep(delay)
+
+
+def socketio_options(url: str) -> dict:
+    """Options SocketIO pour SOCKETIO_MESSAGE_QUEUE : unix://… (broker local), redis://, amqp://…"""
+    if not url:
+        return {}
+    if url.startswith("unix://"):
+        return {"client_manager": UnixSocketManager(url)}
+    return {"message_queue": url}
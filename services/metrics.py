@@ -1,93 +1,220 @@
+import atexit
 import os
 import time
-from datetime import datetime
-from typing import Optional
+from typing import Mapping, Optional
 
-import psutil
 from flask_socketio import SocketIO
 
+from services.alerts import AlertEngine, format_alert, load_rules
+from services.aletre_telegram import get_notifier
+from services.broadcast import Broadcaster
+from services.container_metrics import CONTAINER_MEASUREMENT, ContainerMetrics, container_tags
+from services.docker_stats import DockerStatsCollector, sample_containers_parallel
+from services.instrumentation import COLLECTOR_CYCLE_SECONDS, COLLECTOR_OVERRUNS, WRITE_METRICS_SECONDS, sampled_print
+from services.inventory import inventory_index
+from services.process_sampler import PROCESS_TOP_N, ProcessSampler
+from services.spool import Spool
+from services.system_sampler import system_sampler
+from services.timeseries import TimeSeriesStore
+from services.write_pipeline import BatchWriter
+
 # InfluxDB client must be passed in from app
 influxdb_client = None
 write_api = None
 INFLUXDB_BUCKET = ""
 socketio: Optional[SocketIO] = None
+batch_writer: Optional[BatchWriter] = None
+spool: Optional[Spool] = None
+
+METRICS_BATCH_SIZE = int(os.environ.get("METRICS_BATCH_SIZE", 500))
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 1.0))
+METRICS_QUEUE_SIZE = int(os.environ.get("METRICS_QUEUE_SIZE", 20000))
+# Journal disque des points non écrits dans InfluxDB ; vide = désactivé
+METRICS_SPOOL_DIR = os.environ.get("METRICS_SPOOL_DIR", "logs/spool")
+DOCKER_STATS_WORKERS = int(os.environ.get("DOCKER_STATS_WORKERS", 16))
+DOCKER_PUBLISH_INTERVAL = float(os.environ.get("DOCKER_PUBLISH_INTERVAL", 5.0))
+HOSTNAME = os.environ.get("HOSTNAME", "monitoring-server")
+
+# Diffusion Socket.IO : une trame delta par topic et par tick
+broadcaster = Broadcaster(epsilon=float(os.environ.get("BROADCAST_EPSILON", 0.05)),
+                          shared=bool(os.environ.get("SOCKETIO_MESSAGE_QUEUE")))
+
+# Deltas réseau / disque du précédent échantillon, par conteneur
+container_metrics = ContainerMetrics()
+
+# Top-N des processus (CPU, RSS, E/S), handles conservés entre les ticks ; PROCESS_TOP_N=0 désactive
+process_sampler = ProcessSampler(top_n=PROCESS_TOP_N)
+PROCESS_MEASUREMENT = "process_metrics"
+
+# Règles d'alerte évaluées sur chaque point écrit ; livraison Telegram en arrière-plan
+def deliver_alert(event: dict):
+    message = format_alert(event)
+    print(f"[ALERT] {message}")
+    notifier = get_notifier()
+    if notifier:
+        notifier.submit(message, event.get("channel"))
+
+alert_engine = AlertEngine(load_rules(), on_event=deliver_alert)
 
-def init_metrics(influx_client, write, bucket, sio):
-    global influxdb_client, write_api, INFLUXDB_BUCKET, socketio
+# Historique récent en mémoire (indépendant d'InfluxDB) pour le backfill des graphiques
+history_store = TimeSeriesStore(
+    retention_seconds=float(os.environ.get("METRICS_HISTORY_HOURS", 6)) * 3600,
+    resolution_seconds=float(os.environ.get("METRICS_HISTORY_RESOLUTION", 5)),
+    max_series=int(os.environ.get("METRICS_HISTORY_MAX_SERIES", 5000)),
+)
+
+def get_spool() -> Optional[Spool]:
+    global spool
+    if spool is None and METRICS_SPOOL_DIR:
+        try:
+            spool = Spool(METRICS_SPOOL_DIR)
+        except OSError as e:
+            print(f"[spool] désactivé ({METRICS_SPOOL_DIR}): {e}")
+    return spool
+
+def init_metrics(influx_client, write, bucket, sio, offline_spool=False):
+    """`offline_spool` : InfluxDB est attendu mais pas encore joignable, les points vont au spool."""
+    global influxdb_client, write_api, INFLUXDB_BUCKET, socketio, batch_writer
     influxdb_client = influx_client
     write_api = write
     INFLUXDB_BUCKET = bucket
     socketio = sio
+    broadcaster.socketio = sio
 
-def write_metrics(measurement: str, fields: dict, tags: Optional[dict] = None):
-    if not write_api or not influxdb_client:
-        print(f"[METRICS-SKIP] {measurement} | fields={fields} | tags={tags}")
-        return
+    if batch_writer:
+        batch_writer.stop()
+        batch_writer = None
+    if write_api and influxdb_client or offline_spool and get_spool():
+        batch_writer = BatchWriter(
+            write_api if influxdb_client else None,
+            bucket,
+            batch_size=METRICS_BATCH_SIZE,
+            flush_interval=METRICS_FLUSH_INTERVAL,
+            max_queue=METRICS_QUEUE_SIZE,
+            spool=get_spool(),
+        )
+        batch_writer.start()
 
-    try:
-        point = influxdb_client.Point(measurement)
-        if tags:
-            for k, v in tags.items():
-                point = point.tag(k, v)
-        for k, v in fields.items():
-            point = point.field(k, v)
-        write_api.write(bucket=INFLUXDB_BUCKET, record=point)
-    except Exception as e:
-        print(f"[METRICS-ERROR] {e}")
+def shutdown_metrics():
+    system_sampler.stop()
+    process_sampler.stop()
+    if batch_writer:
+        batch_writer.stop()
 
-def collect_system_metrics():
-    while True:
+atexit.register(shutdown_metrics)
+
+def write_metrics(measurement: str, fields: dict, tags: Optional[dict] = None, ts: Optional[float] = None):
+    """`ts` (secondes epoch) : horodatage d'origine, ex. celui d'un agent distant."""
+    with WRITE_METRICS_SECONDS.time(measurement=measurement):
+        history_store.record(measurement, fields, tags, ts)
         try:
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
-            net = psutil.net_io_counters()
-
-            fields = {
-                "cpu_percent": cpu_percent,
-                "memory_percent": memory.percent,
-                "memory_used_gb": memory.used / (1024**3),
-                "disk_percent": disk.percent,
-                "disk_used_gb": disk.used / (1024**3),
-                "network_sent_mb": net.bytes_sent / (1024**2),
-                "network_recv_mb": net.bytes_recv / (1024**2)
-            }
-
-            tags = {"host": os.environ.get("HOSTNAME", "monitoring-server")}
-            write_metrics("system_metrics", fields, tags)
-            if socketio:
-                socketio.emit("system_metrics", {**fields, "timestamp": datetime.now().isoformat()})
-            time.sleep(5)
+            alert_engine.observe(measurement, fields, tags, ts)
         except Exception as e:
-            print(f"[collect_system_metrics] {e}")
-            time.sleep(10)
+            sampled_print("alerts", f"[alerts] {e}")
+        # Non bloquant : le point est mis en file, le thread de flush l'envoie par batch
+        if not batch_writer:
+            # Chemin chaud (chaque point) : une ligne par intervalle, pas le payload complet à chaque appel
+            sampled_print("metrics-skip", f"[METRICS-SKIP] {measurement} | tags={tags} (InfluxDB non initialisé)")
+            return
+        batch_writer.submit(measurement, fields, tags, int(ts * 1e9) if ts is not None else None)
+
+def get_write_stats() -> dict:
+    if not batch_writer:
+        return {"enabled": False}
+    return {"enabled": True, **batch_writer.stats()}
+
+def publish_system_snapshot(snapshot: Mapping):
+    fields = {k: v for k, v in snapshot.items() if k != "timestamp"}
+    write_metrics("system_metrics", fields, {"host": HOSTNAME})
+    broadcaster.publish("system", HOSTNAME, fields)
+    # Le topic system agrège aussi les agents distants : pas de retrait des hôtes absents du tick
+    broadcaster.flush("system", complete=False)
+
+def get_system_snapshot() -> Mapping:
+    """Snapshot courant ; échantillon synchrone (non publié) si le sampler ne tourne pas encore."""
+    return system_sampler.snapshot() or system_sampler.sample()
+
+def collect_system_metrics():
+    system_sampler.subscribe(publish_system_snapshot)
+    system_sampler.run()
+
+def publish_process_snapshot(snapshot: Mapping):
+    """Union des tops CPU / mémoire / E/S ; une série par host/name, pid en champ (les PID tournent).
+
+    Les processus du même nom (workers) sont agrégés en un point : CPU, RSS et
+    E/S sommés, `processes` leur nombre, `pid` celui du plus gros consommateur CPU.
+    """
+    topic = f"processes/{HOSTNAME}"
+    rows = {}
+    for key in ("cpu", "memory", "io"):
+        for row in snapshot.get(key, ()):
+            rows[row["pid"]] = row
+    ts = snapshot.get("timestamp") or time.time()
+    by_name = {}
+    for pid, row in rows.items():
+        fields = {k: v for k, v in row.items() if k not in ("name", "pid")}
+        broadcaster.publish(topic, str(pid), {"name": row["name"], **fields})
+        total = by_name.get(row["name"])
+        if total is None:
+            by_name[row["name"]] = {"pid": pid, **fields, "processes": 1}
+            continue
+        if row.get("cpu_percent", 0.0) > rows[total["pid"]].get("cpu_percent", 0.0):
+            total["pid"] = pid
+        for k, v in fields.items():
+            total[k] = round(total.get(k, 0) + v, 2)
+        total["processes"] += 1
+    for name, fields in by_name.items():
+        write_metrics(PROCESS_MEASUREMENT, fields, {"host": HOSTNAME, "name": name}, ts)
+    # Un processus sorti du top disparaît de la trame
+    broadcaster.flush(topic)
+
+def get_process_snapshot() -> Optional[Mapping]:
+    return process_sampler.snapshot()
+
+def collect_process_metrics():
+    process_sampler.subscribe(publish_process_snapshot)
+    process_sampler.run()
+
+def publish_docker_samples(samples, containers=(), host: str = HOSTNAME):
+    """Une measurement `docker_container`, taguée par nom / image / projet compose."""
+    topic = f"docker/{host}"
+    meta = {c.name: container_tags(c, host) for c in containers}
+    for name, stats in samples:
+        fields = container_metrics.compute(name, stats)
+        if not fields:
+            continue
+        write_metrics(CONTAINER_MEASUREMENT, fields, meta.get(name) or {"name": name, "host": host})
+        broadcaster.publish(topic, name, fields)
+    broadcaster.flush(topic)
+    container_metrics.retain(name for name, _ in samples)
 
 def collect_docker_metrics(docker_client, run_once=False):
     try:
-        while True:
+        if run_once:
+            # Un seul balayage : stats(stream=False) en parallèle sur un pool borné
             containers = docker_client.containers.list()
-            for c in containers:
-                stats = c.stats(stream=False)
-                cpu_percent = 0.0
-                mem_percent = 0.0
-
-                if stats.get("cpu_stats") and stats.get("precpu_stats"):
-                    cpu_delta = stats["cpu_stats"]["cpu_usage"]["total_usage"] - stats["precpu_stats"]["cpu_usage"]["total_usage"]
-                    sys_delta = stats["cpu_stats"]["system_cpu_usage"] - stats["precpu_stats"]["system_cpu_usage"]
-                    if sys_delta > 0:
-                        cpu_percent = (cpu_delta / sys_delta) * 100
-
-                if stats.get("memory_stats"):
-                    mem = stats["memory_stats"]
-                    if mem.get("usage") and mem.get("limit"):
-                        mem_percent = (mem["usage"] / mem["limit"]) * 100
-
-                write_metrics(c.name, {"cpu": cpu_percent, "memory": mem_percent})
-                if socketio:
-                    socketio.emit("docker_metrics", {"container": c.name, "cpu": cpu_percent, "memory": mem_percent})
-
-            if run_once:
-                break
-            time.sleep(5)
+            samples = sample_containers_parallel(containers, DOCKER_STATS_WORKERS)
+            publish_docker_samples(samples, containers)
+            inventory_index.sync_containers(containers, HOSTNAME)
+            return
+
+        # Un flux de stats persistant par conteneur, suivi via l'API d'événements
+        collector = DockerStatsCollector(docker_client)
+        collector.start()
+        cycle = COLLECTOR_CYCLE_SECONDS.labels(collector="docker")
+        try:
+            while True:
+                start = time.perf_counter()
+                containers = collector.containers()
+                publish_docker_samples(collector.snapshot(), containers)
+                # Seuls les conteneurs apparus / disparus font changer la version de l'inventaire
+                inventory_index.sync_containers(containers, HOSTNAME)
+                elapsed = time.perf_counter() - start
+                cycle.observe(elapsed)
+                if elapsed > DOCKER_PUBLISH_INTERVAL:
+                    COLLECTOR_OVERRUNS.labels(collector="docker").inc()
+                time.sleep(max(0.0, DOCKER_PUBLISH_INTERVAL - elapsed))
+        finally:
+            collector.stop()
     except Exception as e:
         print(f"[collect_docker_metrics] {e}")
@@ -1,81 +1,209 @@
+import os
+import time
 from datetime import datetime
-from typing import List, Optional
+from typing import Callable, List, Optional
 
 from flask_socketio import SocketIO
-from net_discovery_nmap import discover_and_scan
+from net_discovery_nmap import discover_hosts_nmap, iter_scan_hosts, nmap_slots, resolve_engine, CancelToken, ScanCancelled
+from services.inventory import inventory_index
+from services.scan_diff import iter_diff_scan, wants_fingerprint
+from services.scan_state import ScanStateStore
 
 write_metrics = None
 socketio: Optional[SocketIO] = None
+scan_state: Optional[ScanStateStore] = None
+
+SCAN_STATE_DB = os.environ.get("SCAN_STATE_DB", "logs/scan_state.sqlite3")
+SCAN_FINGERPRINT_TTL = float(os.environ.get("SCAN_FINGERPRINT_TTL", 24 * 3600))
 
 def init_network_scan(metrics_writer, sio):
     global write_metrics, socketio
     write_metrics = metrics_writer
     socketio = sio
 
+def get_scan_state() -> ScanStateStore:
+    global scan_state
+    if scan_state is None:
+        scan_state = ScanStateStore(SCAN_STATE_DB)
+    return scan_state
+
+def detect_services(port_list):
+    badges = []
+    for p in port_list:
+        port = p.get("port")
+        if port == 22:
+            badges.append("SSH")
+        elif port == 80:
+            badges.append("HTTP")
+        elif port == 443:
+            badges.append("HTTPS")
+        else:
+            badges.append(f"Port {port}")
+    return badges
+
+def scan_progress(scanned: int, hosts) -> tuple:
+    """(pourcentage, total connu) ; découverte en cours : pondéré par la part du réseau déjà couverte."""
+    # DiscoveryFeed (nmap) ou AsyncDiscoveryFeed : même interface de progression
+    if not hasattr(hosts, "fraction_done"):
+        total = len(hosts)
+        return (min(100, int(scanned / total * 100)) if total else 100), total
+    total = hosts.discovered
+    if hosts.done:
+        return (min(100, int(scanned / total * 100)) if total else 100), total
+    ratio = scanned / total if total else 0.0
+    return min(99, int(ratio * hosts.fraction_done * 100)), total
+
 def background_discover_and_emit(
     network: str,
     ports: List[int],
     parallel_hosts: int = 8,
     scan_args: str = "-sT -sV",
-    ping_args: Optional[str] = None
-):
+    ping_args: Optional[str] = None,
+    job_id: Optional[str] = None,
+    bulk: bool = False,
+    chunk_size: int = 64,
+    mode: str = "full",
+    engine: str = "nmap",
+    engine_opts: Optional[dict] = None,
+    cancel_token: Optional[CancelToken] = None,
+    on_host: Optional[Callable[[dict], None]] = None
+) -> dict:
+    """Scan complet ou différentiel, diffusé hôte par hôte ; renvoie la charge finale émise.
+
+    `cancel_token` permet d'interrompre le scan (les nmap en cours sont tués) et
+    `on_host` reçoit chaque hôte diffusé (résultats partiels du gestionnaire de jobs).
+    """
+    # Les clients suivent un scan en rejoignant la room scan/<job_id>
+    room = f"scan/{job_id}" if job_id else None
+    start = time.time()
+    scanned = 0
+    changed = 0
+    open_total = 0
+    errors = 0
+    last_percent = -1
+    hosts = []
+    slots = None
     try:
-        summary = discover_and_scan(
-            network=network,
-            ports=ports,
-            parallel_hosts=parallel_hosts,
-            scan_args=scan_args,
-            ping_args=ping_args
-        )
+        engine = resolve_engine(engine)
+        engine_opts = engine_opts or {}
+        if engine == "async":
+            # Sans nmap : découverte + TCP connect en asyncio, pas de détection de version ;
+            # chaque hôte part au scan dès sa découverte
+            from net_discovery_async import discover_hosts_async, iter_async_scan_hosts
+            hosts = discover_hosts_async(network, cancel_token=cancel_token, stream=True, **engine_opts)
+        else:
+            # Flux de découverte par blocs : le scan démarre dès le premier bloc revenu.
+            # Découverte et scan se partagent les `parallel_hosts` workers réservés pour le job
+            slots = nmap_slots(parallel_hosts)
+            hosts = discover_hosts_nmap(network, ping_args=ping_args, cancel_token=cancel_token,
+                                        parallel=parallel_hosts, stream=True, slots=slots)
+
+        if mode == "diff":
+            # Passe rapide + -sV ciblé : seuls les hôtes modifiés sont diffusés
+            scanner = iter_diff_scan(hosts, ports, get_scan_state(), network, parallel_hosts, scan_args,
+                                     chunk_size=chunk_size, fingerprint_ttl=SCAN_FINGERPRINT_TTL,
+                                     engine=engine, engine_opts=engine_opts, cancel_token=cancel_token,
+                                     slots=slots)
+        elif engine == "async":
+            scanner = iter_async_scan_hosts(hosts, ports, cancel_token=cancel_token, **engine_opts)
+        else:
+            scanner = iter_scan_hosts(hosts, ports, parallel_hosts, scan_args, bulk=bulk, chunk_size=chunk_size,
+                                      cancel_token=cancel_token, slots=slots)
+
+        # Chaque hôte est émis et enregistré dès que son scan se termine
+        for host in scanner:
+            if cancel_token is not None and cancel_token.cancelled:
+                break
+            scanned += 1
+            ip = host.get("ip")
+            ports_info = host.get("ports", []) or []
+            host["services"] = detect_services(ports_info)
+            host.pop("raw", None)
+            host.pop("raw_output", None)
+            if host.get("error"):
+                errors += 1
+
+            open_count = sum(1 for p in ports_info if p.get("state") == "open" or p.get("open", False))
+            open_total += open_count
+            percent, total = scan_progress(scanned, hosts)
+
+            if on_host:
+                on_host(host)
+
+            if mode == "diff":
+                if host.get("changes"):
+                    changed += 1
+                    if any(c.get("change") == "host_down" for c in host["changes"]):
+                        inventory_index.mark_down(ip)
+                    else:
+                        inventory_index.upsert_host(host)
+                    if socketio:
+                        socketio.emit("scan_change", {"job_id": job_id, "ip": ip, "host": host}, to=room)
+                    if write_metrics:
+                        write_metrics("network_scan_host", {"open_ports": open_count}, {"ip": ip})
+                elif socketio and percent != last_percent:
+                    socketio.emit("scan_progress", {
+                        "job_id": job_id, "ip": ip, "progress": percent, "scanned": scanned, "total": total
+                    }, to=room)
+                last_percent = percent
+                continue
+
+            if not host.get("error"):
+                try:
+                    state = get_scan_state()
+                    state.mark_host(ip, "up")
+                    state.update_ports(ip, ports_info, with_fingerprint=engine == "nmap" and wants_fingerprint(scan_args))
+                except Exception as e:
+                    print(f"[background_discover_and_emit] scan state: {e}")
+                inventory_index.upsert_host(host)
+
+            if socketio:
+                socketio.emit("scan_progress", {
+                    "job_id": job_id,
+                    "ip": ip,
+                    "progress": percent,
+                    "scanned": scanned,
+                    "total": total,
+                    "host": host
+                }, to=room)
+            if write_metrics:
+                write_metrics("network_scan_host", {"open_ports": open_count}, {"ip": ip})
+    except ScanCancelled:
+        pass
     except Exception as e:
-        print(f"[background_discover_and_emit] discover_and_scan error: {e}")
+        print(f"[background_discover_and_emit] scan error: {e}")
+        payload = {
+            "success": False,
+            "job_id": job_id,
+            "error": str(e),
+            "scan_time": datetime.now().isoformat()
+        }
         if socketio:
-            socketio.emit("network_scan_complete", {
-                "success": False,
-                "error": str(e),
-                "scan_time": datetime.now().isoformat()
-            })
-        return
-
-    results = summary.get("results", [])
-    total = len(results)
-
-    def detect_services(port_list):
-        badges = []
-        for p in port_list:
-            port = p.get("port")
-            if port == 22:
-                badges.append("SSH")
-            elif port == 80:
-                badges.append("HTTP")
-            elif port == 443:
-                badges.append("HTTPS")
-            else:
-                badges.append(f"Port {port}")
-        return badges
-
-    for idx, host in enumerate(results):
-        ip = host.get("ip")
-        ports_info = host.get("ports", []) or []
-
-        # Ajout des badges de service
-        host["services"] = detect_services(ports_info)
-
-        # Émission de progression
-        percent = int((idx + 1) / total * 100)
-        socketio.emit("scan_progress", {
-            "ip": ip,
-            "progress": percent
-        })
-
-        # Enregistrement des métriques
-        open_count = sum(1 for p in ports_info if p.get("state") == "open" or p.get("open", False))
-        if write_metrics:
-            write_metrics("network_scan_host", {"open_ports": open_count}, {"ip": ip})
-
-    # Émission finale enrichie
-    socketio.emit("network_scan_complete", {
+            socketio.emit("network_scan_complete", payload, to=room)
+        return payload
+
+    # Émission finale : uniquement les totaux, les hôtes ont déjà été diffusés
+    summary = {
+        "network": network,
+        "mode": mode,
+        "engine": engine,
+        "hosts_scanned": scanned,
+        "open_ports": open_total,
+        "errors": errors,
+        "elapsed_seconds": time.time() - start
+    }
+    if mode == "diff":
+        summary["hosts_changed"] = changed
+    if hasattr(hosts, "stats"):
+        summary["discovery"] = hosts.stats()
+    if cancel_token is not None and cancel_token.cancelled:
+        summary["cancelled"] = True
+    payload = {
         "success": True,
+        "job_id": job_id,
         "summary": summary,
         "scan_time": datetime.now().isoformat()
-    })
+    }
+    if socketio:
+        socketio.emit("network_scan_complete", payload, to=room)
+    return payload
@@ -0,0 +1,311 @@
+import heapq
+import os
+import threading
+import time
+from operator import attrgetter
+from typing import Callable, Dict, List, Mapping, Optional
+
+import psutil
+
+from services.instrumentation import COLLECTOR_CYCLE_SECONDS, COLLECTOR_OVERRUNS, sampled_print
+from services.runtime import native_lock, run_blocking
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROCESS_TOP_N = int(os.environ.get("PROCESS_TOP_N", 10))
+PROCESS_SAMPLE_INTERVAL = float(os.environ.get("PROCESS_SAMPLE_INTERVAL", 5.0))
+# /proc/<pid>/io n'est lisible que pour ses propres processus (ou en root)
+PROCESS_IO = os.environ.get("PROCESS_IO", "1") not in ("0", "false", "no")
+PROC_ROOT = "/proc"
+# Descripteurs /proc persistants : budget fixe, la limite du processus n'est remontée que sur demande
+PROCESS_FD_BUDGET = int(os.environ.get("PROCESS_FD_BUDGET", 256))
+PROCESS_RAISE_NOFILE = os.environ.get("PROCESS_RAISE_NOFILE", "0") in ("1", "true", "yes")
+
+CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+# Nom tronqué par le noyau (comm, 15 caractères) : le nom complet est résolu pour le top seulement
+COMM_MAX = 15
+
+
+def _default_fd_budget() -> int:
+    """Descripteurs gardés ouverts sur /proc (1 à 2 par processus suivi, les autres sont relus par ouverture).
+
+    Budget fixe et modeste par défaut. Avec `PROCESS_RAISE_NOFILE=1` seulement,
+    la limite souple est remontée vers la limite dure (plafonnée à 65536) et la
+    moitié en est réservée au sampler.
+    """
+    if resource is None:
+        return 0
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if PROCESS_RAISE_NOFILE:
+        wanted = 65536 if hard == resource.RLIM_INFINITY else min(hard, 65536)
+        if soft != resource.RLIM_INFINITY and soft < wanted:
+            try:
+                resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+                soft = wanted
+            except (ValueError, OSError):
+                pass
+        return max(PROCESS_FD_BUDGET, soft // 2 - 64)
+    if soft == resource.RLIM_INFINITY:
+        return PROCESS_FD_BUDGET
+    return max(0, min(PROCESS_FD_BUDGET, soft // 4))
+
+
+def _parse_stat(data: bytes):
+    """`/proc/<pid>/stat` -> (nom, secondes CPU utime+stime de tous les threads, starttime, RSS en octets)."""
+    # comm peut contenir espaces et parenthèses : on coupe sur la dernière ')'
+    start, end = data.index(b"("), data.rindex(b")")
+    fields = data[end + 2:].split(None, 22)
+    ticks = int(fields[11]) + int(fields[12])
+    return data[start + 1:end].decode(errors="replace"), ticks / CLK_TCK, int(fields[19]), int(fields[21]) * PAGE_SIZE
+
+
+def _parse_io(data: bytes) -> int:
+    total = 0
+    for line in data.splitlines():
+        if line.startswith(b"read_bytes:") or line.startswith(b"write_bytes:"):
+            total += int(line.split()[1])
+    return total
+
+
+class _Handle:
+    """État persistant d'un processus entre deux ticks (descripteurs ou psutil.Process, compteurs)."""
+
+    __slots__ = ("pid", "stat_fd", "io_fd", "io_denied", "proc", "start_time", "name", "full_name",
+                 "cpu_seconds", "io_bytes", "seen_at", "cpu_percent", "rss_bytes", "io_rate")
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.stat_fd = self.io_fd = None
+        self.io_denied = False
+        self.proc = None
+        self.start_time = None
+        self.name = self.full_name = ""
+        self.cpu_seconds = self.io_bytes = None
+        self.seen_at = None
+        self.cpu_percent = 0.0
+        self.rss_bytes = 0
+        self.io_rate = None
+
+    def update(self, cpu_seconds: float, rss_bytes: int, io_bytes: Optional[int], now: float):
+        elapsed = now - self.seen_at if self.seen_at is not None else 0.0
+        # Première observation : pas de référence, 0 % (comme psutil.cpu_percent(interval=None))
+        if elapsed > 0 and self.cpu_seconds is not None:
+            self.cpu_percent = max(0.0, cpu_seconds - self.cpu_seconds) / elapsed * 100.0
+        if io_bytes is not None and elapsed > 0 and self.io_bytes is not None:
+            self.io_rate = max(0, io_bytes - self.io_bytes) / elapsed
+        self.cpu_seconds, self.rss_bytes, self.io_bytes, self.seen_at = cpu_seconds, rss_bytes, io_bytes, now
+
+    def row(self) -> dict:
+        row = {"pid": self.pid, "name": self.full_name or self.name,
+               "cpu_percent": round(self.cpu_percent, 2), "rss_bytes": self.rss_bytes}
+        if self.io_rate is not None:
+            row["io_bytes_per_s"] = round(self.io_rate, 1)
+        return row
+
+
+class ProcessSampler:
+    """Top-N des processus par CPU, mémoire (RSS) et E/S, à cadence fixe.
+
+    Un handle par PID est conservé d'un tick à l'autre : le CPU est un delta
+    de temps cumulé (utime+stime, tous threads confondus), sans attente. Sous
+    Linux, le handle garde des descripteurs ouverts sur `/proc/<pid>/stat` et
+    `io`, relus par `pread` sans réouverture ni passage par psutil. Ailleurs,
+    c'est `psutil.process_iter(attrs)` avec les `psutil.Process` mis en cache.
+    Les top-N sont extraits par tas (`heapq.nlargest`), sans tri complet.
+    """
+
+    def __init__(self, top_n: int = PROCESS_TOP_N, interval: float = PROCESS_SAMPLE_INTERVAL,
+                 proc_root: str = PROC_ROOT, io: bool = PROCESS_IO, fd_budget: Optional[int] = None,
+                 use_procfs: Optional[bool] = None):
+        self.top_n = max(1, top_n)
+        self.interval = max(0.1, interval)
+        self.proc_root = proc_root
+        self.io = io
+        # Calculé au premier échantillon : l'import du module ne touche pas aux limites du processus
+        self.fd_budget = fd_budget
+        self.use_procfs = os.path.isfile(os.path.join(proc_root, "stat")) if use_procfs is None else use_procfs
+        self._handles: Dict[int, _Handle] = {}
+        self._open_fds = 0
+        self._snapshot: Optional[Mapping] = None
+        self._listeners: List[Callable[[Mapping], None]] = []
+        self._stop = threading.Event()
+        # sample() tourne dans un thread OS (run_blocking) : verrou non patché, jamais un verrou vert
+        self._lock = native_lock()
+
+    def snapshot(self) -> Optional[Mapping]:
+        return self._snapshot
+
+    def subscribe(self, listener: Callable[[Mapping], None]):
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    # --- Lecture /proc ---
+    def _path(self, pid: int, kind: str) -> str:
+        return os.path.join(self.proc_root, str(pid), kind)
+
+    def _read_file(self, pid: int, kind: str) -> bytes:
+        fd = os.open(self._path(pid, kind), os.O_RDONLY)
+        try:
+            return os.read(fd, 4096)
+        finally:
+            os.close(fd)
+
+    def _open_handle(self, pid: int, with_io: bool) -> _Handle:
+        handle = _Handle(pid)
+        if self._open_fds + (2 if with_io else 1) <= self.fd_budget:
+            handle.stat_fd = os.open(self._path(pid, "stat"), os.O_RDONLY)
+            self._open_fds += 1
+            if with_io:
+                try:
+                    handle.io_fd = os.open(self._path(pid, "io"), os.O_RDONLY)
+                    self._open_fds += 1
+                except PermissionError:
+                    handle.io_denied = True
+                except OSError:
+                    pass
+        try:
+            data = os.pread(handle.stat_fd, 1024, 0) if handle.stat_fd is not None else self._read_file(pid, "stat")
+            handle.name, _, handle.start_time, _ = _parse_stat(data)
+        except (OSError, ValueError, IndexError):
+            # Processus terminé entre listdir et la lecture : descripteurs rendus au budget
+            self._close(handle)
+            raise
+        return handle
+
+    def _poll(self, handle: _Handle):
+        """(secondes CPU, RSS, octets E/S ou None) ; OSError si le processus a disparu."""
+        # Descripteur lié au processus d'origine : ESRCH s'il est mort ; sans descripteur
+        # (budget épuisé), `stat` est rouvert et la date de démarrage trahit un PID réutilisé
+        if handle.stat_fd is not None:
+            data = os.pread(handle.stat_fd, 1024, 0)
+        else:
+            data = self._read_file(handle.pid, "stat")
+        _, cpu_seconds, start_time, rss = _parse_stat(data)
+        if start_time != handle.start_time:
+            raise ProcessLookupError(handle.pid)
+        if handle.io_fd is not None:
+            return cpu_seconds, rss, _parse_io(os.pread(handle.io_fd, 512, 0))
+        io_bytes = None
+        if self.io and not handle.io_denied and handle.stat_fd is None:
+            try:
+                io_bytes = _parse_io(self._read_file(handle.pid, "io"))
+            except PermissionError:
+                handle.io_denied = True
+        return cpu_seconds, rss, io_bytes
+
+    def _close(self, handle: _Handle):
+        for attr in ("stat_fd", "io_fd"):
+            fd = getattr(handle, attr)
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+                setattr(handle, attr, None)
+                self._open_fds -= 1
+
+    def _refresh_procfs(self, now: float) -> set:
+        seen = set()
+        handles = self._handles
+        pids = [int(entry) for entry in os.listdir(self.proc_root) if entry.isdigit()]
+        # Budget trop juste pour 2 descripteurs par processus : CPU et RSS d'abord, E/S abandonnées
+        with_io = self.io and len(pids) * 2 <= self.fd_budget
+        for pid in pids:
+            handle = handles.get(pid)
+            try:
+                if handle is None:
+                    handle = handles[pid] = self._open_handle(pid, with_io)
+                cpu_seconds, rss, io_bytes = self._poll(handle)
+            except (OSError, ValueError, IndexError):
+                # Processus terminé (ou PID réutilisé) : le handle est fermé, recréé au tick suivant
+                continue
+            handle.update(cpu_seconds, rss, io_bytes, now)
+            seen.add(pid)
+        return seen
+
+    def _refresh_psutil(self, now: float) -> set:
+        attrs = ["name", "cpu_times", "memory_info"] + (["io_counters"] if self.io else [])
+        seen = set()
+        for proc in psutil.process_iter(attrs, ad_value=None):
+            info = proc.info
+            if info.get("cpu_times") is None or info.get("memory_info") is None:
+                continue
+            handle = self._handles.get(proc.pid)
+            if handle is None or handle.proc != proc:
+                handle = self._handles[proc.pid] = _Handle(proc.pid)
+                handle.proc = proc
+            cpu = info["cpu_times"]
+            io = info.get("io_counters")
+            handle.name = info.get("name") or ""
+            handle.update(cpu.user + cpu.system, info["memory_info"].rss,
+                          io.read_bytes + io.write_bytes if io is not None else None, now)
+            seen.add(proc.pid)
+        return seen
+
+    def _resolve_name(self, handle: _Handle):
+        if handle.full_name or len(handle.name) < COMM_MAX:
+            return
+        try:
+            handle.full_name = psutil.Process(handle.pid).name()
+        except (psutil.Error, OSError):
+            handle.full_name = handle.name
+
+    # --- Échantillonnage ---
+    def sample(self, now: Optional[float] = None) -> Mapping:
+        with self._lock:
+            if self.fd_budget is None:
+                self.fd_budget = _default_fd_budget() if self.use_procfs else 0
+            now = time.monotonic() if now is None else now
+            seen = self._refresh_procfs(now) if self.use_procfs else self._refresh_psutil(now)
+            for pid in [p for p in self._handles if p not in seen]:
+                self._close(self._handles.pop(pid))
+
+            handles = self._handles.values()
+            tops = {
+                "cpu": heapq.nlargest(self.top_n, handles, key=attrgetter("cpu_percent")),
+                "memory": heapq.nlargest(self.top_n, handles, key=attrgetter("rss_bytes")),
+                "io": heapq.nlargest(self.top_n, (h for h in handles if h.io_rate is not None),
+                                     key=attrgetter("io_rate")),
+            }
+            result = {"timestamp": time.time(), "process_count": len(self._handles)}
+            for key, top in tops.items():
+                for handle in top:
+                    self._resolve_name(handle)
+                result[key] = [h.row() for h in top]
+        return result
+
+    def publish(self, snapshot: Mapping):
+        self._snapshot = snapshot
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception as e:
+                print(f"[process_sampler] listener: {e}")
+
+    def run(self):
+        """Boucle bloquante (tâche de fond), même cadence fixe que SystemSampler.run."""
+        self._stop.clear()
+        self.sample()
+        cycle = COLLECTOR_CYCLE_SECONDS.labels(collector="processes")
+        next_tick = time.monotonic() + self.interval
+        while not self._stop.wait(max(0.0, next_tick - time.monotonic())):
+            next_tick += self.interval
+            with cycle.time():
+                try:
+                    self.publish(run_blocking(self.sample))
+                except Exception as e:
+                    sampled_print("process_sampler", f"[process_sampler] {e}")
+            if next_tick < time.monotonic():
+                COLLECTOR_OVERRUNS.labels(collector="processes").inc()
+                next_tick = time.monotonic() + self.interval
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            for handle in self._handles.values():
+                self._close(handle)
+            self._handles.clear()
@@ -0,0 +1,92 @@
+import os
+import sys
+import threading
+
+# threading (serveur de dev Werkzeug), eventlet ou gevent (gunicorn, voir gunicorn.conf.py)
+ASYNC_MODE = os.environ.get("ASYNC_MODE", "threading")
+COLLECTOR_LOCK_FILE = os.environ.get("COLLECTOR_LOCK_FILE", "logs/collectors.lock")
+
+_leader_lock = None
+
+
+def monkey_patch():
+    """À appeler avant tout autre import en mode eventlet/gevent (idempotent ; gunicorn le fait déjà)."""
+    if ASYNC_MODE == "eventlet":
+        import eventlet
+        eventlet.monkey_patch()
+    elif ASYNC_MODE == "gevent":
+        from gevent import monkey
+        monkey.patch_all()
+
+
+def _green_backend() -> str:
+    eventlet = sys.modules.get("eventlet")
+    if eventlet is not None:
+        from eventlet import patcher
+        if patcher.is_monkey_patched("thread"):
+            return "eventlet"
+    gevent_monkey = sys.modules.get("gevent.monkey")
+    if gevent_monkey is not None and gevent_monkey.is_module_patched("threading"):
+        return "gevent"
+    return ""
+
+
+def run_blocking(fn, *args, **kwargs):
+    """Exécute `fn` dans un vrai thread OS quand la boucle est verte (eventlet/gevent).
+
+    Réservé aux appels bloquants « purs » (psutil, parsing CPU) : `fn` ne doit
+    pas utiliser de primitives vertes (sockets patchés, verrous, sleep).
+    En mode threading, appel direct.
+    """
+    backend = _green_backend()
+    if backend == "eventlet":
+        from eventlet import tpool
+        return tpool.execute(fn, *args, **kwargs)
+    if backend == "gevent":
+        import gevent
+        return gevent.get_hub().threadpool.apply(fn, args, kwargs)
+    return fn(*args, **kwargs)
+
+
+def native_lock():
+    """Verrou du système, jamais patché : le seul utilisable par une fonction passée à `run_blocking`.
+
+    À créer après le monkey patching (à l'import de l'application), pour que
+    le choix reflète le mode effectif.
+    """
+    backend = _green_backend()
+    if backend == "eventlet":
+        from eventlet import patcher
+        return patcher.original("threading").Lock()
+    if backend == "gevent":
+        from gevent.monkey import get_original
+        return get_original("_thread", "allocate_lock")()
+    return threading.Lock()
+
+
+def acquire_collector_lock(path: str = COLLECTOR_LOCK_FILE) -> bool:
+    """Un seul processus (worker gunicorn) collecte ; les autres ne font que servir.
+
+    Verrou `flock` gardé toute la vie du processus : s'il meurt, le verrou est
+    libéré et le prochain worker démarré reprend la collecte.
+    """
+    global _leader_lock
+    if _leader_lock is not None:
+        return True
+    try:
+        import fcntl
+    except ImportError:
+        return True  # pas de flock (Windows) : un seul processus de toute façon
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    f = open(path, "a+")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return False
+    f.seek(0)
+    f.truncate()
+    f.write(str(os.getpid()))
+    f.flush()
+    _leader_lock = f
+    return True
@@ -0,0 +1,155 @@
+import threading
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from net_discovery_nmap import iter_scan_hosts, nmap_slots, scan_host
+from services.scan_state import ScanStateStore, fingerprint
+
+# Options coûteuses retirées de la passe rapide (détection de version / OS / scripts)
+SLOW_FLAGS = ("-sV", "-A", "-sC", "-O")
+
+
+def fast_scan_args(scan_args: str) -> str:
+    tokens = [t for t in scan_args.split() if t not in SLOW_FLAGS and not t.startswith("--version")]
+    return " ".join(tokens) or "-sT"
+
+
+def wants_fingerprint(scan_args: str) -> bool:
+    return any(t in ("-sV", "-A") for t in scan_args.split())
+
+
+def compare_ports(known: Dict[Tuple[int, str], dict], ports: List[dict], now: float,
+                  fingerprint_ttl: float, probe_enabled: bool = True):
+    """Compare la passe rapide à l'état connu.
+
+    Renvoie (changements, ports à enregistrer, ports à sonder en -sV).
+    """
+    current = {(int(p["port"]), p.get("protocol", "tcp")): p for p in ports}
+    # Un port ouvert connu qui n'apparaît plus est considéré fermé
+    for key, prev in known.items():
+        if key not in current and prev.get("state") == "open":
+            current[key] = {"port": key[0], "protocol": key[1], "state": "closed"}
+
+    changes, to_store, probe = [], [], []
+    for key, p in current.items():
+        prev = known.get(key)
+        state = p.get("state", "")
+        if prev is None:
+            if state != "open":
+                continue
+            changes.append({"port": key[0], "protocol": key[1], "change": "new", "old_state": None, "state": state})
+        elif prev.get("state") != state:
+            changes.append({"port": key[0], "protocol": key[1],
+                            "change": "opened" if state == "open" else "closed",
+                            "old_state": prev.get("state"), "state": state})
+        to_store.append(p)
+
+        if probe_enabled and state == "open":
+            stale = not prev or not prev.get("fingerprint_at") or now - prev["fingerprint_at"] > fingerprint_ttl
+            if stale or prev.get("state") != state:
+                probe.append(key[0])
+    return changes, to_store, sorted(set(probe))
+
+
+def _probe(slots: Optional[threading.Semaphore], ip: str, ports: List[int], scan_args: str, cancel_token=None) -> dict:
+    with slots or nullcontext():
+        args = (ip, ports, scan_args) + ((cancel_token,) if cancel_token is not None else ())
+        return scan_host(*args)
+
+
+def _merge_probe(result: dict, known: Dict[Tuple[int, str], dict], fut, store: ScanStateStore, now: float) -> dict:
+    """Complète le résultat de la passe rapide avec les empreintes -sV sondées."""
+    try:
+        probed = fut.result()
+    except Exception as e:
+        probed = {"error": str(e)}
+    if probed.get("error"):
+        result["probe_error"] = probed["error"]
+        return result
+
+    probed_ports = probed.get("ports", [])
+    store.update_ports(result["ip"], probed_ports, with_fingerprint=True, now=now)
+    by_key = {(p["port"], p.get("protocol", "tcp")): p for p in probed_ports}
+    changed_keys = {(c["port"], c["protocol"]) for c in result["changes"] if "port" in c}
+    for key, p in by_key.items():
+        prev = known.get(key)
+        if prev and prev.get("fingerprint_at") and key not in changed_keys \
+                and fingerprint(prev) != fingerprint(p):
+            result["changes"].append({
+                "port": key[0], "protocol": key[1], "change": "service_changed",
+                "old_service": " ".join(x for x in fingerprint(prev) if x),
+                "state": p.get("state", ""),
+            })
+    result["ports"] = [by_key.get((p["port"], p.get("protocol", "tcp")), p) for p in result["ports"]]
+    return result
+
+
+def iter_diff_scan(hosts: Iterable[str], ports: List[int], store: ScanStateStore, network: Optional[str] = None,
+                   parallel_hosts: int = 8, scan_args: str = "-sT -sV", chunk_size: int = 64,
+                   fingerprint_ttl: float = 24 * 3600, engine: str = "nmap",
+                   engine_opts: Optional[dict] = None, cancel_token=None,
+                   slots: Optional[threading.Semaphore] = None) -> Iterator[dict]:
+    """Scan différentiel : passe rapide (états des ports) puis -sV uniquement sur ce qui a changé ou est périmé.
+
+    Produit un dict par hôte traité ; `changes` est vide si rien n'a bougé. Avec
+    le moteur asyncio, seule la passe rapide est faite (pas d'empreinte de service).
+    Un scan annulé ne marque aucun hôte comme tombé : il n'a pas tout vu.
+    Passe rapide et sondes -sV puisent dans le même budget de processus nmap
+    (`slots`, `parallel_hosts` par défaut) ; les sondes terminées sont produites
+    sans attendre la fin de la passe rapide.
+    """
+    now = time.time()
+    probe_enabled = engine == "nmap" and wants_fingerprint(scan_args)
+    seen = set()
+
+    if engine == "async":
+        from net_discovery_async import iter_async_scan_hosts
+        fast_pass = iter_async_scan_hosts(hosts, ports, cancel_token=cancel_token, **(engine_opts or {}))
+    else:
+        slots = slots or nmap_slots(parallel_hosts)
+        fast_pass = iter_scan_hosts(hosts, ports, parallel_hosts, fast_scan_args(scan_args),
+                                    bulk=True, chunk_size=chunk_size, cancel_token=cancel_token, slots=slots)
+
+    with ThreadPoolExecutor(max_workers=max(1, parallel_hosts)) as probe_pool:
+        futures = {}
+        for host in fast_pass:
+            if cancel_token is not None and cancel_token.cancelled:
+                break
+            ip = host.get("ip")
+            seen.add(ip)
+            if host.get("error"):
+                yield {**host, "changes": []}
+                continue
+            if host.get("status") == "down":
+                seen.discard(ip)
+                continue
+
+            known = store.get_ports(ip)
+            previous = store.get_host(ip)
+            host_change = [] if previous and previous.get("status") == "up" else [{"change": "host_up"}]
+            store.mark_host(ip, "up", now)
+            changes, to_store, probe = compare_ports(known, host.get("ports", []), now, fingerprint_ttl, probe_enabled)
+            store.update_ports(ip, to_store, with_fingerprint=False, now=now)
+            result = {"ip": ip, "ports": to_store, "changes": host_change + changes}
+
+            if probe:
+                futures[probe_pool.submit(_probe, slots, ip, probe, scan_args, cancel_token)] = (result, known)
+            else:
+                yield result
+            # Sondes déjà terminées : diffusées sans attendre la fin de la passe rapide
+            for fut in [f for f in futures if f.done()]:
+                result, known = futures.pop(fut)
+                yield _merge_probe(result, known, fut, store, now)
+
+        for fut in as_completed(futures):
+            result, known = futures[fut]
+            yield _merge_probe(result, known, fut, store, now)
+
+    # Hôtes connus du réseau qui ne répondent plus
+    if network and not (cancel_token is not None and cancel_token.cancelled):
+        for ip in store.known_hosts(network):
+            if ip not in seen:
+                store.mark_host(ip, "down", now)
+                yield {"ip": ip, "ports": [], "changes": [{"change": "host_down"}]}
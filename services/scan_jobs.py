@@ -0,0 +1,201 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Optional, Tuple
+
+from net_discovery_nmap import CancelToken
+
+SCAN_WORKER_BUDGET = int(os.environ.get("SCAN_WORKER_BUDGET", 32))
+SCAN_JOB_MAX_RESULTS = int(os.environ.get("SCAN_JOB_MAX_RESULTS", 5000))
+SCAN_JOB_HISTORY = int(os.environ.get("SCAN_JOB_HISTORY", 50))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Paramètres qui définissent un scan identique (la déduplication les compare)
+DEDUP_KEYS = ("network", "ports", "scan_args", "ping_args", "bulk", "chunk_size", "mode", "engine", "engine_opts")
+
+
+def dedup_key(params: dict) -> Tuple:
+    key = []
+    for k in DEDUP_KEYS:
+        v = params.get(k)
+        if isinstance(v, dict):
+            v = tuple(sorted(v.items()))
+        elif isinstance(v, list):
+            v = tuple(v)
+        key.append(v)
+    return tuple(key)
+
+
+class ScanJob:
+    def __init__(self, params: dict, workers: int, max_results: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.params = params
+        self.workers = workers
+        self.key = dedup_key(params)
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.token = CancelToken()
+        self.scanned = 0
+        self.summary: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.results = deque(maxlen=max_results)
+        self.results_dropped = 0
+        self._lock = threading.Lock()
+
+    @property
+    def room(self) -> str:
+        return f"scan/{self.id}"
+
+    def record_host(self, host: dict):
+        with self._lock:
+            self.scanned += 1
+            if len(self.results) == self.results.maxlen:
+                self.results_dropped += 1
+            self.results.append(host)
+
+    def to_dict(self, offset: int = 0, limit: Optional[int] = None, with_results: bool = True) -> dict:
+        with self._lock:
+            data = {
+                "job_id": self.id,
+                "room": self.room,
+                "status": self.status,
+                "network": self.params.get("network"),
+                "mode": self.params.get("mode"),
+                "engine": self.params.get("engine"),
+                "workers": self.workers,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "hosts_scanned": self.scanned,
+                "results_dropped": self.results_dropped,
+                "summary": self.summary,
+                "error": self.error,
+            }
+            if with_results:
+                results = list(self.results)
+                end = None if limit is None else offset + limit
+                data["results"] = results[offset:end]
+                data["results_total"] = len(results)
+        return data
+
+
+class ScanJobManager:
+    """File de jobs de scan avec un budget global de workers partagé.
+
+    Un job réserve `parallel` workers (borné au budget) et ne démarre que si le
+    budget le permet, dans l'ordre d'arrivée. Une demande identique à un job
+    en file ou en cours renvoie ce job au lieu d'en lancer un second.
+    """
+
+    def __init__(self, runner: Callable[..., Optional[dict]], spawn: Optional[Callable] = None,
+                 worker_budget: int = SCAN_WORKER_BUDGET, max_results: int = SCAN_JOB_MAX_RESULTS,
+                 history: int = SCAN_JOB_HISTORY):
+        self.runner = runner
+        self.spawn = spawn or self._spawn_thread
+        self.worker_budget = max(1, worker_budget)
+        self.max_results = max_results
+        self.history = history
+        self.in_use = 0
+        self._jobs: "OrderedDict[str, ScanJob]" = OrderedDict()
+        self._queue: deque = deque()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _spawn_thread(fn, *args):
+        threading.Thread(target=fn, args=args, name="scan-job", daemon=True).start()
+
+    def submit(self, params: dict) -> Tuple[ScanJob, bool]:
+        """Renvoie (job, créé) ; `créé` vaut False si un job identique était déjà actif."""
+        key = dedup_key(params)
+        with self._lock:
+            for job in self._jobs.values():
+                if job.key == key and job.status in ACTIVE_STATUSES:
+                    return job, False
+            workers = min(self.worker_budget, max(1, int(params.get("parallel_hosts", 1))))
+            job = ScanJob(params, workers, self.max_results)
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            self._prune()
+            to_start = self._dispatch()
+        for started in to_start:
+            self.spawn(self._run, started)
+        return job, True
+
+    def get(self, job_id: str) -> Optional[ScanJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> list:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [j.to_dict(with_results=False) for j in reversed(jobs)]
+
+    def cancel(self, job_id: str) -> Optional[ScanJob]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in ACTIVE_STATUSES:
+                return job
+            if job.status == "queued":
+                self._queue.remove(job)
+                job.status = "cancelled"
+                job.finished_at = time.time()
+                return job
+            job.status = "cancelling"
+        # Tue les nmap en cours ; le runner termine le job à sa sortie
+        job.token.cancel()
+        return job
+
+    def stats(self) -> dict:
+        with self._lock:
+            running = sum(1 for j in self._jobs.values() if j.status in ("running", "cancelling"))
+            return {
+                "worker_budget": self.worker_budget,
+                "workers_in_use": self.in_use,
+                "queued": len(self._queue),
+                "running": running,
+                "jobs": len(self._jobs),
+            }
+
+    def _dispatch(self) -> list:
+        # Ordre FIFO strict : un gros job en tête n'est pas doublé par les petits
+        started = []
+        while self._queue and self.in_use + self._queue[0].workers <= self.worker_budget:
+            job = self._queue.popleft()
+            self.in_use += job.workers
+            job.status = "running"
+            job.started_at = time.time()
+            started.append(job)
+        return started
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j.status not in ACTIVE_STATUSES + ("cancelling",)]
+        for job in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job.id]
+
+    def _run(self, job: ScanJob):
+        params = dict(job.params, parallel_hosts=job.workers)
+        try:
+            payload = self.runner(job_id=job.id, cancel_token=job.token, on_host=job.record_host, **params) or {}
+        except Exception as e:
+            print(f"[scan_jobs] job {job.id}: {e}")
+            payload = {"success": False, "error": str(e)}
+
+        with self._lock:
+            if job.token.cancelled:
+                job.status = "cancelled"
+            elif payload.get("success"):
+                job.status = "done"
+            else:
+                job.status = "failed"
+            job.summary = payload.get("summary")
+            job.error = payload.get("error")
+            job.finished_at = time.time()
+            self.in_use -= job.workers
+            to_start = self._dispatch()
+        for started in to_start:
+            self.spawn(self._run, started)
@@ -0,0 +1,163 @@
+import ipaddress
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hosts (
+    ip TEXT PRIMARY KEY,
+    status TEXT,
+    last_seen REAL
+);
+CREATE TABLE IF NOT EXISTS ports (
+    ip TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    proto TEXT NOT NULL,
+    state TEXT,
+    service TEXT,
+    product TEXT,
+    version TEXT,
+    extrainfo TEXT,
+    fingerprint_at REAL,
+    last_seen REAL,
+    PRIMARY KEY (ip, port, proto)
+);
+"""
+
+FINGERPRINT_KEYS = ("service", "product", "version", "extrainfo")
+# Plage d'octets nmap : 10.0.0.1-20, 10.0.1,3.*, 192.168.-.1
+_OCTET_RANGE = re.compile(r"^[\d,*-]+(\.[\d,*-]+){3}$")
+
+
+def fingerprint(port_info: dict) -> Tuple[str, ...]:
+    return tuple(port_info.get(k) or "" for k in FINGERPRINT_KEYS)
+
+
+def _octet_matches(spec: str, value: int) -> bool:
+    for part in spec.split(","):
+        if part in ("*", "-"):
+            return True
+        low, sep, high = part.partition("-")
+        if sep:
+            if int(low or 0) <= value <= int(high or 255):
+                return True
+        elif part.isdigit() and int(part) == value:
+            return True
+    return False
+
+
+def in_target(ip: str, target: str) -> bool:
+    """`ip` fait-il partie de la cible nmap `target` (CIDR, plages d'octets, noms, séparés par des espaces) ?
+
+    Un nom d'hôte ne correspond qu'à lui-même : ses adresses résolues ne sont
+    jamais déclarées tombées par un scan qui ne les a pas vues.
+    """
+    for token in target.split():
+        try:
+            if ipaddress.ip_address(ip) in ipaddress.ip_network(token, strict=False):
+                return True
+            continue
+        except ValueError:
+            pass
+        if _OCTET_RANGE.match(token) and ip.count(".") == 3:
+            if all(_octet_matches(spec, int(octet)) for spec, octet in zip(token.split("."), ip.split("."))):
+                return True
+        elif token == ip:
+            return True
+    return False
+
+
+class ScanStateStore:
+    """État persistant des scans, clé (ip, port, proto) : dernier état, empreinte de service, vu pour la dernière fois."""
+
+    def __init__(self, path: str = "logs/scan_state.sqlite3"):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get_ports(self, ip: str) -> Dict[Tuple[int, str], dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM ports WHERE ip = ?", (ip,)).fetchall()
+        return {(r["port"], r["proto"]): dict(r) for r in rows}
+
+    def get_host(self, ip: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM hosts WHERE ip = ?", (ip,)).fetchone()
+        return dict(row) if row else None
+
+    def known_hosts(self, network: Optional[str] = None, status: Optional[str] = "up") -> List[str]:
+        with self._lock:
+            if status:
+                rows = self._conn.execute("SELECT ip FROM hosts WHERE status = ?", (status,)).fetchall()
+            else:
+                rows = self._conn.execute("SELECT ip FROM hosts").fetchall()
+        ips = [r["ip"] for r in rows]
+        if not network:
+            return ips
+        return [ip for ip in ips if in_target(ip, network)]
+
+    def all_hosts(self) -> List[dict]:
+        """Tous les hôtes avec leurs ports, en deux requêtes (chargement initial de l'inventaire)."""
+        with self._lock:
+            hosts = [dict(r) for r in self._conn.execute("SELECT * FROM hosts ORDER BY ip").fetchall()]
+            rows = self._conn.execute("SELECT * FROM ports").fetchall()
+        ports: Dict[str, List[dict]] = {}
+        for r in rows:
+            ports.setdefault(r["ip"], []).append({
+                "port": r["port"], "protocol": r["proto"], "state": r["state"], "service": r["service"] or "",
+            })
+        for h in hosts:
+            h["ports"] = ports.get(h["ip"], [])
+        return hosts
+
+    def mark_host(self, ip: str, status: str, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO hosts (ip, status, last_seen) VALUES (?, ?, ?) "
+                "ON CONFLICT(ip) DO UPDATE SET status = excluded.status, "
+                "last_seen = CASE WHEN excluded.status = 'up' THEN excluded.last_seen ELSE hosts.last_seen END",
+                (ip, status, now),
+            )
+
+    def update_ports(self, ip: str, ports: List[dict], with_fingerprint: bool, now: Optional[float] = None):
+        """Enregistre l'état des ports ; l'empreinte n'est écrasée que si elle vient d'un scan -sV."""
+        now = time.time() if now is None else now
+        with self._lock, self._conn:
+            for p in ports:
+                key = (ip, int(p["port"]), p.get("protocol", "tcp"))
+                if with_fingerprint:
+                    self._conn.execute(
+                        "INSERT INTO ports (ip, port, proto, state, service, product, version, extrainfo, fingerprint_at, last_seen) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT(ip, port, proto) DO UPDATE SET state = excluded.state, service = excluded.service, "
+                        "product = excluded.product, version = excluded.version, extrainfo = excluded.extrainfo, "
+                        "fingerprint_at = excluded.fingerprint_at, last_seen = excluded.last_seen",
+                        key + (p.get("state", ""),) + fingerprint(p) + (now, now),
+                    )
+                else:
+                    self._conn.execute(
+                        "INSERT INTO ports (ip, port, proto, state, last_seen) VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT(ip, port, proto) DO UPDATE SET state = excluded.state, last_seen = excluded.last_seen",
+                        key + (p.get("state", ""), now),
+                    )
+
+    def stats(self) -> dict:
+        with self._lock:
+            hosts = self._conn.execute("SELECT COUNT(*) FROM hosts").fetchone()[0]
+            ports = self._conn.execute("SELECT COUNT(*) FROM ports").fetchone()[0]
+        return {"path": self.path, "hosts": hosts, "ports": ports}
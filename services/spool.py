@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+SPOOL_SEGMENT_BYTES = int(os.environ.get("SPOOL_SEGMENT_BYTES", 8 * 1024 * 1024))
+SPOOL_MAX_BYTES = int(os.environ.get("SPOOL_MAX_BYTES", 256 * 1024 * 1024))
+SPOOL_FSYNC = os.environ.get("SPOOL_FSYNC", "1") not in ("0", "false", "no")
+
+Position = Tuple[int, int]  # (numéro de segment, offset en octets)
+
+
+class Spool:
+    """Journal local en ajout seul de line protocol, découpé en segments.
+
+    - `append()` écrit un batch (une ligne par point) dans le segment actif,
+      rotation au-delà de `segment_bytes` ;
+    - au-delà de `max_bytes`, les segments les plus anciens sont supprimés
+      (perte des données les plus vieilles, comptée dans `dropped_*`) ;
+    - `read()` / `commit()` avancent un curseur persistant (`cursor`, remplacé
+      atomiquement) : après un crash, la relecture reprend au dernier commit.
+      Un batch peut donc être renvoyé deux fois, ce qu'InfluxDB absorbe (même
+      série + même timestamp = même point).
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = SPOOL_SEGMENT_BYTES,
+                 max_bytes: int = SPOOL_MAX_BYTES, fsync: bool = SPOOL_FSYNC):
+        self.directory = directory
+        self.segment_bytes = max(1, segment_bytes)
+        self.max_bytes = max(self.segment_bytes, max_bytes)
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._sizes = {}
+        self._oldest_cache: Tuple[Optional[Position], Optional[float]] = (None, None)
+
+        self.appended_points = 0
+        self.dropped_bytes = 0
+        self.dropped_segments = 0
+
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.startswith("segment-") and name.endswith(".lp"):
+                seq = int(name[8:-3])
+                self._sizes[seq] = os.path.getsize(self._path(seq))
+        self._repair_tail()
+        self._cursor = self._load_cursor()
+
+    # --- Fichiers ---
+    def _path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"segment-{seq:012d}.lp")
+
+    @property
+    def _cursor_path(self) -> str:
+        return os.path.join(self.directory, "cursor")
+
+    def _repair_tail(self):
+        """Tronque une dernière ligne incomplète (écriture interrompue par un crash)."""
+        if not self._sizes:
+            return
+        seq = max(self._sizes)
+        size = self._sizes[seq]
+        if not size:
+            return
+        with open(self._path(seq), "rb+") as f:
+            f.seek(max(0, size - 65536))
+            tail = f.read()
+            if tail.endswith(b"\n"):
+                return
+            cut = tail.rfind(b"\n")
+            new_size = size - len(tail) + cut + 1 if cut >= 0 else max(0, size - len(tail))
+            f.truncate(new_size)
+        self._sizes[seq] = new_size
+        print(f"[spool] segment {seq} réparé ({size - new_size} octets tronqués)")
+
+    def _load_cursor(self) -> Position:
+        first = min(self._sizes) if self._sizes else 0
+        try:
+            with open(self._cursor_path) as f:
+                seq, offset = (int(x) for x in f.read().split())
+        except (OSError, ValueError):
+            return first, 0
+        if seq not in self._sizes:
+            return first, 0
+        return seq, min(offset, self._sizes[seq])
+
+    def _save_cursor(self):
+        tmp = self._cursor_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(f"{self._cursor[0]} {self._cursor[1]}\n")
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, self._cursor_path)
+
+    def _drop_segment(self, seq: int):
+        self._sizes.pop(seq, None)
+        try:
+            os.remove(self._path(seq))
+        except OSError:
+            pass
+
+    # --- Écriture ---
+    def append(self, payload: str) -> int:
+        if not payload:
+            return 0
+        data = payload.encode() if payload.endswith("\n") else (payload + "\n").encode()
+        lines = data.count(b"\n")
+        with self._lock:
+            seq = max(self._sizes) if self._sizes else 0
+            if seq in self._sizes and self._sizes[seq] and self._sizes[seq] + len(data) > self.segment_bytes:
+                seq += 1
+            with open(self._path(seq), "ab") as f:
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._sizes[seq] = self._sizes.get(seq, 0) + len(data)
+            self.appended_points += lines
+            self._enforce_cap()
+        return lines
+
+    def _enforce_cap(self):
+        while sum(self._sizes.values()) > self.max_bytes and len(self._sizes) > 1:
+            oldest = min(self._sizes)
+            unsent = self._sizes[oldest] - (self._cursor[1] if self._cursor[0] == oldest else 0)
+            if self._cursor[0] <= oldest:
+                self.dropped_bytes += max(0, unsent)
+                self._cursor = (min(s for s in self._sizes if s > oldest), 0)
+                self._save_cursor()
+            self._drop_segment(oldest)
+            self.dropped_segments += 1
+            print(f"[spool] plafond atteint : segment {oldest} supprimé")
+
+    # --- Relecture ---
+    def read(self, max_lines: int) -> Tuple[List[str], Position]:
+        """Jusqu'à `max_lines` lignes non envoyées, et la position à passer à `commit()`."""
+        with self._lock:
+            seq, offset = self._cursor
+            lines: List[str] = []
+            while len(lines) < max_lines and seq in self._sizes:
+                size = self._sizes[seq]
+                if offset < size:
+                    with open(self._path(seq), "rb") as f:
+                        f.seek(offset)
+                        while len(lines) < max_lines and offset < size:
+                            raw = f.readline()
+                            if not raw.endswith(b"\n"):
+                                break
+                            offset += len(raw)
+                            lines.append(raw.decode().rstrip("\n"))
+                if offset < size or seq == max(self._sizes):
+                    break
+                seq, offset = seq + 1, 0
+            return lines, (seq, offset)
+
+    def commit(self, position: Position):
+        with self._lock:
+            if position <= self._cursor:
+                return
+            self._cursor = position
+            self._save_cursor()
+            for seq in [s for s in self._sizes if s < position[0]]:
+                self._drop_segment(seq)
+
+    # --- État ---
+    def pending_bytes(self) -> int:
+        with self._lock:
+            seq, offset = self._cursor
+            return sum(size for s, size in self._sizes.items() if s >= seq) - offset
+
+    def oldest_timestamp(self) -> Optional[float]:
+        """Horodatage (s) du plus ancien point non envoyé, lu dans sa ligne ; None si vide."""
+        with self._lock:
+            cursor = self._cursor
+            if self._oldest_cache[0] == cursor:
+                return self._oldest_cache[1]
+        lines, _ = self.read(1)
+        ts = None
+        if lines:
+            try:
+                ts = int(lines[0].rsplit(" ", 1)[1]) / 1e9
+            except (IndexError, ValueError):
+                ts = os.path.getmtime(self._path(cursor[0]))
+        with self._lock:
+            self._oldest_cache = (cursor, ts)
+        return ts
+
+    def stats(self) -> dict:
+        oldest = self.oldest_timestamp()
+        with self._lock:
+            total = sum(self._sizes.values())
+            segments = len(self._sizes)
+        return {
+            "spool_bytes": total,
+            "spool_pending_bytes": self.pending_bytes(),
+            "spool_segments": segments,
+            "spool_appended_points": self.appended_points,
+            "spool_dropped_bytes": self.dropped_bytes,
+            "spool_oldest_unsent_age_s": round(max(0.0, time.time() - oldest), 3) if oldest else 0.0,
+        }
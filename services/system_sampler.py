@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Callable, List, Mapping, Optional
+
+import psutil
+
+from services.instrumentation import COLLECTOR_CYCLE_SECONDS, COLLECTOR_OVERRUNS, sampled_print
+from services.runtime import run_blocking
+
+SYSTEM_SAMPLE_INTERVAL = float(os.environ.get("SYSTEM_SAMPLE_INTERVAL", 5.0))
+SYSTEM_DISK_PATH = os.environ.get("SYSTEM_DISK_PATH", "/")
+
+
+def _rate(current: float, previous: Optional[float], elapsed: float) -> float:
+    # Compteur remis à zéro (redémarrage d'interface) : pas de débit négatif
+    if previous is None or elapsed <= 0 or current < previous:
+        return 0.0
+    return (current - previous) / elapsed
+
+
+class SystemSampler:
+    """Seul propriétaire des appels psutil : échantillonne à cadence fixe et publie un snapshot immuable.
+
+    `cpu_percent(interval=None)` mesure l'écart depuis l'appel précédent, qui
+    est celui du sampler lui-même : la valeur ne dépend plus des autres
+    appelants. Les débits disque / réseau sont dérivés des compteurs cumulés.
+    """
+
+    def __init__(self, interval: float = SYSTEM_SAMPLE_INTERVAL, disk_path: str = SYSTEM_DISK_PATH):
+        self.interval = max(0.1, interval)
+        self.disk_path = disk_path
+        self._snapshot: Optional[Mapping] = None
+        self._prev = None
+        self._listeners: List[Callable[[Mapping], None]] = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Optional[Mapping]:
+        """Dernier échantillon publié (lecture sans appel système), None avant le premier."""
+        return self._snapshot
+
+    def subscribe(self, listener: Callable[[Mapping], None]):
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def _read(self) -> tuple:
+        """Appels psutil seuls, sans état ni verrou : exécutés dans un vrai thread OS (`run_blocking`)."""
+        now = time.monotonic()
+        cpu = psutil.cpu_percent(interval=None)
+        per_cpu = psutil.cpu_percent(interval=None, percpu=True)
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        net = psutil.net_io_counters()
+        try:
+            disk_io = psutil.disk_io_counters()
+        except Exception:
+            disk_io = None
+        try:
+            load = os.getloadavg()
+        except (AttributeError, OSError):
+            load = (0.0, 0.0, 0.0)
+        counters = {
+            "net_sent": getattr(net, "bytes_sent", 0),
+            "net_recv": getattr(net, "bytes_recv", 0),
+            "disk_read": getattr(disk_io, "read_bytes", 0),
+            "disk_write": getattr(disk_io, "write_bytes", 0),
+        }
+        return now, cpu, per_cpu, memory, disk, load, counters
+
+    def sample(self) -> Mapping:
+        # psutil bloque (syscalls, /proc) : vrai thread OS en mode eventlet/gevent ;
+        # le verrou (vert dans ce mode) n'est pris qu'au retour, sur la boucle
+        now, cpu, per_cpu, memory, disk, load, counters = run_blocking(self._read)
+        with self._lock:
+            prev_time, prev = self._prev if self._prev else (now, {})
+            elapsed = now - prev_time
+            self._prev = (now, counters)
+
+        data = {
+            "timestamp": time.time(),
+            "cpu_percent": cpu,
+            "cpu_count": len(per_cpu) if isinstance(per_cpu, list) else psutil.cpu_count(),
+            "load_1": load[0],
+            "load_5": load[1],
+            "load_15": load[2],
+            "memory_percent": memory.percent,
+            "memory_used_gb": memory.used / (1024**3),
+            "disk_percent": disk.percent,
+            "disk_used_gb": disk.used / (1024**3),
+            "disk_read_bytes_per_s": _rate(counters["disk_read"], prev.get("disk_read"), elapsed),
+            "disk_write_bytes_per_s": _rate(counters["disk_write"], prev.get("disk_write"), elapsed),
+            "net_bytes_sent": counters["net_sent"],
+            "net_bytes_recv": counters["net_recv"],
+            "net_sent_bytes_per_s": _rate(counters["net_sent"], prev.get("net_sent"), elapsed),
+            "net_recv_bytes_per_s": _rate(counters["net_recv"], prev.get("net_recv"), elapsed),
+        }
+        if isinstance(per_cpu, list):
+            for i, value in enumerate(per_cpu):
+                data[f"cpu{i}_percent"] = value
+        return MappingProxyType(data)
+
+    def publish(self, snapshot: Mapping):
+        # Remplacement atomique de la référence : les lecteurs n'ont pas besoin de verrou
+        self._snapshot = snapshot
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception as e:
+                print(f"[system_sampler] listener: {e}")
+
+    def run(self):
+        """Boucle bloquante (tâche de fond) ; la cadence ne dérive pas avec la durée des listeners."""
+        self._stop.clear()
+        # Amorce les compteurs : le premier cpu_percent(interval=None) n'a pas de référence
+        self.sample()
+        cycle = COLLECTOR_CYCLE_SECONDS.labels(collector="system")
+        next_tick = time.monotonic() + self.interval
+        while not self._stop.wait(max(0.0, next_tick - time.monotonic())):
+            next_tick += self.interval
+            with cycle.time():
+                try:
+                    self.publish(self.sample())
+                except Exception as e:
+                    sampled_print("system_sampler", f"[system_sampler] {e}")
+            if next_tick < time.monotonic():
+                # Le cycle a dépassé la période : tick sauté plutôt qu'un rattrapage en rafale
+                COLLECTOR_OVERRUNS.labels(collector="system").inc()
+                next_tick = time.monotonic() + self.interval
+
+    def stop(self):
+        self._stop.set()
+
+
+# Échantillonneur système unique : collecteur, /api/system/stats et agent (sans Flask) lisent son snapshot
+system_sampler = SystemSampler()
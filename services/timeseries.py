@@ -0,0 +1,226 @@
+import math
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+AGGREGATIONS = ("min", "max", "avg", "last")
+
+
+class RingSeries:
+    """Tampon circulaire (float64) de couples (timestamp, valeur), au plus `capacity` points.
+
+    Avec `resolution`, les échantillons d'une même tranche de `resolution`
+    secondes sont fusionnés en un point (moyenne, horodatage du premier) : la
+    rétention tient quelle que soit la cadence d'écriture. Les tableaux
+    grandissent par doublement jusqu'à `capacity`. Les timestamps restent
+    croissants dans l'ordre logique, ce qui permet une recherche dichotomique
+    en O(log n) malgré la rotation.
+    """
+
+    __slots__ = ("capacity", "resolution", "_ts", "_values", "_start", "_count", "_merged")
+
+    INITIAL_SIZE = 64
+
+    def __init__(self, capacity: int, resolution: float = 0.0):
+        self.capacity = max(1, capacity)
+        self.resolution = resolution
+        size = min(self.capacity, self.INITIAL_SIZE)
+        self._ts = array("d", bytes(8 * size))
+        self._values = array("d", bytes(8 * size))
+        self._start = 0
+        self._count = 0
+        # Échantillons fusionnés dans le dernier point (moyenne courante)
+        self._merged = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def allocated(self) -> int:
+        return len(self._ts)
+
+    @property
+    def last_ts(self) -> Optional[float]:
+        return self._ts[self._phys(self._count - 1)] if self._count else None
+
+    def _phys(self, i: int) -> int:
+        return (self._start + i) % self.capacity
+
+    def _grow(self):
+        # Pas encore de rotation (_start == 0) tant que la capacité n'est pas atteinte
+        extra = min(self.capacity, 2 * len(self._ts)) - len(self._ts)
+        self._ts.extend(array("d", bytes(8 * extra)))
+        self._values.extend(array("d", bytes(8 * extra)))
+
+    def append(self, ts: float, value: float) -> bool:
+        if self._count:
+            last = self._phys(self._count - 1)
+            last_ts = self._ts[last]
+            if ts < last_ts:
+                return False  # hors ordre : ignoré pour garder l'index trié
+            if self.resolution > 0 and ts // self.resolution == last_ts // self.resolution:
+                self._merged += 1
+                self._values[last] += (value - self._values[last]) / self._merged
+                return True
+        if self._count < self.capacity:
+            if self._count == len(self._ts):
+                self._grow()
+            idx = self._phys(self._count)
+            self._count += 1
+        else:
+            idx = self._start
+            self._start = (self._start + 1) % self.capacity
+        self._ts[idx] = ts
+        self._values[idx] = value
+        self._merged = 1
+        return True
+
+    def bisect_left(self, ts: float) -> int:
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._ts[self._phys(mid)] < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def range(self, start: float, end: float):
+        i = self.bisect_left(start)
+        while i < self._count:
+            p = self._phys(i)
+            ts = self._ts[p]
+            if ts > end:
+                break
+            yield ts, self._values[p]
+            i += 1
+
+    def query(self, start: float, end: float, step: Optional[float] = None, agg: str = "avg") -> List[list]:
+        if not step or step <= 0:
+            return [[ts, v] for ts, v in self.range(start, end)]
+
+        out = []
+        bucket = None
+        acc = None
+        n = 0
+        for ts, v in self.range(start, end):
+            b = math.floor(ts / step) * step
+            if b != bucket:
+                if bucket is not None:
+                    out.append([bucket, acc / n if agg == "avg" else acc])
+                bucket, acc, n = b, v, 1
+                continue
+            n += 1
+            if agg == "min":
+                acc = min(acc, v)
+            elif agg == "max":
+                acc = max(acc, v)
+            elif agg == "last":
+                acc = v
+            else:
+                acc += v
+        if bucket is not None:
+            out.append([bucket, acc / n if agg == "avg" else acc])
+        return out
+
+
+SeriesKey = Tuple[str, str, Tuple[Tuple[str, str], ...]]
+
+
+class TimeSeriesStore:
+    """Historique récent en mémoire bornée : une RingSeries par (measurement, field, tags).
+
+    Un point par tranche de `resolution_seconds` et par série. Les séries sans
+    point depuis plus de `retention_seconds` (processus terminés, conteneurs
+    supprimés, agents arrêtés) sont retirées, pour laisser la place aux nouvelles.
+    """
+
+    # Balayage des séries inactives au plus une fois par intervalle (secondes, horloge des points)
+    SWEEP_INTERVAL = 60.0
+
+    def __init__(self, retention_seconds: float = 6 * 3600, resolution_seconds: float = 5.0,
+                 max_series: int = 5000):
+        self.retention_seconds = retention_seconds
+        self.resolution_seconds = max(resolution_seconds, 0.001)
+        self.capacity = max(1, int(retention_seconds / self.resolution_seconds))
+        self.max_series = max_series
+        self.dropped_series = 0
+        self.evicted_series = 0
+        self._series: Dict[SeriesKey, RingSeries] = {}
+        self._latest = float("-inf")
+        self._next_sweep = float("-inf")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _tags_key(tags: Optional[dict]) -> Tuple[Tuple[str, str], ...]:
+        if not tags:
+            return ()
+        return tuple(sorted((str(k), str(v)) for k, v in tags.items() if v is not None))
+
+    def _evict_idle(self):
+        cutoff = self._latest - self.retention_seconds
+        idle = [key for key, series in self._series.items() if series.last_ts is None or series.last_ts < cutoff]
+        for key in idle:
+            del self._series[key]
+        self.evicted_series += len(idle)
+        self._next_sweep = self._latest + self.SWEEP_INTERVAL
+
+    def record(self, measurement: str, fields: dict, tags: Optional[dict] = None, ts: Optional[float] = None):
+        ts = time.time() if ts is None else ts
+        tags_key = self._tags_key(tags)
+        with self._lock:
+            self._latest = max(self._latest, ts)
+            if self._latest >= self._next_sweep:
+                self._evict_idle()
+            for field, value in fields.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                key = (measurement, field, tags_key)
+                series = self._series.get(key)
+                if series is None:
+                    if len(self._series) >= self.max_series:
+                        self._evict_idle()
+                    if len(self._series) >= self.max_series:
+                        self.dropped_series += 1
+                        continue
+                    series = self._series[key] = RingSeries(self.capacity, self.resolution_seconds)
+                series.append(ts, float(value))
+
+    def query(self, measurement: str, fields: Optional[List[str]] = None, tags: Optional[dict] = None,
+              start: Optional[float] = None, end: Optional[float] = None,
+              step: Optional[float] = None, agg: str = "avg") -> List[dict]:
+        if agg not in AGGREGATIONS:
+            raise ValueError(f"agg inconnu: {agg} (attendu: {', '.join(AGGREGATIONS)})")
+        end = time.time() if end is None else end
+        start = end - self.retention_seconds if start is None else start
+        wanted_tags = set(self._tags_key(tags))
+
+        with self._lock:
+            matches = [
+                (key, series) for key, series in self._series.items()
+                if key[0] == measurement
+                and (not fields or key[1] in fields)
+                and wanted_tags.issubset(key[2])
+            ]
+            return [
+                {
+                    "measurement": key[0],
+                    "field": key[1],
+                    "tags": dict(key[2]),
+                    "points": series.query(start, end, step, agg),
+                }
+                for key, series in sorted(matches, key=lambda m: (m[0][1], m[0][2]))
+            ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            n = len(self._series)
+            allocated = sum(series.allocated for series in self._series.values())
+        return {
+            "series": n,
+            "capacity_per_series": self.capacity,
+            "memory_bytes": allocated * 16,
+            "dropped_series": self.dropped_series,
+            "evicted_series": self.evicted_series,
+        }
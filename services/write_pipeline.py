@@ -0,0 +1,272 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+SPOOL_REPLAY_BATCH = int(os.environ.get("SPOOL_REPLAY_BATCH", 5000))
+SPOOL_REPLAY_RATE = float(os.environ.get("SPOOL_REPLAY_RATE", 20000))
+SPOOL_RETRY_MAX = float(os.environ.get("SPOOL_RETRY_MAX", 60.0))
+
+
+# --- Encodage line protocol ---
+def _escape_key(value) -> str:
+    return str(value).replace("\\", "\\\\").replace(",", "\\,").replace("=", "\\=").replace(" ", "\\ ")
+
+def _escape_measurement(value) -> str:
+    return str(value).replace("\\", "\\\\").replace(",", "\\,").replace(" ", "\\ ")
+
+def _format_field(value) -> Optional[str]:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, float):
+        if value != value or value in (float("inf"), float("-inf")):
+            return None
+        return repr(value)
+    if value is None:
+        return None
+    s = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{s}"'
+
+def encode_line(measurement: str, fields: dict, tags: Optional[dict] = None, ts_ns: Optional[int] = None) -> Optional[str]:
+    parts = [_escape_measurement(measurement)]
+    if tags:
+        for k in sorted(tags):
+            v = tags[k]
+            if v is None or v == "":
+                continue
+            parts.append(f"{_escape_key(k)}={_escape_key(v)}")
+    encoded_fields = []
+    for k, v in fields.items():
+        fv = _format_field(v)
+        if fv is not None:
+            encoded_fields.append(f"{_escape_key(k)}={fv}")
+    if not encoded_fields:
+        return None
+    line = ",".join(parts) + " " + ",".join(encoded_fields)
+    if ts_ns is not None:
+        line += f" {ts_ns}"
+    return line
+
+def encode_batch(samples) -> str:
+    lines = []
+    for measurement, fields, tags, ts_ns in samples:
+        line = encode_line(measurement, fields, tags, ts_ns)
+        if line:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+# --- Writer bufferisé ---
+class BatchWriter:
+    """File bornée + thread de flush : les collecteurs n'attendent jamais InfluxDB.
+
+    Un flush est déclenché dès que `batch_size` points sont en attente ou que le
+    plus ancien point attend depuis `flush_interval` secondes.
+
+    Avec un `spool`, un batch en échec (ou tout batch si `write_api` est None,
+    InfluxDB pas encore joignable) est journalisé sur disque au lieu d'être
+    perdu. Un second thread le rejoue par gros lots, à débit limité
+    (`replay_rate` points/s), et seulement quand la file live est sous
+    `batch_size` : l'écriture en direct reste prioritaire.
+    """
+
+    def __init__(self, write_api, bucket: str, batch_size: int = 500,
+                 flush_interval: float = 1.0, max_queue: int = 10000, spool=None,
+                 replay_batch: int = SPOOL_REPLAY_BATCH, replay_rate: float = SPOOL_REPLAY_RATE):
+        self.write_api = write_api
+        self.bucket = bucket
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_queue = max(self.batch_size, max_queue)
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+        self.spool = spool
+        self.replay_batch = max(1, replay_batch)
+        self.replay_rate = replay_rate
+        self._replay_thread: Optional[threading.Thread] = None
+        self._replay_stop = threading.Event()
+        self.spooled_points = 0
+        self.replayed_points = 0
+        self.replay_points_per_s = 0.0
+
+        self.dropped_points = 0
+        self.written_points = 0
+        self.failed_batches = 0
+        self.flush_count = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def submit(self, measurement: str, fields: dict, tags: Optional[dict] = None,
+               ts_ns: Optional[int] = None) -> bool:
+        if ts_ns is None:
+            ts_ns = time.time_ns()
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self.dropped_points += 1
+                return False
+            self._queue.append((measurement, dict(fields), dict(tags) if tags else None, ts_ns))
+            # Réveille le flusher au premier point (arme le timer) et au batch plein
+            if len(self._queue) == 1 or len(self._queue) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="influx-batch-writer", daemon=True)
+        self._thread.start()
+        if self.spool is not None and self.write_api is not None:
+            self._replay_stop.clear()
+            self._replay_thread = threading.Thread(target=self._replay_run, name="influx-spool-replay", daemon=True)
+            self._replay_thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._replay_stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._replay_thread:
+            self._replay_thread.join(timeout)
+            self._replay_thread = None
+        self.flush()
+
+    def _take_batch(self):
+        batch = []
+        while self._queue and len(batch) < self.batch_size:
+            batch.append(self._queue.popleft())
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = None
+                while self._running and len(self._queue) < self.batch_size:
+                    if self._queue:
+                        if deadline is None:
+                            deadline = time.monotonic() + self.flush_interval
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        deadline = None
+                        self._cond.wait()
+                if not self._running:
+                    return
+            self.flush(max_batches=1)
+
+    def flush(self, max_batches: Optional[int] = None) -> int:
+        written = 0
+        batches = 0
+        with self._flush_lock:
+            while max_batches is None or batches < max_batches:
+                with self._cond:
+                    batch = self._take_batch()
+                if not batch:
+                    break
+                batches += 1
+                written += self._write_batch(batch)
+        return written
+
+    def _write_batch(self, batch) -> int:
+        payload = encode_batch(batch)
+        if not payload:
+            return 0
+        if self.write_api is None:
+            self._spool_payload(payload, len(batch))
+            return 0
+        start = time.perf_counter()
+        try:
+            self.write_api.write(bucket=self.bucket, record=payload)
+        except Exception as e:
+            self.failed_batches += 1
+            print(f"[METRICS-ERROR] batch de {len(batch)} points: {e}")
+            self._spool_payload(payload, len(batch))
+            return 0
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.flush_count += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+        self.written_points += len(batch)
+        return len(batch)
+
+    def _spool_payload(self, payload: str, points: int):
+        if self.spool is None:
+            return
+        try:
+            self.spooled_points += self.spool.append(payload)
+        except OSError as e:
+            print(f"[METRICS-ERROR] spool: {points} points perdus: {e}")
+
+    def _replay_run(self):
+        delay = 1.0
+        while not self._replay_stop.is_set():
+            # Priorité au live : pas de relecture tant que la file a un batch complet en attente
+            if self.queue_depth >= self.batch_size:
+                self._replay_stop.wait(self.flush_interval)
+                continue
+            lines, position = self.spool.read(self.replay_batch)
+            if not lines:
+                self.replay_points_per_s = 0.0
+                self._replay_stop.wait(self.flush_interval)
+                continue
+            start = time.perf_counter()
+            try:
+                self.write_api.write(bucket=self.bucket, record="\n".join(lines))
+            except Exception as e:
+                print(f"[spool] relecture en échec, nouvel essai dans {delay:.0f}s: {e}")
+                self._replay_stop.wait(delay)
+                delay = min(SPOOL_RETRY_MAX, delay * 2)
+                continue
+            delay = 1.0
+            self.spool.commit(position)
+            self.replayed_points += len(lines)
+            # Limitation de débit : chaque lot « coûte » len(lines) / replay_rate secondes
+            budget = len(lines) / self.replay_rate if self.replay_rate > 0 else 0.0
+            elapsed = time.perf_counter() - start
+            if budget > elapsed:
+                self._replay_stop.wait(budget - elapsed)
+            self.replay_points_per_s = len(lines) / max(time.perf_counter() - start, 1e-6)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "queue_capacity": self.max_queue,
+            "dropped_points": self.dropped_points,
+            "written_points": self.written_points,
+            "failed_batches": self.failed_batches,
+            "flush_count": self.flush_count,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self.flush_count, 3) if self.flush_count else 0.0,
+            **self.spool_stats(),
+        }
+
+    def spool_stats(self) -> dict:
+        if self.spool is None:
+            return {}
+        return {
+            **self.spool.stats(),
+            "spooled_points": self.spooled_points,
+            "replayed_points": self.replayed_points,
+            "replay_points_per_s": round(self.replay_points_per_s, 1),
+        }
@@ -6,9 +6,57 @@ const App = {
         this.setupGlobalEvents();
         this.setupSocketStatus();
         this.setupScanNetwork();       // 📡 Prépare l’écoute du bouton et le scan
+        this.subscribe('system', (state) => {
+            // Le topic agrège aussi les agents distants : seules les métriques du serveur local
+            const local = state[this.localHost()];
+            if (local) this.applyRealMetrics(local);
+        });
         this.startSimulation();
     },
 
+    localHost() {
+        return window.SKY_HOST || 'monitoring-server';
+    },
+
+    // Abonnements aux topics : trames "metrics_frame" (complète puis deltas)
+    topicState: {},
+    topicHandlers: {},
+    _frameListener: null,
+
+    subscribe(topic, handler) {
+        const socket = window.socket;
+        if (!socket) return;
+        (this.topicHandlers[topic] = this.topicHandlers[topic] || []).push(handler);
+        if (!this._frameListener) {
+            this._frameListener = (frame) => this.applyFrame(frame);
+            socket.on('metrics_frame', this._frameListener);
+            socket.on('connect', () => this.resubscribe());
+        }
+        if (socket.connected) socket.emit('subscribe', {rooms: [topic]});
+    },
+
+    unsubscribe(topic) {
+        delete this.topicHandlers[topic];
+        delete this.topicState[topic];
+        if (window.socket) window.socket.emit('unsubscribe', {rooms: [topic]});
+    },
+
+    resubscribe() {
+        const rooms = Object.keys(this.topicHandlers);
+        if (rooms.length) window.socket.emit('subscribe', {rooms});
+    },
+
+    applyFrame(frame) {
+        if (!frame || !frame.topic) return;
+        const state = frame.full ? {} : (this.topicState[frame.topic] || {});
+        Object.entries(frame.changes || {}).forEach(([key, fields]) => {
+            state[key] = Object.assign(state[key] || {}, fields);
+        });
+        (frame.removed || []).forEach(key => delete state[key]);
+        this.topicState[frame.topic] = state;
+        (this.topicHandlers[frame.topic] || []).forEach(h => h(state, frame));
+    },
+
     // Gestion des erreurs globales
     setupGlobalEvents() {
         window.addEventListener('error', (e) => {
@@ -83,6 +131,34 @@ const App = {
         btn.addEventListener('click', () => this.launchNetworkScan());
     },
 
+    // Vue des résultats : lignes ajoutées au fil des événements, virtualisées au-delà de l'écran
+    scanView: null,
+
+    getScanView(scanTable, tbody) {
+        if (this.scanView) return this.scanView;
+        // La table défile dans son conteneur : seules les lignes visibles sont dans le DOM
+        let viewport = scanTable.parentElement;
+        if (!viewport.classList.contains('scan-viewport')) {
+            viewport = document.createElement('div');
+            viewport.className = 'scan-viewport';
+            scanTable.parentNode.insertBefore(viewport, scanTable);
+            viewport.appendChild(scanTable);
+        }
+        this.scanView = new VirtualTable(viewport, tbody, (host) => this.renderScanRow(host), {columns: 2});
+        return this.scanView;
+    },
+
+    renderScanRow(host) {
+        const ip = Render.escape(host.ip);
+        if (host.error) return `<tr><td>${ip}</td><td class="scan-error">${Render.escape(host.error)}</td></tr>`;
+        const labels = {22:'SSH', 80:'HTTP', 443:'HTTPS'};
+        const badges = (host.ports || [])
+            .filter(p => p.state === 'open' || p.open)
+            .map(p => `<span class="badge-port">${labels[p.port] || `Port ${Render.escape(p.port)}`}</span>`)
+            .join(' ');
+        return `<tr><td>${ip}</td><td>${badges || '—'}</td></tr>`;
+    },
+
     // Lance un fetch & wires Socket.IO pour scan_progress & network_scan_complete
     launchNetworkScan() {
         const scanStatus  = document.getElementById('scan-status');
@@ -92,11 +168,12 @@ const App = {
         const fill        = document.getElementById('scan-progress-fill');
 
         if (!scanStatus || !scanTable || !tbody || !bar || !fill) return;
+        const view = this.getScanView(scanTable, tbody);
 
         // Reset UI
         scanStatus.textContent = '🔍 Scan en cours...';
         scanTable.style.display = 'none';
-        tbody.innerHTML = '';
+        view.clear();
         bar.style.display = 'block';
         fill.style.width = '0%';
 
@@ -111,29 +188,48 @@ const App = {
         })
         .then(res => {
             if (!res.ok) throw new Error('Echec du lancement du scan');
-            let scanned = 0;
-            const total = 256;  // /24
+            return res.json();
+        })
+        .then(job => {
+            // Les événements du scan ne sont diffusés qu'aux abonnés de scan/<job_id>
+            if (job.room) window.socket.emit('subscribe', {rooms: [job.room]});
             window.socket.off('scan_progress');
+            window.socket.off('scan_change');
             window.socket.off('network_scan_complete');
 
+            const addHost = (host) => {
+                if (!host) return;
+                view.append(host);
+                scanTable.style.display = 'table';
+            };
+
+            // Chaque hôte arrive dès qu'il est scanné ; le statut n'est redessiné qu'une fois par frame
             window.socket.on('scan_progress', data => {
-                scanned++;
-                scanStatus.textContent = `📡 Scan de ${data.ip}...`;
-                const pct = Math.min(100, Math.round((scanned/total)*100));
-                fill.style.width = `${pct}%`;
+                if (job.job_id && data.job_id !== job.job_id) return;
+                addHost(data.host);
+                Render.schedule('scan-status', () => {
+                    scanStatus.textContent = `📡 ${data.ip} (${data.scanned}/${data.total})`;
+                    fill.style.width = `${Math.min(100, data.progress)}%`;
+                });
+            });
+
+            // Mode diff : seuls les hôtes modifiés sont diffusés
+            window.socket.on('scan_change', data => {
+                if (job.job_id && data.job_id !== job.job_id) return;
+                addHost(data.host);
             });
 
             window.socket.on('network_scan_complete', data => {
-                scanStatus.textContent = `✅ Scan terminé en ${data.duration}s`;
-                bar.style.display = 'none';
-                scanTable.style.display = 'table';
-                tbody.innerHTML = '';
-                data.results.forEach(host => {
-                    const badges = host.open_ports.map(p => {
-                        const label = {22:'SSH',80:'HTTP',443:'HTTPS'}[p]||`Port ${p}`;
-                        return `<span class="badge-port">${label}</span>`;
-                    }).join(' ');
-                    tbody.innerHTML += `<tr><td>${host.ip}</td><td>${badges}</td></tr>`;
+                if (job.job_id && data.job_id !== job.job_id) return;
+                Render.schedule('scan-status', () => {
+                    bar.style.display = 'none';
+                    if (!data.success) {
+                        scanStatus.textContent = `❌ Échec du scan réseau : ${data.error || ''}`;
+                        return;
+                    }
+                    const s = data.summary || {};
+                    scanStatus.textContent = `✅ Scan terminé en ${Number(s.elapsed_seconds || 0).toFixed(1)}s`
+                        + ` — ${s.hosts_scanned ?? view.rows.length} hôtes, ${s.open_ports ?? 0} ports ouverts`;
                 });
             });
         })
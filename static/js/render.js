@@ -0,0 +1,133 @@
+// render.js — rendu incrémental : mises à jour groupées par frame, tables virtualisées, buffers bornés
+
+const Render = {
+    // Regroupe les mises à jour DOM : une seule exécution par clé et par frame d'animation
+    _pending: new Map(),
+    _frame: null,
+
+    schedule(key, fn) {
+        this._pending.set(key, fn);
+        if (this._frame) return;
+        this._frame = requestAnimationFrame(() => {
+            const jobs = Array.from(this._pending.values());
+            this._pending.clear();
+            this._frame = null;
+            jobs.forEach(job => {
+                try { job(); } catch (e) { console.error('Rendu:', e); }
+            });
+        });
+    },
+
+    escape(value) {
+        return String(value ?? '').replace(/[&<>"']/g, c => ({
+            '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+        })[c]);
+    },
+
+    // Indices à afficher : min et max de chaque tranche (préserve les pics, contrairement à une moyenne)
+    decimate(values, maxPoints) {
+        const n = values.length;
+        if (n <= maxPoints) return values.map((_, i) => i);
+        const buckets = Math.max(1, Math.floor(maxPoints / 2));
+        const size = n / buckets;
+        const indices = [];
+        for (let b = 0; b < buckets; b++) {
+            const start = Math.floor(b * size);
+            const end = Math.min(n, Math.floor((b + 1) * size));
+            let lo = start, hi = start;
+            for (let i = start + 1; i < end; i++) {
+                if (values[i] < values[lo]) lo = i;
+                if (values[i] > values[hi]) hi = i;
+            }
+            if (lo === hi) indices.push(lo);
+            else indices.push(Math.min(lo, hi), Math.max(lo, hi));
+        }
+        // Le dernier point reste toujours visible
+        if (indices[indices.length - 1] !== n - 1) indices.push(n - 1);
+        return indices;
+    }
+};
+
+// Buffer circulaire de taille fixe : la mémoire ne grandit pas avec la durée d'affichage
+class RingBuffer {
+    constructor(capacity) {
+        this.capacity = capacity;
+        this.items = new Array(capacity);
+        this.start = 0;
+        this.length = 0;
+    }
+
+    push(item) {
+        const end = (this.start + this.length) % this.capacity;
+        this.items[end] = item;
+        if (this.length < this.capacity) this.length++;
+        else this.start = (this.start + 1) % this.capacity;
+    }
+
+    toArray() {
+        const out = new Array(this.length);
+        for (let i = 0; i < this.length; i++) out[i] = this.items[(this.start + i) % this.capacity];
+        return out;
+    }
+
+    clear() {
+        this.start = 0;
+        this.length = 0;
+    }
+}
+
+// Table virtualisée : seules les lignes visibles (plus une marge) existent dans le DOM.
+// Les lignes ont une hauteur fixe ; deux lignes d'espacement simulent la hauteur totale.
+class VirtualTable {
+    constructor(viewport, tbody, renderRow, { rowHeight = 32, overscan = 10, columns = 1 } = {}) {
+        this.viewport = viewport;
+        this.tbody = tbody;
+        this.renderRow = renderRow;
+        this.rowHeight = rowHeight;
+        this.overscan = overscan;
+        this.columns = columns;
+        this.rows = [];
+        this._key = `vt-${Math.random().toString(36).slice(2)}`;
+        this._window = null;
+        viewport.addEventListener('scroll', () => this.refresh(), { passive: true });
+    }
+
+    append(row) {
+        this.rows.push(row);
+        this.refresh();
+    }
+
+    clear() {
+        this.rows = [];
+        this._window = null;
+        this.viewport.scrollTop = 0;
+        this.tbody.innerHTML = '';
+    }
+
+    refresh() {
+        Render.schedule(this._key, () => this.render());
+    }
+
+    render() {
+        const total = this.rows.length;
+        const height = this.viewport.clientHeight || this.rowHeight * 20;
+        const first = Math.max(0, Math.floor(this.viewport.scrollTop / this.rowHeight) - this.overscan);
+        const last = Math.min(total, Math.ceil((this.viewport.scrollTop + height) / this.rowHeight) + this.overscan);
+        // Fenêtre pleine et inchangée : les lignes ajoutées hors écran ne touchent que l'espacement du bas
+        const key = `${first}:${last}`;
+        const spacer = (px) => `<tr class="vt-spacer" style="height:${px}px"><td colspan="${this.columns}"></td></tr>`;
+        if (this._window === key && this.tbody.lastElementChild) {
+            this.tbody.lastElementChild.style.height = `${(total - last) * this.rowHeight}px`;
+            return;
+        }
+        this._window = key;
+        const html = [spacer(first * this.rowHeight)];
+        for (let i = first; i < last; i++) html.push(this.renderRow(this.rows[i], i));
+        html.push(spacer((total - last) * this.rowHeight));
+        this.tbody.innerHTML = html.join('');
+    }
+}
+
+window.Render = Render;
+window.RingBuffer = RingBuffer;
+window.VirtualTable = VirtualTable;
@@ -10,6 +10,7 @@ class Router {
             '/metriques': 'metriques',
             '/parametres': 'parametres'
         };
+        this.fragments = new Map();
         this.init();
     }
 
@@ -33,28 +34,37 @@ class Router {
     }
 
     async loadRoute(path) {
+        // Fragment déjà chargé : affiché tout de suite, puis revalidé (304 si la page n'a pas changé)
+        const cached = this.fragments.get(path);
         try {
             this.updateActiveNav(path);
-            this.showLoading();
-            // ...chargement du template, inchangé...
-            const response = await fetch(path);
+            if (cached) this.renderFragment(path, cached);
+            else this.showLoading();
+            const response = await fetch(path, {credentials: 'same-origin'});
             const html = await response.text();
             const parser = new DOMParser();
             const doc = parser.parseFromString(html, 'text/html');
             const mainContent = doc.querySelector('.page-content') || doc.querySelector('main');
-            if (mainContent) {
-                document.getElementById('main-content').innerHTML = mainContent.innerHTML;
-                this.initPageComponents(path);
+            // Navigation plus récente entre-temps : ne pas écraser la page affichée
+            if (window.location.pathname !== path) return;
+            if (mainContent && mainContent.innerHTML !== cached) {
+                this.fragments.set(path, mainContent.innerHTML);
+                this.renderFragment(path, mainContent.innerHTML);
             }
             const loader = document.getElementById('monitoring-loader');
             if (loader) loader.style.display = 'none';
         } catch (error) {
-            this.showError('Erreur lors du chargement de la page');
+            if (!cached) this.showError('Erreur lors du chargement de la page');
             const loader = document.getElementById('monitoring-loader');
             if (loader) loader.style.display = 'none';
         }
     }
 
+    renderFragment(path, html) {
+        document.getElementById('main-content').innerHTML = html;
+        this.initPageComponents(path);
+    }
+
     updateActiveNav(path) {
         document.querySelectorAll('.nav-link').forEach(link => {
             link.classList.remove('active');
@@ -0,0 +1,124 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from services.alerts import AlertEngine, format_alert
+from services.aletre_telegram import TelegramNotifier, build_digest
+
+
+@pytest.fixture
+def telegram_stub():
+    """Faux serveur Telegram local : enregistre les messages, peut répondre 429 / 500."""
+    received = []
+    script = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            status, payload = script.pop(0) if script else (200, {"ok": True})
+            if status == 200:
+                received.append((time.monotonic(), self.path, body))
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield {"url": f"http://127.0.0.1:{server.server_port}", "received": received, "script": script}
+    server.shutdown()
+    server.server_close()
+
+
+def test_threshold_for_duration_and_hysteresis():
+    engine = AlertEngine([{"name": "cpu", "measurement": "system_metrics", "field": "cpu_percent",
+                           "op": ">", "threshold": 90, "clear": 80, "for": 10}])
+    observe = lambda v, t: engine.observe("system_metrics", {"cpu_percent": v}, {"host": "a"}, ts=t)
+
+    assert observe(95, 0) == []
+    assert observe(50, 5) == []          # retombe avant 10 s : pas d'alerte
+    assert observe(95, 6) == []
+    events = observe(96, 16)
+    assert [e["status"] for e in events] == ["firing"]
+    assert events[0]["tags"] == {"host": "a"}
+    # Déduplication : pas de renotification tant que l'alerte est active
+    assert observe(99, 20) == []
+    # Hystérésis : 85 est sous le seuil mais au-dessus de `clear`
+    assert observe(85, 21) == []
+    assert [e["status"] for e in observe(79, 22)] == ["resolved"]
+    assert engine.active() == []
+
+
+def test_rate_rule_and_series_are_independent():
+    engine = AlertEngine([{"name": "net_burst", "measurement": "system_metrics", "field": "net_bytes_sent",
+                           "type": "rate", "op": ">", "threshold": 1000, "window": 10}])
+    assert engine.observe("system_metrics", {"net_bytes_sent": 0}, {"host": "a"}, ts=0) == []
+    assert engine.observe("system_metrics", {"net_bytes_sent": 0}, {"host": "b"}, ts=0) == []
+    assert engine.observe("system_metrics", {"net_bytes_sent": 5000}, {"host": "b"}, ts=5) == []
+    events = engine.observe("system_metrics", {"net_bytes_sent": 20000}, {"host": "a"}, ts=5)
+    assert events[0]["value"] == 4000
+    assert "/s" in format_alert(events[0])
+    assert [a["tags"]["host"] for a in engine.active()] == ["a"]
+
+
+def test_wildcard_rule_with_tag_filter_and_on_event():
+    seen = []
+    engine = AlertEngine([{"name": "ctr_mem", "measurement": "*", "field": "memory",
+                           "threshold": 80, "tags": {"role": "db"}}], on_event=seen.append)
+    engine.observe("web", {"memory": 99}, {"role": "web"})
+    engine.observe("db1", {"memory": 99}, {"role": "db"})
+    assert [(e["measurement"], e["status"]) for e in seen] == [("db1", "firing")]
+
+
+def test_build_digest_splits_long_bursts():
+    chunks = build_digest([f"alerte {i} " + "x" * 200 for i in range(60)])
+    assert len(chunks) > 1
+    assert all(len(c) <= 4096 for c in chunks)
+    assert build_digest(["seule"]) == ["seule"]
+
+
+def test_notifier_batches_bursts_and_never_blocks(telegram_stub):
+    notifier = TelegramNotifier("T0K", "42", api_url=telegram_stub["url"], batch_window=0.2, rate_per_minute=600)
+    start = time.perf_counter()
+    for i in range(20):
+        assert notifier.submit(f"alerte {i}")
+    assert time.perf_counter() - start < 0.1
+    notifier.submit("autre canal", chat_id="7")
+    notifier.stop()
+
+    received = telegram_stub["received"]
+    assert len(received) == 2
+    by_chat = {body["chat_id"]: body["text"] for _, _, body in received}
+    assert by_chat["42"].startswith("📋 20 alertes")
+    assert by_chat["7"] == "autre canal"
+    assert received[0][1] == "/botT0K/sendMessage"
+    assert notifier.stats()["sent_alerts"] == 21
+
+
+def test_notifier_retries_and_rate_limits(telegram_stub):
+    telegram_stub["script"].extend([(500, {"ok": False}), (429, {"ok": False, "parameters": {"retry_after": 0.1}})])
+    notifier = TelegramNotifier("T0K", "42", api_url=telegram_stub["url"], batch_window=0.0, rate_per_minute=120)
+    notifier.submit("premier")
+    deadline = time.time() + 5
+    while not telegram_stub["received"] and time.time() < deadline:
+        time.sleep(0.01)
+    notifier.submit("second")
+    notifier.submit("troisième")
+    while len(telegram_stub["received"]) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    notifier.stop()
+
+    received = telegram_stub["received"]
+    assert [b["text"] for _, _, b in received][0] == "premier"
+    # Les deux suivants attendent l'intervalle du canal (0,5 s) et partent en un digest
+    assert received[1][2]["text"].startswith("📋 2 alertes")
+    assert received[1][0] - received[0][0] >= 0.45
+    assert notifier.stats()["retries"] == 2
@@ -0,0 +1,73 @@
+import gzip
+import re
+
+import pytest
+from flask import Flask, render_template_string
+
+from services.assets import IMMUTABLE_CACHE, REVALIDATE_CACHE, AssetManifest, init_assets
+
+
+@pytest.fixture
+def static_app(tmp_path):
+    (tmp_path / "js").mkdir()
+    (tmp_path / "js" / "app.js").write_text("console.log('sky');\n" * 100)
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG\r\n\x1a\n" + bytes(2048))
+    app = Flask(__name__, static_folder=None)
+    init_assets(app, str(tmp_path))
+
+    @app.route("/page")
+    def page():
+        return render_template_string('<script src="{{ asset_url(\'js/app.js\') }}"></script>')
+
+    return app, tmp_path
+
+
+def test_fingerprinted_url_is_immutable_and_precompressed(static_app):
+    app, _ = static_app
+    with app.test_client() as client:
+        url = re.search(r'src="([^"]+)"', client.get("/page").get_data(as_text=True)).group(1)
+        assert re.fullmatch(r"/static/js/app\.[0-9a-f]{12}\.js", url)
+
+        resp = client.get(url, headers={"Accept-Encoding": "gzip, deflate"})
+        assert resp.headers["Cache-Control"] == IMMUTABLE_CACHE
+        assert resp.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in resp.headers["Vary"]
+        assert gzip.decompress(resp.data).startswith(b"console.log")
+
+        again = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": resp.headers["ETag"]})
+        assert again.status_code == 304 and again.data == b""
+
+        plain = client.get(url)
+        assert "Content-Encoding" not in plain.headers and plain.data.startswith(b"console.log")
+
+
+def test_plain_and_stale_urls_revalidate(static_app):
+    app, _ = static_app
+    with app.test_client() as client:
+        assert client.get("/static/js/app.js").headers["Cache-Control"] == REVALIDATE_CACHE
+        stale = client.get("/static/js/app.000000000000.js")
+        assert stale.status_code == 200 and stale.headers["Cache-Control"] == REVALIDATE_CACHE
+        logo = client.get("/static/logo.png")
+        assert logo.mimetype == "image/png" and "Content-Encoding" not in logo.headers
+        assert client.get("/static/../secret.txt").status_code == 404
+
+
+def test_modified_file_gets_new_fingerprint(tmp_path):
+    (tmp_path / "style.css").write_text("body { color: red; }")
+    manifest = AssetManifest(str(tmp_path)).scan()
+    before = manifest.url("style.css")
+    (tmp_path / "style.css").write_text("body { color: blue; }")
+    after = manifest.url("style.css")
+    assert before != after
+    assert manifest.resolve(after.split("/static/")[1]) == (manifest.get("style.css"), True)
+    assert manifest.url("missing.css") == "/static/missing.css"
+
+
+def test_html_pages_are_revalidated():
+    import app as myapp
+
+    with myapp.app.test_client() as client:
+        resp = client.get("/login")
+        assert resp.headers["Cache-Control"] == "private, no-cache"
+        assert re.search(r'src="/static/logo_login/logo-240\.[0-9a-f]{12}\.png"', resp.get_data(as_text=True))
+        assert client.get("/login", headers={"If-None-Match": resp.headers["ETag"]}).status_code == 304
@@ -0,0 +1,115 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from services.backends import INFLUXDB_TIMEOUT, BackendDisabled, BackendManager, check_influxdb, connect_influxdb
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_backend_connects_in_background_and_fires_on_ready():
+    gate = threading.Event()
+    client = object()
+
+    def connect():
+        gate.wait(2)
+        return client
+
+    manager = BackendManager(health_interval=60)
+    manager.register("influxdb", connect)
+    ready = []
+    manager.on_ready("influxdb", ready.append)
+    manager.start()
+    try:
+        # start() ne bloque pas sur la connexion
+        assert manager.health()["status"] == "starting"
+        gate.set()
+        assert wait_for(lambda: ready == [client])
+        assert manager.get("influxdb") is client
+        assert manager.health()["status"] == "ok"
+        # Abonnement tardif : appelé immédiatement
+        late = []
+        manager.on_ready("influxdb", late.append)
+        assert late == [client]
+    finally:
+        manager.stop()
+
+
+def test_backend_retries_until_available():
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise ConnectionError("refused")
+        return "client"
+
+    manager = BackendManager(retry_max=0.05, health_interval=60)
+    manager.register("docker", connect)
+    assert not manager.connect_now("docker")
+    health = manager.health()
+    assert health["status"] == "degraded"
+    assert health["backends"]["docker"]["error"] == "refused"
+    assert manager.connect_now("docker")
+    assert manager.health()["backends"]["docker"]["status"] == "up"
+
+
+def test_disabled_backend_is_not_retried():
+    def connect():
+        raise BackendDisabled("non configuré")
+
+    manager = BackendManager()
+    manager.register("influxdb", connect)
+    manager.connect_now("influxdb")
+    health = manager.health()
+    assert health["status"] == "ok"
+    assert health["backends"]["influxdb"]["status"] == "disabled"
+
+
+def test_import_without_influx_env_and_cold_start():
+    """Import sans variables InfluxDB ni réseau, puis première requête servie."""
+    env = {k: v for k, v in os.environ.items() if not k.startswith("INFLUXDB_")}
+    code = (
+        "import json, app\n"
+        "app.create_app(start_collectors=False)\n"
+        "resp = app.app.test_client().get('/api/health')\n"
+        "print(json.dumps(resp.get_json()))\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run([sys.executable, "-c", code], cwd=root, env=env, capture_output=True, text=True, timeout=30)
+    assert proc.returncode == 0, proc.stderr
+    health = json.loads(proc.stdout.strip().splitlines()[-1])
+    assert health["backends"]["influxdb"]["status"] == "disabled"
+    assert health["startup"]["cold_start_ms"] is not None
+    # Borne large (machines de CI) ; l'objectif de 300 ms est suivi par le benchmark
+    assert health["startup"]["cold_start_ms"] < 5000
+
+
+def test_influx_client_timeout_is_separate_from_the_connect_check():
+    # Serveur qui accepte mais ne répond jamais
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    try:
+        influx = connect_influxdb(f"http://127.0.0.1:{server.getsockname()[1]}", "t", "o", "b")
+        assert influx.client.api_client.configuration.timeout == INFLUXDB_TIMEOUT * 1000
+        start = time.time()
+        with pytest.raises(ConnectionError):
+            check_influxdb(influx, timeout=0.3)
+        assert time.time() - start < 2
+        influx.client.close()
+    finally:
+        server.close()
@@ -0,0 +1,34 @@
+import io
+import json
+
+from benchmarks import run
+from benchmarks.scenarios import make_nmap_xml
+from net_discovery_nmap import parse_nmap_xml
+
+
+def test_compare_is_direction_aware():
+    baseline = {"nmap_xml": {"hosts_per_s": 1000.0, "parse_ms": 10.0, "hosts": 200}}
+    current = {"nmap_xml": {"hosts_per_s": 700.0, "parse_ms": 11.0, "hosts": 10}}
+    regressions = run.compare(current, baseline, tolerance=0.2)
+    # Débit -30 % : régression ; durée +10 % : tolérée ; mesure informative ignorée
+    assert [(r[0], r[1]) for r in regressions] == [("nmap_xml", "hosts_per_s")]
+    assert run.compare({"nmap_xml": {"parse_ms": 5.0}}, baseline, 0.2) == []
+
+
+def test_generated_nmap_xml_round_trips():
+    hosts = list(parse_nmap_xml(io.BytesIO(make_nmap_xml(hosts=3, ports=4))))
+    assert [h["ip"] for h in hosts] == ["10.0.0.0", "10.0.0.1", "10.0.0.2"]
+
+
+def test_driver_writes_json_and_flags_regression(tmp_path):
+    out = tmp_path / "bench.json"
+    assert run.main(["--quick", "--only", "nmap_xml,scan_subprocess", "--out", str(out)]) == 0
+    report = json.loads(out.read_text())
+    assert set(report["results"]) == {"nmap_xml", "scan_subprocess"}
+    assert report["meta"]["quick"] is True
+
+    inflated = {"results": {"nmap_xml": {"hosts_per_s": report["results"]["nmap_xml"]["hosts_per_s"] * 100}}}
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(inflated))
+    assert run.main(["--quick", "--only", "nmap_xml", "--out", str(tmp_path / "again.json"),
+                     "--compare", str(baseline)]) == 1
@@ -0,0 +1,128 @@
+from unittest.mock import MagicMock
+
+from services.broadcast import FRAME_EVENT, Broadcaster, is_valid_room
+
+
+def make_broadcaster(epsilon=0.5):
+    sio = MagicMock()
+    b = Broadcaster(sio, epsilon=epsilon)
+    b.add_subscriber("system", "sid-1")
+    return b, sio
+
+
+def test_room_validation():
+    assert is_valid_room("system")
+    assert is_valid_room("docker/node-1")
+    assert is_valid_room("scan/abc123")
+    assert not is_valid_room("docker/")
+    assert not is_valid_room("admin")
+
+
+def test_tick_is_coalesced_into_one_delta_frame():
+    b, sio = make_broadcaster()
+    b.publish("system", "h1", {"cpu": 10.0, "mem": 50.0})
+    b.publish("system", "h2", {"cpu": 1.0})
+    first = b.flush("system")
+    assert first["changes"] == {"h1": {"cpu": 10.0, "mem": 50.0}, "h2": {"cpu": 1.0}}
+    sio.emit.assert_called_once_with(FRAME_EVENT, first, to="system")
+
+    # Variation sous epsilon ignorée, au-dessus envoyée seule
+    b.publish("system", "h1", {"cpu": 10.2, "mem": 52.0})
+    b.publish("system", "h2", {"cpu": 1.0})
+    second = b.flush("system")
+    assert second["changes"] == {"h1": {"mem": 52.0}}
+    assert second["seq"] == first["seq"] + 1
+
+    # Rien n'a bougé : aucune trame
+    b.publish("system", "h1", {"cpu": 10.3, "mem": 52.0})
+    b.publish("system", "h2", {"cpu": 1.0})
+    assert b.flush("system") is None
+    assert sio.emit.call_count == 2
+
+
+def test_missing_keys_are_removed():
+    b, _ = make_broadcaster()
+    b.publish("system", "h1", {"cpu": 1.0})
+    b.publish("system", "h2", {"cpu": 1.0})
+    b.flush("system")
+    b.publish("system", "h1", {"cpu": 1.0})
+    frame = b.flush("system")
+    assert frame["removed"] == ["h2"]
+    assert frame["changes"] == {}
+
+
+def test_no_subscribers_no_emit_but_state_tracked():
+    sio = MagicMock()
+    b = Broadcaster(sio)
+    b.publish("docker/h", "web", {"cpu": 5.0})
+    assert b.flush("docker/h") is None
+    sio.emit.assert_not_called()
+
+    b.add_subscriber("docker/h", "sid-9")
+    b.send_snapshot("docker/h", "sid-9")
+    event, frame = sio.emit.call_args[0]
+    assert event == FRAME_EVENT
+    assert frame["full"] is True
+    assert frame["changes"] == {"web": {"cpu": 5.0}}
+    assert sio.emit.call_args[1] == {"to": "sid-9"}
+
+
+def test_remove_subscriber():
+    b, _ = make_broadcaster()
+    b.add_subscriber("docker/h", "sid-1")
+    assert b.subscriber_count("system") == 1
+    b.remove_subscriber("sid-1", "system")
+    assert b.subscriber_count("system") == 0
+    assert b.subscriber_count("docker/h") == 1
+    b.remove_subscriber("sid-1")
+    assert b.subscriber_count("docker/h") == 0
+
+
+def test_socket_subscribe_sends_snapshot():
+    import app as myapp
+
+    myapp.broadcaster.publish("system", "srv", {"cpu_percent": 12.0})
+    myapp.broadcaster.flush("system")
+
+    client = myapp.socketio.test_client(myapp.app)
+    ack = client.emit("subscribe", {"rooms": ["system", "nope"]}, callback=True)
+    assert ack["rooms"] == ["system"]
+    frames = [r["args"][0] for r in client.get_received() if r["name"] == FRAME_EVENT]
+    assert frames[-1]["full"] is True
+    assert frames[-1]["changes"]["srv"]["cpu_percent"] == 12.0
+    client.disconnect()
+    assert myapp.broadcaster.subscriber_count("system") == 0
+
+
+def test_shared_queue_emits_without_local_subscribers_and_sends_keyframes():
+    sio = MagicMock()
+    collector = Broadcaster(sio, shared=True, keyframe_interval=3600)
+    collector.publish("docker/h", "web", {"cpu": 5.0})
+    collector.publish("docker/h", "db", {"cpu": 1.0})
+    first = collector.flush("docker/h")
+    # Aucun abonné local : la trame part quand même vers la room (relayée aux autres workers)
+    assert first["full"] is True and first["changes"] == {"web": {"cpu": 5.0}, "db": {"cpu": 1.0}}
+    assert sio.emit.call_args_list[0].kwargs["to"] == "docker/h"
+
+    collector.publish("docker/h", "web", {"cpu": 9.0})
+    collector.publish("docker/h", "db", {"cpu": 1.0})
+    assert collector.flush("docker/h")["changes"] == {"web": {"cpu": 9.0}}
+
+    # Intervalle écoulé : état complet réémis même sans changement
+    collector.keyframe_interval = 0
+    collector.publish("docker/h", "web", {"cpu": 9.0})
+    collector.publish("docker/h", "db", {"cpu": 1.0})
+    keyframe = collector.flush("docker/h")
+    assert keyframe["full"] is True
+    assert keyframe["changes"] == {"web": {"cpu": 9.0}, "db": {"cpu": 1.0}}
+
+    # Topic multi-sources : trame d'état fusionnée, pas remplaçante
+    collector.publish("system", "h1", {"cpu": 1.0})
+    assert collector.flush("system", complete=False)["full"] is False
+
+
+def test_shared_worker_without_state_skips_empty_snapshot():
+    sio = MagicMock()
+    other = Broadcaster(sio, shared=True)
+    other.send_snapshot("system", "sid-9")
+    sio.emit.assert_not_called()
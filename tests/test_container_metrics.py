@@ -0,0 +1,88 @@
+from unittest.mock import patch
+
+import pytest
+
+from services.container_metrics import ContainerMetrics, _parse_read, container_tags
+from services.metrics import publish_docker_samples
+
+
+def payload(read, total_usage, system_usage, rx, tx, blk_read, blk_write, v1=False):
+    mem_detail = {"total_inactive_file": 100 * 2**20} if v1 else {"inactive_file": 100 * 2**20}
+    op_read, op_write = ("Read", "Write") if v1 else ("read", "write")
+    return {
+        "read": read,
+        "cpu_stats": {"cpu_usage": {"total_usage": total_usage}, "system_cpu_usage": system_usage, "online_cpus": 4},
+        "precpu_stats": {"cpu_usage": {"total_usage": total_usage - 2_000_000}, "system_cpu_usage": system_usage - 8_000_000},
+        "memory_stats": {"usage": 612 * 2**20, "limit": 1024 * 2**20, "stats": mem_detail},
+        "networks": {"eth0": {"rx_bytes": rx, "tx_bytes": tx}, "eth1": {"rx_bytes": 0, "tx_bytes": 0}},
+        "blkio_stats": {"io_service_bytes_recursive": [
+            {"major": 8, "minor": 0, "op": op_read, "value": blk_read},
+            {"major": 8, "minor": 0, "op": op_write, "value": blk_write},
+        ]},
+        "pids_stats": {"current": 12},
+    }
+
+
+class AttrContainer:
+    """Objet SDK dont les attrs sont déjà chargés ; stats() ne doit pas être rappelé."""
+
+    def __init__(self, name, image, project=None):
+        self.name = name
+        labels = {"com.docker.compose.project": project} if project else {}
+        self.attrs = {"Config": {"Image": image, "Labels": labels}}
+
+    def stats(self, **kwargs):
+        raise AssertionError("appel API Docker inattendu")
+
+
+def test_parse_docker_read_timestamp():
+    assert _parse_read("2024-01-01T00:00:01.500000000Z") == pytest.approx(1704067201.5)
+    assert _parse_read("2024-01-01T00:00:01Z") == 1704067201.0
+    assert _parse_read("0001-01-01T00:00:00Z") is None
+
+
+@pytest.mark.parametrize("v1", [False, True])
+def test_fields_from_one_payload_with_cached_deltas(v1):
+    model = ContainerMetrics()
+    first = model.compute("web", payload("2024-01-01T00:00:00Z", 10**9, 10**12, 1000, 500, 0, 0, v1))
+    # CPU : 2 ms de conteneur sur 8 ms cumulés des 4 CPU -> 25 % de l'hôte, soit 1 cœur
+    assert first["cpu_percent"] == pytest.approx(25.0)
+    assert first["cpu_cores"] == pytest.approx(1.0)
+    assert first["online_cpus"] == 4
+    # Mémoire hors cache de pages
+    assert first["memory_used_bytes"] == 512 * 2**20
+    assert first["memory_percent"] == pytest.approx(50.0)
+    assert first["pids"] == 12
+    assert "net_rx_bytes_per_s" not in first
+
+    second = model.compute("web", payload("2024-01-01T00:00:02Z", 10**9, 10**12, 3000, 1500, 4096, 8192, v1))
+    assert second["net_rx_bytes_per_s"] == 1000.0
+    assert second["net_tx_bytes_per_s"] == 500.0
+    assert second["blk_read_bytes_per_s"] == 2048.0
+    assert second["blk_write_bytes_per_s"] == 4096.0
+
+    # Même échantillon relu : pas de débit ; compteur remis à zéro : 0, jamais négatif
+    again = model.compute("web", payload("2024-01-01T00:00:02Z", 10**9, 10**12, 3000, 1500, 4096, 8192, v1))
+    assert "net_rx_bytes_per_s" not in again
+    reset = model.compute("web", payload("2024-01-01T00:00:03Z", 10**9, 10**12, 10, 10, 0, 0, v1))
+    assert reset["net_rx_bytes_per_s"] == 0.0
+
+    model.retain([])
+    assert "net_rx_bytes_per_s" not in model.compute("web", payload("2024-01-01T00:00:04Z", 10**9, 10**12, 0, 0, 0, 0, v1))
+
+
+def test_single_measurement_tagged_without_api_calls():
+    containers = [AttrContainer("shop_web_1", "nginx:1.25", project="shop"), AttrContainer("redis", "redis:7")]
+    samples = [(c.name, payload("2024-01-01T00:00:00Z", 10**9, 10**12, 0, 0, 0, 0)) for c in containers]
+    with patch("services.metrics.write_metrics") as write, patch("services.metrics.broadcaster") as bc:
+        publish_docker_samples(samples, containers, host="node-1")
+
+    measurements = {c.args[0] for c in write.call_args_list}
+    assert measurements == {"docker_container"}
+    tags = [c.args[2] for c in write.call_args_list]
+    assert tags == [
+        {"name": "shop_web_1", "image": "nginx:1.25", "compose_project": "shop", "host": "node-1"},
+        {"name": "redis", "image": "redis:7", "host": "node-1"},
+    ]
+    bc.flush.assert_called_once_with("docker/node-1")
+    assert container_tags(containers[1]) == {"name": "redis", "image": "redis:7"}
@@ -2,6 +2,7 @@ import pytest
 from unittest.mock import patch, MagicMock
 from datetime import datetime
 from services.network_scan import background_discover_and_emit  # remplace par ton module réel
+from services.scan_state import ScanStateStore
 
 @pytest.fixture
 def mock_scan_result():
@@ -18,38 +19,55 @@ def mock_scan_result():
         ]
     }
 
+@patch("services.network_scan.scan_state", ScanStateStore(":memory:"))
 @patch("services.network_scan.socketio")
 @patch("services.network_scan.write_metrics")
-@patch("services.network_scan.discover_and_scan")
-def test_background_emit_success(mock_scan, mock_write, mock_socketio, mock_scan_result):
-    mock_scan.return_value = mock_scan_result
+@patch("services.network_scan.iter_scan_hosts")
+@patch("services.network_scan.discover_hosts_nmap")
+def test_background_emit_success(mock_discover, mock_iter, mock_write, mock_socketio, mock_scan_result):
+    mock_discover.return_value = ["10.0.0.1", "10.0.0.2"]
+    mock_iter.return_value = iter(mock_scan_result["results"])
 
     background_discover_and_emit(
         network="10.0.0.0/24",
         ports=[22, 80, 443],
         parallel_hosts=2,
-        scan_args="-sT -sV"
+        scan_args="-sT -sV",
+        job_id="job1"
     )
 
-    # Vérifie que scan_progress est émis pour chaque hôte
+    # Vérifie que scan_progress est émis pour chaque hôte, avec son résultat
     progress_calls = [call for call in mock_socketio.emit.call_args_list if call[0][0] == "scan_progress"]
     assert len(progress_calls) == 2
     for call in progress_calls:
         assert "ip" in call[0][1]
         assert "progress" in call[0][1]
+        assert call[1] == {"to": "scan/job1"}
+    assert progress_calls[-1][0][1]["progress"] == 100
 
-    # Vérifie que network_scan_complete est émis une fois
+    # Vérifie que les badges sont bien ajoutés aux hôtes diffusés
+    hosts = [call[0][1]["host"] for call in progress_calls]
+    assert "SSH" in hosts[0]["services"]
+    assert "HTTPS" in hosts[1]["services"]
+
+    # Vérifie que network_scan_complete est émis une fois, sans la liste complète
     complete_calls = [call for call in mock_socketio.emit.call_args_list if call[0][0] == "network_scan_complete"]
     assert len(complete_calls) == 1
     payload = complete_calls[0][0][1]
     assert payload["success"] is True
     assert "scan_time" in payload
-    assert "summary" in payload
+    assert payload["summary"]["hosts_scanned"] == 2
+    assert payload["summary"]["open_ports"] == 2
+    assert "results" not in payload["summary"]
 
-    # Vérifie que les badges sont bien ajoutés
-    results = payload["summary"]["results"]
-    assert "services" in results[0]
-    assert "SSH" in results[0]["services"]
-    assert "HTTPS" in results[1]["services"]
     # Vérifie que les métriques sont écrites
-    assert mock_write.call_count == 2
\ No newline at end of file
+    assert mock_write.call_count == 2
+
+@patch("services.network_scan.socketio")
+@patch("services.network_scan.discover_hosts_nmap", side_effect=RuntimeError("nmap absent"))
+def test_background_emit_error(mock_discover, mock_socketio):
+    background_discover_and_emit(network="10.0.0.0/24", ports=[22])
+    event, payload = mock_socketio.emit.call_args[0]
+    assert event == "network_scan_complete"
+    assert payload["success"] is False
+    assert "nmap absent" in payload["error"]
@@ -0,0 +1,137 @@
+import subprocess
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+import net_discovery_nmap as nd
+from net_discovery_nmap import AdaptiveLimit, DiscoveryFeed, discover_hosts_nmap, iter_scan_hosts, split_network
+from services.network_scan import scan_progress
+
+
+class FakePing:
+    """Remplace `_run_nmap` : un hôte (adresse du bloc + 10) par bloc, délais / timeouts par bloc, concurrence mesurée."""
+
+    def __init__(self, delays=None, timeouts=(), gates=None):
+        self.delays = delays or {}
+        self.timeouts = set(timeouts)
+        self.gates = gates or {}
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, args, token=None, timeout=None):
+        block = args[-1]
+        with self._lock:
+            self.calls.append(block)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            if block in self.gates:
+                self.gates[block].wait(5)
+            time.sleep(self.delays.get(block, 0.01))
+            if block in self.timeouts:
+                raise subprocess.TimeoutExpired(args, timeout)
+            base, last = block.split("/")[0].rsplit(".", 1)
+            return SimpleNamespace(stdout=f"Nmap scan report for {base}.{int(last) + 10}\nHost is up.\n")
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def test_split_network():
+    assert len(split_network("10.0.0.0/16")) == 256
+    assert split_network("10.0.0.0/16")[:2] == ["10.0.0.0/24", "10.0.1.0/24"]
+    assert split_network("192.168.1.0/24") == ["192.168.1.0/24"]
+    assert split_network("192.168.1.7/25") == ["192.168.1.0/25"]
+    assert split_network("scanme.nmap.org") == ["scanme.nmap.org"]
+    assert split_network("fd00::/64") == ["fd00::/64"]
+
+
+def test_adaptive_limit_aimd():
+    limit = AdaptiveLimit(maximum=8, initial=4)
+    for _ in range(4):
+        limit.record(True, 1.0)
+    assert limit.current == 5
+    limit.record(False, 30.0)
+    assert limit.current == 2
+    # Bloc bien plus lent que la moyenne : pas d'augmentation
+    limit.record(True, 1.0)
+    limit.record(True, 10.0)
+    assert limit.current == 2
+    for _ in range(50):
+        limit.record(True, 1.0)
+    assert limit.current == 8
+
+
+def test_feed_runs_blocks_within_budget():
+    fake = FakePing(delays={f"10.0.{i}.0/24": 0.05 for i in range(16)})
+    with patch.object(nd, "_run_nmap", fake):
+        feed = DiscoveryFeed("10.0.0.0/20", parallel=3).start()
+        hosts = sorted(feed)
+    assert len(hosts) == 16 and "10.0.15.10" in hosts
+    assert fake.max_running <= 3
+    assert feed.done and feed.fraction_done == 1.0
+    assert feed.stats()["discovered"] == 16
+
+
+def test_timed_out_block_is_split_and_limit_drops():
+    fake = FakePing(timeouts={"10.0.1.0/24"})
+    with patch.object(nd, "_run_nmap", fake), patch.object(nd, "ensure_nmap_installed", return_value=True):
+        feed = discover_hosts_nmap("10.0.0.0/23", parallel=4, stream=True)
+        hosts = list(feed)
+    # Le /24 en timeout est relancé en deux /25
+    assert "10.0.1.0/25" in fake.calls and "10.0.1.128/25" in fake.calls
+    assert sorted(hosts) == ["10.0.0.10", "10.0.1.10", "10.0.1.138"]
+    assert feed.limit.timeouts == 1
+    assert feed.failed_blocks == []
+
+
+def test_all_blocks_failing_raises():
+    def failing(args, token=None, timeout=None):
+        raise subprocess.CalledProcessError(1, args, "", "bad option")
+
+    with patch.object(nd, "_run_nmap", failing), patch.object(nd, "ensure_nmap_installed", return_value=True):
+        with pytest.raises(RuntimeError, match="bad option"):
+            discover_hosts_nmap("10.0.0.0/23")
+
+
+def test_scanning_starts_before_discovery_ends():
+    slow = threading.Event()
+    fake = FakePing(gates={"10.0.1.0/24": slow})
+    scanned = []
+
+    def scan(ip, ports, scan_args, cancel_token=None):
+        scanned.append(ip)
+        return {"ip": ip, "ports": []}
+
+    with patch.object(nd, "_run_nmap", fake), patch.object(nd, "scan_host", scan):
+        feed = DiscoveryFeed("10.0.0.0/23", parallel=2).start()
+        results = iter_scan_hosts(feed, [22], parallel_hosts=2)
+        first = next(results)
+        # Le premier bloc est déjà scanné alors que le second n'a pas fini sa découverte
+        assert first["ip"] == "10.0.0.10" and not feed.done
+        assert scan_progress(1, feed)[0] < 100
+        slow.set()
+        rest = list(results)
+    assert [r["ip"] for r in rest] == ["10.0.1.10"]
+    assert scan_progress(2, feed) == (100, 2)
+
+
+def test_discovery_and_scan_share_the_job_budget():
+    fake = FakePing(delays={f"10.0.{i}.0/24": 0.03 for i in range(8)})
+
+    def scan(ip, ports, scan_args, cancel_token=None):
+        fake(["-sT", f"{ip}/32"])
+        return {"ip": ip, "ports": []}
+
+    with patch.object(nd, "_run_nmap", fake), patch.object(nd, "scan_host", scan):
+        slots = nd.nmap_slots(2)
+        feed = DiscoveryFeed("10.0.0.0/21", parallel=2, slots=slots).start()
+        results = list(iter_scan_hosts(feed, [22], parallel_hosts=2, slots=slots))
+    assert len(results) == 8
+    # nmap -sn et scans confondus : jamais plus que les 2 workers réservés
+    assert fake.max_running <= 2
@@ -0,0 +1,97 @@
+import queue
+import threading
+import time
+import types
+
+from services.docker_stats import DockerStatsCollector, sample_containers_parallel
+
+
+SAMPLE = {
+    "cpu_stats": {"cpu_usage": {"total_usage": 1000}, "system_cpu_usage": 2000},
+    "precpu_stats": {"cpu_usage": {"total_usage": 900}, "system_cpu_usage": 1800},
+    "memory_stats": {"usage": 256, "limit": 1024},
+}
+
+
+class SlowContainer:
+    def __init__(self, name, delay=0.2):
+        self.id = name
+        self.name = name
+        self.delay = delay
+
+    def stats(self, stream=False, decode=False):
+        time.sleep(self.delay)
+        return SAMPLE
+
+
+class StreamingContainer:
+    def __init__(self, name):
+        self.id = name
+        self.name = name
+        self.stopped = threading.Event()
+
+    def stats(self, stream=False, decode=False):
+        assert stream and decode
+        while not self.stopped.is_set():
+            yield SAMPLE
+            time.sleep(0.01)
+
+
+class FakeEvents:
+    def __init__(self):
+        self.q = queue.Queue()
+
+    def __iter__(self):
+        while True:
+            event = self.q.get()
+            if event is None:
+                return
+            yield event
+
+    def close(self):
+        self.q.put(None)
+
+
+def wait_for(cond, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if cond():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_parallel_sweep_does_not_scale_with_container_count():
+    containers = [SlowContainer(f"c{i}") for i in range(10)]
+    start = time.perf_counter()
+    samples = sample_containers_parallel(containers, max_workers=10)
+    elapsed = time.perf_counter() - start
+    assert len(samples) == 10
+    assert elapsed < 1.0
+
+
+def test_streams_follow_docker_events():
+    first = StreamingContainer("web")
+    second = StreamingContainer("db")
+    events = FakeEvents()
+    registry = {"web": first, "db": second}
+    client = types.SimpleNamespace(
+        containers=types.SimpleNamespace(list=lambda: [first], get=lambda cid: registry[cid]),
+        events=lambda decode, filters: events,
+    )
+
+    collector = DockerStatsCollector(client)
+    collector.start()
+    try:
+        assert wait_for(lambda: [n for n, _ in collector.snapshot()] == ["web"])
+
+        events.q.put({"Action": "start", "id": "db"})
+        assert wait_for(lambda: sorted(n for n, _ in collector.snapshot()) == ["db", "web"])
+
+        events.q.put({"Action": "die", "id": "web"})
+        first.stopped.set()
+        assert wait_for(lambda: [n for n, _ in collector.snapshot()] == ["db"])
+        assert collector.stream_count == 1
+    finally:
+        second.stopped.set()
+        collector.stop()
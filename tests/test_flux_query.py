@@ -0,0 +1,124 @@
+from datetime import datetime, timezone
+
+import pytest
+from influxdb_client.client.flux_table import FluxRecord
+
+from services.flux_query import FluxQueryService, TTLCache, align_range, build_flux, pick_step
+from services.timeseries import TimeSeriesStore
+
+
+def record(ts, field, value, **tags):
+    return FluxRecord(0, values={"result": "_result", "table": 0, "_time": datetime.fromtimestamp(ts, tz=timezone.utc),
+                                 "_measurement": "system_metrics", "_field": field, "_value": value, **tags})
+
+
+class FakeQueryApi:
+    def __init__(self, records=(), fail=False):
+        self.records = list(records)
+        self.fail = fail
+        self.calls = []
+        self.consumed = 0
+
+    def query_stream(self, query, params=None):
+        self.calls.append((query, params))
+        if self.fail:
+            raise ConnectionError("influx down")
+        for r in self.records:
+            self.consumed += 1
+            yield r
+
+
+def test_step_follows_pixel_width_and_aligns():
+    assert pick_step(3600, 800) == 5
+    assert pick_step(86400, 1000) == 120
+    assert pick_step(60, 4000) == 1
+    assert pick_step(3600, 800, min_step=40) == 60
+    assert align_range(1003, 1057, 10) == (1000, 1060)
+
+
+def test_flux_is_parameterised():
+    flux = build_flux("system_metrics", ["cpu_percent"], {"host": 'x") or (r._value > 0'}, "avg")
+    assert 'x")' not in flux
+    assert "params.tag0" in flux and "fn: mean" in flux
+    with pytest.raises(ValueError):
+        build_flux("m", [], {'host"]) |> drop(': "a"}, "avg")
+    with pytest.raises(ValueError):
+        build_flux("m", [], {}, "median")
+
+
+def test_overlapping_requests_hit_cache():
+    api = FakeQueryApi([record(1000, "cpu_percent", 10.0, host="a"),
+                        record(1005, "cpu_percent", 20.0, host="a"),
+                        record(1000, "cpu_percent", 30.0, host="b")])
+    service = FluxQueryService(lambda: api, lambda: "bucket")
+
+    first = service.query("system_metrics", fields=["cpu_percent"], range_s=3600, end=4001, width=800)
+    second = service.query("system_metrics", fields=["cpu_percent"], range_s=3600, end=4003, width=800)
+    assert len(api.calls) == 1
+    assert not first["cached"] and second["cached"]
+    assert first["step"] == 5 and (first["start"], first["end"]) == (400, 4005)
+    assert first["source"] == "influxdb"
+    assert [(s["tags"], s["points"]) for s in first["series"]] == [
+        ({"host": "a"}, [[1000.0, 10.0], [1005.0, 20.0]]),
+        ({"host": "b"}, [[1000.0, 30.0]]),
+    ]
+    params = api.calls[0][1]
+    assert params["fields"] == ["cpu_percent"] and params["every"].total_seconds() == 5
+
+    # Autre agrégation : autre clé
+    service.query("system_metrics", fields=["cpu_percent"], range_s=3600, end=4001, width=800, agg="max")
+    assert len(api.calls) == 2
+
+
+def test_stream_is_truncated_without_reading_everything():
+    api = FakeQueryApi([record(t, "cpu_percent", 1.0) for t in range(100)])
+    service = FluxQueryService(lambda: api, lambda: "bucket", max_points=10)
+    result = service.query("system_metrics", range_s=100, end=100)
+    assert result["truncated"]
+    assert len(result["series"][0]["points"]) == 10
+    assert api.consumed == 11
+
+
+def test_falls_back_to_memory_history():
+    store = TimeSeriesStore(retention_seconds=1000, resolution_seconds=1)
+    store.record("system_metrics", {"cpu_percent": 42.0}, {"host": "h"}, ts=1000)
+    api = FakeQueryApi(fail=True)
+    service = FluxQueryService(lambda: api, lambda: "bucket", fallback=store)
+    result = service.query("system_metrics", range_s=100, end=1050, width=10)
+    assert result["source"] == "memory"
+    assert result["series"][0]["points"] == [[1000.0, 42.0]]
+    assert service.stats()["errors"] == 1
+    # Le repli n'est pas mis en cache : InfluxDB est retenté à la requête suivante
+    service.query("system_metrics", range_s=100, end=1050, width=10)
+    assert len(api.calls) == 2
+
+    with pytest.raises(ConnectionError):
+        FluxQueryService(lambda: None, lambda: "bucket").query("system_metrics")
+
+
+def test_ttl_cache_expires_and_evicts():
+    cache = TTLCache(size=2)
+    cache.put("a", 1, ttl=10, now=0)
+    cache.put("b", 2, ttl=1, now=0)
+    assert cache.get("b", now=2) is None
+    cache.put("c", 3, ttl=10, now=0)
+    cache.put("d", 4, ttl=10, now=0)
+    assert cache.get("a", now=1) is None
+    assert cache.get("d", now=1) == 4
+
+
+def test_query_endpoint(monkeypatch):
+    import app as myapp
+
+    api = FakeQueryApi([record(1000, "cpu_percent", 10.0, host="a")])
+    monkeypatch.setattr(myapp, "flux_queries", FluxQueryService(lambda: api, lambda: "bucket"))
+    with myapp.app.test_client() as client:
+        client.post("/login", data={"username": "admin", "password": "admin123"})
+        url = "/api/metrics/query?fields=cpu_percent&tag.host=a&range=600&end=1200&width=60"
+        resp = client.get(url)
+        assert resp.status_code == 200
+        assert resp.headers["X-Cache"] == "MISS"
+        assert resp.get_json()["series"][0]["points"] == [[1000.0, 10.0]]
+        assert client.get(url).headers["X-Cache"] == "HIT"
+        assert api.calls[0][1]["tag0"] == "a"
+        assert client.get("/api/metrics/query?agg=bogus").status_code == 400
@@ -0,0 +1,176 @@
+import os
+import subprocess
+import sys
+import time
+from unittest.mock import patch
+
+import pytest
+import requests
+
+import app as myapp
+from agent import PushAgent
+from services.ingest import IngestService, decode_payload, encode_payload
+from services.write_pipeline import BatchWriter
+
+
+class FakeWriteApi:
+    def __init__(self):
+        self.points = 0
+
+    def write(self, bucket, record):
+        self.points += record.count("\n") + 1
+
+
+class ClientSession:
+    """Session `requests` minimale qui relaie les POST vers le client de test Flask."""
+
+    def __init__(self, client, fail_first=0):
+        self.client = client
+        self.headers = {}
+        self.fail_first = fail_first
+        self.bodies = []
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        if self.fail_first:
+            self.fail_first -= 1
+            raise requests.exceptions.ConnectionError("serveur injoignable")
+        self.bodies.append(data)
+        resp = self.client.post("/api/ingest", data=data, headers={**self.headers, **(headers or {})})
+        return SimpleResponse(resp.status_code)
+
+
+class SimpleResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(str(self.status_code))
+
+
+@pytest.fixture
+def client():
+    with patch("app.INGEST_TOKEN", "s3cret"):
+        yield myapp.app.test_client()
+
+
+def test_payload_roundtrip_and_validation():
+    body, ctype = encode_payload({"host": "a", "system": [[1.0, {"cpu_percent": 5}]]}, "json")
+    assert decode_payload(body, ctype)["system"][0][1] == {"cpu_percent": 5}
+    with pytest.raises(ValueError):
+        decode_payload(b'{"system": []}', "application/json")
+
+
+def test_agent_imports_without_flask():
+    code = "import sys, agent; print(sorted(m for m in ('flask', 'flask_socketio', 'services.metrics') if m in sys.modules))"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, timeout=30)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip() == "[]"
+
+
+def test_ingest_requires_token(client):
+    assert client.post("/api/ingest", json={"host": "a"}).status_code == 401
+    with patch("app.INGEST_TOKEN", ""):
+        assert client.post("/api/ingest", json={"host": "a"}).status_code == 403
+    resp = client.post("/api/ingest", data=b"{", headers={"Authorization": "Bearer s3cret"})
+    assert resp.status_code == 400
+
+
+def test_ingest_fans_out_to_pipeline_and_broadcast(client):
+    payload = {"host": "node-7",
+               "system": [[100.0, {"cpu_percent": 12.5}]],
+               "docker": [[100.0, "nginx", {"cpu": 1.0, "memory": 2.0}]]}
+    service = IngestService(flush_interval=60)
+    with patch("app.ingest_service", service), \
+         patch("services.ingest.write_metrics") as write, \
+         patch("services.ingest.broadcaster") as bc:
+        resp = client.post("/api/ingest", json=payload, headers={"Authorization": "Bearer s3cret"})
+        assert resp.status_code == 202
+        assert resp.get_json() == {"accepted": 2}
+        write.assert_any_call("system_metrics", {"cpu_percent": 12.5}, {"host": "node-7"}, 100.0)
+        write.assert_any_call("docker_container", {"cpu": 1.0, "memory": 2.0},
+                              {"name": "nginx", "host": "node-7"}, 100.0)
+        bc.publish.assert_any_call("system", "node-7", {"cpu_percent": 12.5})
+        bc.publish.assert_any_call("docker/node-7", "nginx", {"cpu": 1.0, "memory": 2.0})
+        # Trames regroupées : rien n'est émis avant le flush périodique
+        bc.flush.assert_not_called()
+        service.flush()
+        bc.flush.assert_any_call("system", complete=False)
+        bc.flush.assert_any_call("docker/node-7", complete=True)
+
+
+def test_agent_buffers_while_server_down(client):
+    session = ClientSession(client, fail_first=1)
+    agent = PushAgent("http://central", "s3cret", host="edge-1", encoding="json", session=session)
+    with patch("services.ingest.write_metrics") as write:
+        agent.collect_once()
+        assert not agent.push()
+        agent.collect_once()
+        assert agent.push()
+    assert not agent.buffer
+    assert agent.pushed_ticks == 2
+    # Les deux ticks partent dans le même lot
+    assert len(session.bodies) == 1
+    assert write.call_count == 2
+    assert all(c.args[2] == {"host": "edge-1"} for c in write.call_args_list)
+
+
+def test_hundreds_of_agents_per_interval(client):
+    """300 agents x 1 tick (intervalle de 5 s) : doit tenir largement sous l'intervalle."""
+    api = FakeWriteApi()
+    writer = BatchWriter(api, "bucket", batch_size=1000)
+    fields = {f"f{i}": float(i) for i in range(16)}
+    with patch("services.metrics.batch_writer", writer), patch("app.ingest_service", IngestService(flush_interval=60)):
+        start = time.perf_counter()
+        for n in range(300):
+            body, ctype = encode_payload({"host": f"agent-{n}", "system": [[time.time(), fields]]})
+            resp = client.post("/api/ingest", data=body, headers={"Authorization": "Bearer s3cret", "Content-Type": ctype})
+            assert resp.status_code == 202
+        elapsed = time.perf_counter() - start
+        writer.flush()
+    assert api.points == 300
+    assert elapsed < 5.0
+
+
+def test_ingest_validates_whole_payload_before_writing(client):
+    payload = {"host": "node-7", "system": [[100.0, {"cpu_percent": 1}], [105.0, "oops"], [110.0, {"cpu_percent": 2}]]}
+    with patch("services.ingest.write_metrics") as write, patch("services.ingest.broadcaster") as bc:
+        resp = client.post("/api/ingest", json=payload, headers={"Authorization": "Bearer s3cret"})
+    assert resp.status_code == 400
+    write.assert_not_called()
+    bc.publish.assert_not_called()
+
+
+def test_agent_drains_large_backlog_in_chunks_under_server_cap(client):
+    session = ClientSession(client)
+    agent = PushAgent("http://central", "s3cret", host="edge-1", encoding="json", session=session)
+    agent.docker = object()  # build_payload inclut la clé docker
+    containers = [[100.0, f"c{i}", {"cpu": 1.0}, {}] for i in range(30)]
+    for n in range(200):
+        agent.buffer.append({"system": [100.0 + n, {"cpu_percent": 1.0}], "docker": containers})
+    with patch("services.ingest.write_metrics") as write, patch("app.ingest_service", IngestService(flush_interval=60)):
+        assert agent.push()
+    assert not agent.buffer and agent.pushed_ticks == 200
+    assert len(session.bodies) == 7  # 32 ticks (992 points) par lot
+    assert write.call_count == 200 * 31
+
+
+def test_agent_splits_rejected_batch_and_drops_bad_tick(client):
+    session = ClientSession(client)
+    agent = PushAgent("http://central", "s3cret", host="edge-1", encoding="json", session=session)
+    for n in range(8):
+        agent.buffer.append({"system": [100.0 + n, "oops" if n == 5 else {"cpu_percent": 1.0}]})
+    with patch("services.ingest.write_metrics") as write, patch("app.ingest_service", IngestService(flush_interval=60)):
+        assert agent.push()
+    assert not agent.buffer
+    assert (agent.pushed_ticks, agent.dropped_ticks) == (7, 1)
+    # Aucun point écrit deux fois malgré les renvois
+    assert sorted(c.args[3] for c in write.call_args_list) == [100.0 + n for n in range(8) if n != 5]
+
+
+def test_pages_expose_local_host_for_system_topic(client):
+    from services.metrics import HOSTNAME
+
+    client.post("/login", data={"username": "admin", "password": "admin123"})
+    assert f'window.SKY_HOST = "{HOSTNAME}";' in client.get("/").get_data(as_text=True)
@@ -0,0 +1,102 @@
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from services import instrumentation
+from services.instrumentation import Registry, instrument_socketio, sampled_print, timed
+
+
+def test_histogram_renders_cumulative_buckets():
+    reg = Registry()
+    hist = reg.histogram("demo_seconds", "Demo.", ["route"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        hist.labels(route='a"b').observe(value)
+    text = reg.render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{route="a\\"b",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{route="a\\"b",le="1.0"} 3' in text
+    assert 'demo_seconds_bucket{route="a\\"b",le="+Inf"} 4' in text
+    assert 'demo_seconds_count{route="a\\"b"} 4' in text
+    assert 'demo_seconds_sum{route="a\\"b"} 4.05' in text
+
+
+def test_counter_gauge_and_timed_decorator():
+    reg = Registry()
+    calls = reg.counter("demo_total", "Demo.", ["kind"])
+    calls.labels(kind="x").inc()
+    calls.labels(kind="x").inc(2)
+    reg.gauge("demo_queue", "Demo.", lambda: {("depth",): 7}, ["stat"])
+    reg.gauge("demo_broken", "Demo.", lambda: 1 / 0)
+    hist = reg.histogram("demo_call_seconds", "Demo.")
+
+    @timed(hist)
+    def work(x):
+        if x < 0:
+            raise ValueError
+        return x * 2
+
+    assert work(21) == 42
+    with pytest.raises(ValueError):
+        work(-1)
+    text = reg.render()
+    assert 'demo_total{kind="x"} 3.0' in text
+    assert 'demo_queue{stat="depth"} 7' in text
+    assert "demo_broken" not in text
+    assert "demo_call_seconds_count 2" in text
+
+
+def test_sampled_print_limits_hot_path_logging(capsys):
+    for _ in range(50):
+        sampled_print("test-key", "[test] ligne", interval=60)
+    assert capsys.readouterr().out.count("[test] ligne") == 1
+    with patch.object(instrumentation.time, "monotonic", return_value=10**9):
+        sampled_print("test-key", "[test] ligne", interval=60)
+    assert "(+49 lignes omises)" in capsys.readouterr().out
+
+
+def test_instrumented_socketio_emit():
+    class FakeSocketIO:
+        def __init__(self):
+            self.sent = []
+
+        def emit(self, event, data=None, to=None):
+            self.sent.append((event, to))
+
+    sio = instrument_socketio(instrument_socketio(FakeSocketIO()))
+    before = instrumentation.SOCKET_EMIT_SECONDS.labels(event="demo_event").count
+    sio.emit("demo_event", {"x": 1}, to="room")
+    assert sio.sent == [("demo_event", "room")]
+    # Instrumenté une seule fois malgré le double appel
+    assert instrumentation.SOCKET_EMIT_SECONDS.labels(event="demo_event").count == before + 1
+
+
+def test_nmap_runtime_is_recorded():
+    from net_discovery_nmap import _run_nmap
+
+    ok = instrumentation.NMAP_RUN_SECONDS.labels(outcome="ok")
+    error = instrumentation.NMAP_RUN_SECONDS.labels(outcome="error")
+    before_ok, before_error = ok.count, error.count
+    _run_nmap([sys.executable, "-c", "pass"])
+    with pytest.raises(subprocess.CalledProcessError):
+        _run_nmap([sys.executable, "-c", "import sys; sys.exit(2)"])
+    assert (ok.count, error.count) == (before_ok + 1, before_error + 1)
+
+
+def test_metrics_endpoint(monkeypatch):
+    import app as myapp
+
+    with myapp.app.test_client() as client:
+        assert client.get("/api/health").status_code == 200
+        resp = client.get("/metrics")
+        assert resp.status_code == 200
+        assert resp.content_type.startswith("text/plain; version=0.0.4")
+        text = resp.get_data(as_text=True)
+        assert 'skymonitor_http_request_seconds_count{method="GET",endpoint="api_health",status="200"}' in text
+        assert "# TYPE skymonitor_collector_cycle_seconds histogram" in text
+        assert "# TYPE skymonitor_write_pipeline gauge" in text
+
+        monkeypatch.setattr(myapp, "METRICS_TOKEN", "secret")
+        assert client.get("/metrics").status_code == 401
+        assert client.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code == 200
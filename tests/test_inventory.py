@@ -0,0 +1,111 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from services.inventory import InventoryIndex, classify_role
+
+
+def host(ip, *ports, **extra):
+    return {"ip": ip, "ports": [{"port": p, "state": "open", "service": svc} for p, svc in ports], **extra}
+
+
+@pytest.fixture
+def index():
+    idx = InventoryIndex()
+    idx.upsert_host(host("10.0.0.10", (22, "ssh"), (80, "http")), now=1.0)
+    idx.upsert_host(host("10.0.0.2", (3389, "ms-wbt-server"), (445, "microsoft-ds"), mac="AA:BB:CC:00:00:01"), now=1.0)
+    idx.upsert_host(host("10.0.0.30"), now=1.0)
+    return idx
+
+
+def test_classify_role():
+    assert classify_role([22, 3389]) == "serveur"
+    assert classify_role([3389]) == "poste"
+    assert classify_role([]) == "device"
+
+
+def test_secondary_indexes_and_ordering(index):
+    total, items = index.query("devices")
+    assert total == 3
+    # Tri numérique des IP, pas lexicographique
+    assert [d["ip"] for d in items] == ["10.0.0.2", "10.0.0.10", "10.0.0.30"]
+
+    assert [d["ip"] for d in index.query("devices", {"role": "serveur"})[1]] == ["10.0.0.10"]
+    assert [d["ip"] for d in index.query("devices", {"role": "poste"})[1]] == ["10.0.0.2"]
+    assert [d["ip"] for d in index.query("devices", {"service": "SSH"})[1]] == ["10.0.0.10"]
+    assert [d["ip"] for d in index.query("devices", {"port": 445})[1]] == ["10.0.0.2"]
+    assert index.get("aa:bb:cc:00:00:01")["ip"] == "10.0.0.2"
+
+
+def test_pagination_and_search(index):
+    total, page = index.query("devices", offset=1, limit=1)
+    assert total == 3 and [d["ip"] for d in page] == ["10.0.0.10"]
+    total, page = index.query("devices", {"q": ".30"})
+    assert total == 1 and page[0]["ip"] == "10.0.0.30"
+
+
+def test_version_only_changes_on_real_change(index):
+    version = index.version("devices")
+    assert not index.upsert_host(host("10.0.0.10", (22, "ssh"), (80, "http")), now=2.0)
+    assert index.version("devices") == version
+    assert index.get("10.0.0.10")["last_seen"] == 2.0
+
+    # Le rôle suit les ports : plus de service serveur -> l'index est mis à jour
+    assert index.upsert_host(host("10.0.0.10", (3389, "ms-wbt-server")))
+    assert index.version("devices") == version + 1
+    assert index.query("devices", {"role": "serveur"})[0] == 0
+
+    assert index.mark_down("10.0.0.10")
+    assert not index.mark_down("10.0.0.10")
+    assert [d["ip"] for d in index.query("devices", {"status": "offline"})[1]] == ["10.0.0.10"]
+
+
+def test_sync_containers_adds_updates_and_removes():
+    idx = InventoryIndex()
+    web = SimpleNamespace(id="c1", name="web", status="running", attrs={"Config": {"Image": "nginx:latest"}})
+    db = SimpleNamespace(id="c2", name="db", status="running", attrs={"Config": {"Image": "mysql:8.0"}})
+    assert idx.sync_containers([web, db], "srv1") == 2
+    assert idx.sync_containers([web, db], "srv1") == 0
+    assert idx.sync_containers([web], "srv1") == 1
+    total, items = idx.query("containers")
+    assert total == 1 and items[0]["image"] == "nginx:latest"
+
+
+def test_loader_runs_once():
+    calls = []
+
+    def loader(idx):
+        calls.append(1)
+        idx.upsert_host(host("10.0.0.5", (22, "ssh")))
+
+    idx = InventoryIndex(loader=loader)
+    assert idx.query("devices")[0] == 1
+    idx.query("devices")
+    assert calls == [1]
+
+
+def test_endpoints_etag_and_pagination(index):
+    import app as myapp
+    client = myapp.app.test_client()
+    client.post("/login", data={"username": "admin", "password": "admin123"})
+    with patch("app.inventory_index", index):
+        resp = client.get("/api/network/devices?limit=2")
+        assert resp.status_code == 200
+        assert resp.headers["X-Total-Count"] == "3"
+        assert len(resp.get_json()) == 2
+        etag = resp.headers["ETag"]
+
+        again = client.get("/api/network/devices?limit=2", headers={"If-None-Match": etag})
+        assert again.status_code == 304
+
+        # Une autre page ou un changement d'inventaire invalide l'ETag
+        assert client.get("/api/network/devices?limit=1", headers={"If-None-Match": etag}).status_code == 200
+        index.upsert_host(host("10.0.0.40", (443, "https")))
+        assert client.get("/api/network/devices?limit=2", headers={"If-None-Match": etag}).status_code == 200
+
+        servers = client.get("/api/serveurs").get_json()
+        assert {d["ip_address"] for d in servers} == {"10.0.0.10", "10.0.0.40"}
+        assert json.loads(client.get("/api/postes").data)[0]["ip"] == "10.0.0.2"
+        assert client.get("/api/conteneurs").get_json() == []
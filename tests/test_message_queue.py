@@ -0,0 +1,119 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from services.message_queue import UnixSocketBroker, UnixSocketManager, socketio_options
+from services.runtime import run_blocking
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def broker(tmp_path):
+    b = UnixSocketBroker(str(tmp_path / "mq.sock"))
+    b.start()
+    yield b
+    b.stop()
+
+
+def listen_in_background(manager, received):
+    def run():
+        for data in manager._listen():
+            received.append(data)
+    threading.Thread(target=run, daemon=True).start()
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_messages_fan_out_to_other_workers(broker):
+    url = f"unix://{broker.path}"
+    worker_a, worker_b = UnixSocketManager(url), UnixSocketManager(url)
+    got_a, got_b = [], []
+    listen_in_background(worker_a, got_a)
+    listen_in_background(worker_b, got_b)
+    assert wait_for(lambda: sum(c["role"] == "sub" for c in broker._clients.values()) == 2)
+
+    message = {"method": "emit", "event": "system_update", "data": [{"cpu": 1}], "room": "system",
+               "host_id": worker_a.host_id}
+    worker_a._publish(message)
+    assert wait_for(lambda: got_b == [message])
+    # L'émetteur reçoit aussi le message ; PubSubManager l'ignore grâce à host_id
+    assert wait_for(lambda: got_a == [message])
+    assert broker.messages == 1
+
+
+def test_slow_subscriber_is_dropped(tmp_path):
+    b = UnixSocketBroker(str(tmp_path / "mq.sock"), max_buffer=10)
+    b.start()
+    try:
+        url = f"unix://{b.path}"
+        sub = UnixSocketManager(url)._connect("sub")
+        assert wait_for(lambda: len(b._clients) == 1 and list(b._clients.values())[0]["role"] == "sub")
+        UnixSocketManager(url)._publish({"method": "emit", "data": "x" * 100})
+        assert wait_for(lambda: b.dropped_clients == 1)
+        sub.close()
+    finally:
+        b.stop()
+
+
+def test_socketio_options():
+    assert socketio_options("") == {}
+    assert socketio_options("redis://localhost:6379/0") == {"message_queue": "redis://localhost:6379/0"}
+    assert isinstance(socketio_options("unix:///tmp/x.sock")["client_manager"], UnixSocketManager)
+
+
+def test_run_blocking_uses_os_thread_under_eventlet():
+    pytest.importorskip("eventlet")
+    code = (
+        "import eventlet; eventlet.monkey_patch()\n"
+        "import threading\n"
+        "from services.runtime import run_blocking\n"
+        "print(run_blocking(threading.get_native_id) != threading.get_native_id())\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=30)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip() == "True"
+    assert run_blocking(lambda x: x * 2, 21) == 42
+
+
+def test_samplers_keep_green_locks_out_of_the_thread_pool():
+    pytest.importorskip("eventlet")
+    code = (
+        "import eventlet; eventlet.monkey_patch()\n"
+        "from services.runtime import run_blocking\n"
+        "from services.process_sampler import ProcessSampler\n"
+        "from services.system_sampler import SystemSampler\n"
+        "processes = ProcessSampler(top_n=3)\n"
+        "print(type(processes._lock).__module__)\n"
+        "print(run_blocking(processes.sample)['process_count'] > 0, SystemSampler().sample()['cpu_count'] > 0)\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=30)
+    assert proc.returncode == 0, proc.stderr
+    # Le sampler de processus verrouille depuis le pool de threads : verrou OS, pas eventlet.lock
+    assert proc.stdout.split() == ["_thread", "True", "True"]
+
+
+def test_single_collector_process(tmp_path):
+    lock = str(tmp_path / "collectors.lock")
+    code = f"from services.runtime import acquire_collector_lock; print(acquire_collector_lock({lock!r}))"
+    holder = subprocess.Popen([sys.executable, "-c", code + "; import time; time.sleep(5)"], cwd=ROOT,
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        assert holder.stdout.readline().strip() == "True"
+        other = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=30)
+        assert other.stdout.strip() == "False"
+    finally:
+        holder.kill()
+        holder.wait()
+    # Le verrou est libéré à la mort du processus
+    other = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=30)
+    assert other.stdout.strip() == "True"
@@ -0,0 +1,134 @@
+import asyncio
+import socket
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from net_discovery_async import (AsyncDiscoveryFeed, AsyncScanner, RttEstimator, discover_hosts_async,
+                                 iter_async_scan_hosts, scan_host_async)
+from net_discovery_nmap import resolve_engine
+
+
+@pytest.fixture
+def local_listeners():
+    """Ports TCP locaux : un avec bannière, un muet, et un port fermé."""
+    servers = []
+    stop = threading.Event()
+
+    def serve(sock, banner):
+        sock.settimeout(0.1)
+        while not stop.is_set():
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                continue
+            if banner:
+                conn.sendall(banner)
+            conn.close()
+
+    def listen(banner=None):
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        sock.listen(128)
+        t = threading.Thread(target=serve, args=(sock, banner), daemon=True)
+        t.start()
+        servers.append((sock, t))
+        return sock.getsockname()[1]
+
+    banner_port = listen(b"SSH-2.0-SkyTest\r\n")
+    silent_port = listen()
+    probe = socket.socket()
+    probe.bind(("127.0.0.1", 0))
+    closed_port = probe.getsockname()[1]
+    probe.close()
+
+    yield {"banner": banner_port, "silent": silent_port, "closed": closed_port}
+
+    stop.set()
+    for sock, t in servers:
+        t.join(1)
+        sock.close()
+
+
+def test_rtt_estimator_adapts_timeout():
+    rtt = RttEstimator(initial=1.0, min_timeout=0.05, max_timeout=3.0)
+    assert rtt.timeout() == 1.0
+    for _ in range(20):
+        rtt.update(0.01)
+    assert rtt.timeout() == pytest.approx(0.05)
+    rtt.update(10)
+    assert rtt.timeout() == 3.0
+
+
+def test_resolve_engine():
+    assert resolve_engine("async") == "async"
+    with pytest.raises(ValueError):
+        resolve_engine("masscan")
+
+
+def test_scan_host_same_shape_as_subprocess(local_listeners):
+    ports = [local_listeners["banner"], local_listeners["silent"], local_listeners["closed"]]
+    result = scan_host_async("127.0.0.1", ports, banner=True, banner_timeout=0.3)
+
+    assert result["ip"] == "127.0.0.1"
+    open_ports = {p["port"]: p for p in result["ports"]}
+    assert set(open_ports) == {local_listeners["banner"], local_listeners["silent"]}
+    first = open_ports[local_listeners["banner"]]
+    assert first["protocol"] == "tcp"
+    assert first["state"] == "open"
+    assert "SSH-2.0-SkyTest" in first["raw"]
+    assert "raw_output" in result
+
+
+def test_report_closed(local_listeners):
+    result = scan_host_async("127.0.0.1", [local_listeners["closed"]], report_closed=True)
+    assert result["ports"][0]["state"] == "closed"
+
+
+def test_is_alive_on_refused_port(local_listeners):
+    import asyncio
+    scanner = AsyncScanner(timeout=0.5)
+    assert asyncio.run(scanner.is_alive("127.0.0.1", [local_listeners["closed"]]))
+
+
+def test_streaming_scan_throughput(local_listeners):
+    """Mini benchmark : 50 hôtes loopback x 3 ports via le sémaphore global."""
+    ports = [local_listeners["banner"], local_listeners["silent"], local_listeners["closed"]]
+    hosts = ["127.0.0.1"] * 50
+    start = time.perf_counter()
+    results = list(iter_async_scan_hosts(hosts, ports, concurrency=64, timeout=0.5))
+    elapsed = time.perf_counter() - start
+    assert len(results) == 50
+    assert all(len(r["ports"]) == 2 for r in results)
+    assert elapsed < 5
+
+
+class Token:
+    cancelled = False
+
+
+def test_discovery_streams_hosts_into_the_scan(local_listeners):
+    ports = [local_listeners["banner"], local_listeners["closed"]]
+    feed = discover_hosts_async("127.0.0.0/30", stream=True, timeout=0.5)
+    assert isinstance(feed, AsyncDiscoveryFeed) and feed.fraction_done == 0.0
+    results = list(iter_async_scan_hosts(feed, ports, timeout=0.5))
+    assert "127.0.0.1" in [r["ip"] for r in results]
+    assert feed.done and feed.fraction_done == 1.0
+    assert feed.stats()["checked"] == 2
+
+
+def test_cancel_stops_a_silent_discovery():
+    token = Token()
+
+    async def silent(self, ip, probe_ports=()):
+        # Réseau muet : chaque sonde ne se termine qu'au timeout
+        await asyncio.sleep(30)
+        return False
+
+    threading.Timer(0.3, lambda: setattr(token, "cancelled", True)).start()
+    start = time.perf_counter()
+    with patch.object(AsyncScanner, "is_alive", silent):
+        assert list(discover_hosts_async("10.9.0.0/24", cancel_token=token, stream=True)) == []
+    assert time.perf_counter() - start < 2.0
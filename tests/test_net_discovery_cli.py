@@ -0,0 +1,92 @@
+import csv
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+import net_discovery_nmap as nd
+from net_discovery_nmap import load_completed_hosts
+
+
+def fake_ping(args, token=None, timeout=None):
+    """Un hôte (adresse du bloc + 10) par bloc /24."""
+    base, last = args[-1].split("/")[0].rsplit(".", 1)
+    return SimpleNamespace(stdout=f"Nmap scan report for {base}.{int(last) + 10}\nHost is up.\n")
+
+
+class FakeScan:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, ip, ports, scan_args, cancel_token=None):
+        self.calls.append(ip)
+        return {"ip": ip, "raw_output": "x" * 1000, "ports": [
+            {"port": 22, "protocol": "tcp", "state": "open", "service": "ssh"},
+            {"port": 80, "protocol": "tcp", "state": "closed", "service": "http"},
+        ]}
+
+
+def run_cli(argv):
+    scan = FakeScan()
+    with patch.object(nd, "_run_nmap", fake_ping), patch.object(nd, "scan_host", scan), \
+            patch.object(nd, "ensure_nmap_installed", return_value=True):
+        nd.main(["-n", "10.0.0.0/22", "--engine", "nmap", "--parallel", "2"] + argv)
+    return scan
+
+
+def test_ndjson_streams_one_compact_line_per_host(tmp_path):
+    out = tmp_path / "scan.ndjson"
+    run_cli(["-o", str(out)])
+    lines = out.read_text().splitlines()
+    hosts = [json.loads(line) for line in lines]
+    assert sorted(h["ip"] for h in hosts) == ["10.0.0.10", "10.0.1.10", "10.0.2.10", "10.0.3.10"]
+    assert all("raw_output" not in h and ": " not in line for h, line in zip(hosts, lines))
+
+
+def test_resume_skips_completed_hosts_and_drops_torn_line(tmp_path):
+    out = tmp_path / "scan.ndjson"
+    done = json.dumps({"ip": "10.0.0.10", "ports": []})
+    failed = json.dumps({"ip": "10.0.1.10", "error": "timeout"})
+    out.write_text(f"{done}\n{failed}\n{{\"ip\": \"10.0.2.1")
+    assert load_completed_hosts(str(out)) == {"10.0.0.10"}
+    assert out.read_text() == f"{done}\n{failed}\n"
+
+    scan = run_cli(["-o", str(out), "--resume"])
+    assert sorted(scan.calls) == ["10.0.1.10", "10.0.2.10", "10.0.3.10"]
+    ips = [json.loads(line)["ip"] for line in out.read_text().splitlines()]
+    assert ips[:2] == ["10.0.0.10", "10.0.1.10"] and len(ips) == 5
+
+
+def test_csv_rows_per_port_and_resume(tmp_path):
+    out = tmp_path / "scan.csv"
+    run_cli(["-o", str(out), "--format", "csv"])
+    rows = list(csv.DictReader(out.open()))
+    assert len(rows) == 8
+    assert rows[0]["port"] == "22" and rows[0]["service"] == "ssh"
+    assert len(load_completed_hosts(str(out), "csv")) == 4
+
+    scan = run_cli(["-o", str(out), "--format", "csv", "--resume"])
+    assert scan.calls == []
+    assert out.read_text().count("ip,hostname") == 1
+
+
+def test_compact_json_document(tmp_path):
+    out = tmp_path / "scan.json"
+    run_cli(["-o", str(out), "--format", "json"])
+    doc = json.loads(out.read_text())
+    assert doc["network"] == "10.0.0.0/22"
+    assert len(doc["results"]) == 4 and doc["hosts_scanned"] == 4
+    assert "\n" not in out.read_text().strip()
+
+
+def test_stdout_output_keeps_logs_on_stderr(capsys):
+    run_cli(["-o", "-"])
+    captured = capsys.readouterr()
+    assert len([json.loads(line) for line in captured.out.splitlines()]) == 4
+    assert "Scan terminé" in captured.err
+
+
+def test_resume_requires_line_format(tmp_path):
+    with pytest.raises(SystemExit):
+        nd.main(["-n", "10.0.0.0/24", "-o", str(tmp_path / "x.json"), "--format", "json", "--resume"])
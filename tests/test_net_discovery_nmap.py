@@ -99,4 +99,17 @@ def test_scan_host_with_python_nmap(mock_portscanner):
     assert result["ports"][0]["service"] == "ssh"
     assert result["ports"][0]["product"] == "OpenSSH"
     assert result["ports"][0]["version"] == "7.9p1"
-    assert result["ports"][0]["extrainfo"] == ""
\ No newline at end of file
+    assert result["ports"][0]["extrainfo"] == ""
+
+def test_iter_scan_hosts_yields_as_completed():
+    import time
+    from net_discovery_nmap import iter_scan_hosts
+
+    def fake_scan(ip, ports, scan_args):
+        time.sleep(0.2 if ip == "10.0.0.1" else 0.01)
+        return {"ip": ip, "ports": []}
+
+    with patch("net_discovery_nmap.scan_host", side_effect=fake_scan):
+        order = [r["ip"] for r in iter_scan_hosts(["10.0.0.1", "10.0.0.2", "10.0.0.3"], [22], parallel_hosts=3)]
+    assert order[-1] == "10.0.0.1"
+    assert sorted(order) == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
@@ -0,0 +1,86 @@
+import io
+import os
+from unittest.mock import patch, MagicMock
+
+from net_discovery_nmap import parse_nmap_xml, scan_chunk_with_xml, scan_hosts_bulk
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "nmap_bulk.xml")
+
+
+def load_fixture() -> bytes:
+    with open(FIXTURE, "rb") as f:
+        return f.read()
+
+
+def fake_popen(stdout: bytes):
+    proc = MagicMock()
+    proc.stdin = io.BytesIO()
+    proc.stdout = io.BytesIO(stdout)
+    proc.poll.return_value = 0
+    proc.returncode = 0
+    return proc
+
+
+def test_parse_nmap_xml_fixture():
+    hosts = list(parse_nmap_xml(io.BytesIO(load_fixture())))
+    assert [h["ip"] for h in hosts] == ["192.168.1.10", "192.168.1.20", "192.168.1.30"]
+
+    first = hosts[0]
+    assert first["hostname"] == "srv-paris.local"
+    assert first["mac"] == "AA:BB:CC:DD:EE:01"
+    assert first["ports"][0] == {
+        "port": 22, "protocol": "tcp", "state": "open", "service": "ssh",
+        "product": "OpenSSH", "version": "9.2p1 Debian 2", "extrainfo": "protocol 2.0",
+    }
+    assert [p["state"] for p in first["ports"]] == ["open", "open", "closed"]
+    assert hosts[1]["ports"][0]["product"] == "Apache httpd"
+    assert hosts[2]["status"] == "down"
+    assert hosts[2]["ports"] == []
+
+
+def test_scan_chunk_builds_single_nmap_invocation():
+    with patch("net_discovery_nmap.subprocess.Popen", return_value=fake_popen(load_fixture())) as mock_popen:
+        results = list(scan_chunk_with_xml(["192.168.1.10", "192.168.1.20", "192.168.1.30", "192.168.1.40"], [22, 80, 443]))
+
+    args = mock_popen.call_args[0][0]
+    assert args[:3] == ["nmap", "-sT", "-sV"]
+    assert args[-4:] == ["-oX", "-", "-iL", "-"]
+    assert mock_popen.call_count == 1
+    # L'hôte absent de la sortie XML est quand même rapporté
+    assert results[-1] == {"ip": "192.168.1.40", "ports": [], "status": "down"}
+
+
+def test_scan_chunk_reports_nmap_failure():
+    with patch("net_discovery_nmap.subprocess.Popen", return_value=fake_popen(b"")):
+        results = list(scan_chunk_with_xml(["10.0.0.1"], [22]))
+    assert results[0]["ip"] == "10.0.0.1"
+    assert "nmap bulk failed" in results[0]["error"]
+
+
+def test_bulk_runs_are_timed():
+    from services import instrumentation
+
+    ok = instrumentation.NMAP_RUN_SECONDS.labels(outcome="ok")
+    error = instrumentation.NMAP_RUN_SECONDS.labels(outcome="error")
+    before_ok, before_error = ok.count, error.count
+    with patch("net_discovery_nmap.subprocess.Popen", return_value=fake_popen(load_fixture())):
+        list(scan_chunk_with_xml(["192.168.1.10"], [22]))
+    with patch("net_discovery_nmap.subprocess.Popen", return_value=fake_popen(b"")):
+        list(scan_chunk_with_xml(["10.0.0.1"], [22]))
+    assert (ok.count, error.count) == (before_ok + 1, before_error + 1)
+
+
+def test_scan_hosts_bulk_chunks():
+    calls = []
+
+    def fake_chunk(hosts, ports, scan_args):
+        calls.append(list(hosts))
+        for ip in hosts:
+            yield {"ip": ip, "ports": []}
+
+    hosts = [f"10.0.0.{i}" for i in range(1, 11)]
+    with patch("net_discovery_nmap.scan_chunk_with_xml", side_effect=fake_chunk):
+        results = list(scan_hosts_bulk(hosts, [22], chunk_size=4, nmap_procs=2))
+
+    assert sorted(r["ip"] for r in results) == sorted(hosts)
+    assert sorted(len(c) for c in calls) == [2, 4, 4]
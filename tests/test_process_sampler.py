@@ -0,0 +1,158 @@
+import os
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from services import process_sampler as ps
+from services.metrics import publish_process_snapshot
+from services.process_sampler import ProcessSampler, _parse_stat
+
+PAGE = ps.PAGE_SIZE
+TCK = ps.CLK_TCK
+
+
+def stat_line(pid, name, ticks, start=100, rss_pages=10):
+    rest = ["S", "1"] + ["0"] * 9 + [str(ticks), "0"] + ["0"] * 6 + [str(start), "0", str(rss_pages)] + ["0"] * 20
+    return f"{pid} ({name}) {' '.join(rest)}\n"
+
+
+class FakeProc:
+    """Arborescence /proc minimale : stat et io par PID."""
+
+    def __init__(self, root):
+        self.root = root
+        (root / "stat").write_text("cpu 0 0 0 0\n")
+
+    def set(self, pid, name, cpu_s, rss_pages, io_bytes=0, start=100):
+        d = self.root / str(pid)
+        d.mkdir(exist_ok=True)
+        (d / "stat").write_text(stat_line(pid, name, int(cpu_s * TCK), start, rss_pages))
+        (d / "io").write_text(f"rchar: 0\nwchar: 0\nread_bytes: {io_bytes}\nwrite_bytes: 0\n")
+
+    def kill(self, pid):
+        for f in (self.root / str(pid)).iterdir():
+            f.unlink()
+        (self.root / str(pid)).rmdir()
+
+
+def test_parse_stat_with_tricky_comm():
+    name, cpu, start, rss = _parse_stat(stat_line(42, "a) (b c", 3 * TCK, start=7, rss_pages=5).encode())
+    assert (name, cpu, start, rss) == ("a) (b c", 3.0, 7, 5 * PAGE)
+
+
+@pytest.mark.parametrize("fd_budget", [1000, 0])
+def test_cpu_from_deltas_and_top_n_by_heap(tmp_path, fd_budget):
+    proc = FakeProc(tmp_path)
+    for pid in range(1, 21):
+        proc.set(pid, f"p{pid}", cpu_s=10, rss_pages=pid, io_bytes=0)
+    sampler = ProcessSampler(top_n=3, proc_root=str(tmp_path), fd_budget=fd_budget)
+    first = sampler.sample(now=0.0)
+    assert first["process_count"] == 20
+    assert all(r["cpu_percent"] == 0.0 for r in first["cpu"])
+    assert [r["pid"] for r in first["memory"]] == [20, 19, 18]
+
+    # p5 consomme 1,5 s de CPU en 5 s, p7 écrit 1 Mo
+    proc.set(5, "p5", cpu_s=11.5, rss_pages=5)
+    proc.set(7, "p7", cpu_s=10, rss_pages=7, io_bytes=2**20)
+    second = sampler.sample(now=5.0)
+    assert second["cpu"][0] == {"pid": 5, "name": "p5", "cpu_percent": 30.0, "rss_bytes": 5 * PAGE,
+                                "io_bytes_per_s": 0.0}
+    assert len(second["cpu"]) == 3
+    assert second["io"][0]["pid"] == 7
+    assert second["io"][0]["io_bytes_per_s"] == pytest.approx(2**20 / 5, abs=0.1)
+    sampler.stop()
+    assert sampler._open_fds == 0
+
+
+def test_dead_and_reused_pids(tmp_path):
+    proc = FakeProc(tmp_path)
+    proc.set(1, "init", cpu_s=1, rss_pages=1)
+    proc.set(2, "old", cpu_s=50, rss_pages=1, start=100)
+    # Sans descripteur persistant (un vrai /proc renverrait ESRCH sur celui d'un processus mort)
+    sampler = ProcessSampler(proc_root=str(tmp_path), fd_budget=0)
+    sampler.sample(now=0.0)
+    assert sampler._handles[2].stat_fd is None
+
+    # PID 2 réutilisé par un processus plus récent, au compteur CPU plus bas
+    proc.kill(2)
+    proc.set(2, "new", cpu_s=1, rss_pages=1, start=999)
+    sampler.sample(now=5.0)
+    assert 2 not in sampler._handles
+    third = sampler.sample(now=10.0)
+    assert {r["name"] for r in third["cpu"]} == {"init", "new"}
+    assert all(r["cpu_percent"] == 0.0 for r in third["cpu"])
+
+    proc.kill(1)
+    assert sampler.sample(now=15.0)["process_count"] == 1
+    sampler.stop()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="/proc Linux")
+def test_cpu_counts_every_thread():
+    sampler = ProcessSampler(fd_budget=1000)
+    sampler.sample(now=0.0)
+    handle = sampler._handles[os.getpid()]
+    before = handle.cpu_seconds
+
+    def spin():
+        end = time.process_time() + 0.3
+        while time.process_time() < end:
+            pass
+
+    worker = threading.Thread(target=spin)
+    worker.start()
+    worker.join()
+    sampler.sample(now=1.0)
+    # CPU du thread secondaire compris (schedstat ne compterait que le thread principal)
+    assert handle.stat_fd is not None and handle.cpu_seconds - before >= 0.2
+    sampler.stop()
+
+
+def test_psutil_fallback_keeps_process_handles():
+    sampler = ProcessSampler(top_n=5, use_procfs=False)
+    sampler.sample()
+    handle = sampler._handles[os.getpid()]
+    assert handle.proc is not None
+    sum(i * i for i in range(200000))
+    sampler.sample()
+    assert sampler._handles[os.getpid()] is handle
+    assert handle.cpu_seconds is not None
+
+
+def test_publish_union_of_tops():
+    row = {"pid": 5, "name": "p5", "cpu_percent": 30.0, "rss_bytes": 4096}
+    twin = {"pid": 6, "name": "p5", "cpu_percent": 40.0, "rss_bytes": 8192}
+    other = {"pid": 7, "name": "sshd", "cpu_percent": 0.0, "rss_bytes": 1024}
+    snapshot = {"timestamp": 100.0, "cpu": [row], "memory": [row, twin, other], "io": []}
+    with patch("services.metrics.write_metrics") as write, patch("services.metrics.broadcaster") as bc:
+        publish_process_snapshot(snapshot)
+    # Même nom : un seul point agrégé, horodatage du snapshot
+    assert write.call_count == 2
+    measurement, fields, tags, ts = write.call_args_list[0].args
+    assert measurement == "process_metrics" and ts == 100.0
+    assert fields == {"pid": 6, "cpu_percent": 70.0, "rss_bytes": 12288, "processes": 2}
+    # pid en champ : cardinalité bornée par host/name
+    assert tags == {"host": tags["host"], "name": "p5"}
+    assert write.call_args_list[1].args[1]["processes"] == 1
+    assert bc.publish.call_count == 3
+    bc.flush.assert_called_once()
+
+
+def test_processes_endpoint():
+    import app as myapp
+
+    snapshot = {"timestamp": 1.0, "process_count": 1, "cpu": [{"pid": 1, "name": "init", "cpu_percent": 0.0,
+                                                                "rss_bytes": 0}], "memory": [], "io": []}
+    with myapp.app.test_client() as client, patch("app.get_process_snapshot", return_value=snapshot):
+        client.post("/login", data={"username": "admin", "password": "admin123"})
+        assert client.get("/api/system/processes").get_json() == snapshot
+
+
+def test_default_fd_budget_leaves_rlimit_alone():
+    before = ps.resource.getrlimit(ps.resource.RLIMIT_NOFILE)
+    with patch.object(ps, "PROCESS_RAISE_NOFILE", False):
+        assert 0 < ps._default_fd_budget() <= ps.PROCESS_FD_BUDGET
+    assert ps.resource.getrlimit(ps.resource.RLIMIT_NOFILE) == before
@@ -0,0 +1,115 @@
+import threading
+import time
+from unittest.mock import patch
+
+from services.scan_diff import compare_ports, fast_scan_args, iter_diff_scan
+from services.scan_state import ScanStateStore
+
+
+def test_fast_scan_args_drops_version_detection():
+    assert fast_scan_args("-sT -sV --version-light -T4") == "-sT -T4"
+    assert fast_scan_args("-sV") == "-sT"
+
+
+def test_compare_ports_detects_state_changes():
+    known = {
+        (22, "tcp"): {"state": "open", "fingerprint_at": 100.0},
+        (80, "tcp"): {"state": "open", "fingerprint_at": 100.0},
+    }
+    ports = [
+        {"port": 22, "protocol": "tcp", "state": "open"},
+        {"port": 443, "protocol": "tcp", "state": "open"},
+        {"port": 8080, "protocol": "tcp", "state": "closed"},
+    ]
+    changes, to_store, probe = compare_ports(known, ports, now=200.0, fingerprint_ttl=1000)
+    assert {(c["port"], c["change"]) for c in changes} == {(443, "new"), (80, "closed")}
+    assert probe == [443]
+    assert 8080 not in [p["port"] for p in to_store]
+
+    # Empreinte périmée : 22 est re-sondé sans être signalé comme changement
+    _, _, probe = compare_ports(known, ports, now=5000.0, fingerprint_ttl=1000)
+    assert probe == [22, 443]
+
+
+def run_diff(store, fast_results, probe_results=None, network="10.0.0.0/24"):
+    probe_calls = []
+
+    def fake_probe(ip, ports, scan_args):
+        probe_calls.append((ip, list(ports)))
+        return (probe_results or {}).get(ip, {"ip": ip, "ports": []})
+
+    with patch("services.scan_diff.iter_scan_hosts", return_value=iter(fast_results)), \
+         patch("services.scan_diff.scan_host", side_effect=fake_probe):
+        results = list(iter_diff_scan([r["ip"] for r in fast_results], [22, 80], store, network))
+    return results, probe_calls
+
+
+def test_diff_scan_only_probes_changes():
+    store = ScanStateStore(":memory:")
+    fast = [{"ip": "10.0.0.1", "ports": [{"port": 22, "protocol": "tcp", "state": "open", "service": "ssh"}]}]
+    probed = {"10.0.0.1": {"ip": "10.0.0.1", "ports": [
+        {"port": 22, "protocol": "tcp", "state": "open", "service": "ssh", "product": "OpenSSH", "version": "9.2"}
+    ]}}
+
+    results, probes = run_diff(store, fast, probed)
+    assert probes == [("10.0.0.1", [22])]
+    assert [c["change"] for c in results[0]["changes"]] == ["host_up", "new"]
+    assert results[0]["ports"][0]["product"] == "OpenSSH"
+
+    # Réseau stable : aucune sonde -sV, aucun changement
+    results, probes = run_diff(store, fast, probed)
+    assert probes == []
+    assert results[0]["changes"] == []
+
+    # Port fermé + hôte disparu
+    store.mark_host("10.0.0.9", "up")
+    fast_closed = [{"ip": "10.0.0.1", "ports": [{"port": 22, "protocol": "tcp", "state": "closed"}]}]
+    results, probes = run_diff(store, fast_closed)
+    assert probes == []
+    by_ip = {r["ip"]: r for r in results}
+    assert by_ip["10.0.0.1"]["changes"][0]["change"] == "closed"
+    assert by_ip["10.0.0.9"]["changes"] == [{"change": "host_down"}]
+    assert store.get_host("10.0.0.9")["status"] == "down"
+
+
+def test_diff_scan_accepts_hostname_and_range_targets():
+    store = ScanStateStore(":memory:")
+    for ip in ("10.0.0.9", "10.0.0.30", "192.168.1.7"):
+        store.mark_host(ip, "up")
+    fast = [{"ip": "10.0.0.1", "ports": []}]
+    # Plage nmap : seul l'hôte de la plage absent du scan est déclaré tombé
+    results, _ = run_diff(store, fast, network="10.0.0.1-20")
+    assert [r["ip"] for r in results if r["changes"] == [{"change": "host_down"}]] == ["10.0.0.9"]
+    # Nom d'hôte : aucun hôte connu n'est déclaré tombé, et le scan ne lève pas
+    results, _ = run_diff(store, [{"ip": "192.168.1.7", "ports": []}], network="nas.local")
+    assert [r["ip"] for r in results] == ["192.168.1.7"]
+    assert store.get_host("10.0.0.30")["status"] == "up"
+
+
+def test_diff_scan_yields_probes_during_fast_pass():
+    store = ScanStateStore(":memory:")
+    probed = threading.Event()
+    released = threading.Event()
+    running = []
+
+    def fast_pass():
+        yield {"ip": "10.0.0.1", "ports": [{"port": 22, "protocol": "tcp", "state": "open"}]}
+        probed.wait(5)
+        time.sleep(0.05)
+        yield {"ip": "10.0.0.2", "ports": []}
+        assert released.wait(5), "sonde retenue jusqu'à la fin de la passe rapide"
+
+    def fake_probe(ip, ports, scan_args):
+        running.append(ip)
+        probed.set()
+        return {"ip": ip, "ports": [{"port": 22, "protocol": "tcp", "state": "open", "product": "OpenSSH"}]}
+
+    with patch("services.scan_diff.iter_scan_hosts", return_value=fast_pass()), \
+         patch("services.scan_diff.scan_host", side_effect=fake_probe):
+        results = iter_diff_scan(["10.0.0.1", "10.0.0.2"], [22], store, parallel_hosts=1)
+        first, second = next(results), next(results)
+        # La sonde de 10.0.0.1 sort avant la fin de la passe rapide
+        assert {first["ip"], second["ip"]} == {"10.0.0.1", "10.0.0.2"}
+        assert next(r for r in (first, second) if r["ip"] == "10.0.0.1")["ports"][0]["product"] == "OpenSSH"
+        released.set()
+        assert list(results) == []
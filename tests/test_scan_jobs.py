@@ -0,0 +1,144 @@
+import subprocess
+import sys
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from net_discovery_nmap import CancelToken, ScanCancelled, _run_nmap
+from services.scan_jobs import ScanJobManager
+
+
+class FakeRunner:
+    """Runner bloquant jusqu'à `release` ou annulation, qui diffuse un hôte."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    def __call__(self, job_id, cancel_token, on_host, **params):
+        self.calls.append((job_id, params))
+        on_host({"ip": "10.0.0.1", "ports": []})
+        while not self.release.is_set() and not cancel_token.cancelled:
+            time.sleep(0.01)
+        return {"success": True, "job_id": job_id, "summary": {"hosts_scanned": 1}}
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def params(network="10.0.0.0/24", parallel=4):
+    return {"network": network, "ports": [22, 80], "parallel_hosts": parallel, "scan_args": "-sT",
+            "mode": "full", "engine": "nmap", "engine_opts": {"timeout": 1.0}}
+
+
+def test_identical_requests_are_deduplicated():
+    runner = FakeRunner()
+    manager = ScanJobManager(runner, worker_budget=8)
+    first, created = manager.submit(params())
+    second, created_again = manager.submit(params())
+    assert created and not created_again
+    assert second is first
+
+    other, created_other = manager.submit(params(network="10.0.1.0/24"))
+    assert created_other and other is not first
+    runner.release.set()
+
+
+def test_worker_budget_queues_jobs_fifo():
+    runner = FakeRunner()
+    manager = ScanJobManager(runner, worker_budget=8)
+    a, _ = manager.submit(params("10.0.0.0/24", parallel=6))
+    b, _ = manager.submit(params("10.0.1.0/24", parallel=4))
+    c, _ = manager.submit(params("10.0.2.0/24", parallel=2))
+
+    # b ne tient pas dans le budget restant ; c attend derrière lui
+    assert a.status == "running"
+    assert b.status == "queued" and c.status == "queued"
+    assert manager.stats()["workers_in_use"] == 6
+
+    runner.release.set()
+    assert wait_for(lambda: c.status == "done")
+    assert a.status == b.status == "done"
+    assert manager.stats()["workers_in_use"] == 0
+    assert runner.calls[0][1]["parallel_hosts"] == 6
+
+
+def test_parallel_is_clamped_to_budget():
+    runner = FakeRunner()
+    manager = ScanJobManager(runner, worker_budget=4)
+    job, _ = manager.submit(params(parallel=64))
+    assert job.workers == 4
+    runner.release.set()
+
+
+def test_partial_results_and_cancel():
+    runner = FakeRunner()
+    manager = ScanJobManager(runner, worker_budget=4)
+    running, _ = manager.submit(params("10.0.0.0/24", parallel=4))
+    queued, _ = manager.submit(params("10.0.1.0/24", parallel=4))
+
+    assert wait_for(lambda: running.scanned == 1)
+    data = running.to_dict()
+    assert data["status"] == "running"
+    assert data["results"] == [{"ip": "10.0.0.1", "ports": []}]
+
+    assert manager.cancel(queued.id).status == "cancelled"
+    manager.cancel(running.id)
+    assert wait_for(lambda: running.status == "cancelled")
+    assert len(runner.calls) == 1
+
+    # Un job terminé ne bloque plus la déduplication
+    again, created = manager.submit(params("10.0.0.0/24", parallel=4))
+    assert created and again is not running
+    runner.release.set()
+
+
+def test_runner_failure_marks_job_failed():
+    def failing(**kwargs):
+        raise RuntimeError("nmap absent")
+
+    manager = ScanJobManager(failing, worker_budget=4)
+    job, _ = manager.submit(params())
+    assert wait_for(lambda: job.status == "failed")
+    assert "nmap absent" in job.error
+    assert manager.stats()["workers_in_use"] == 0
+
+
+def test_cancel_token_kills_registered_process():
+    token = CancelToken()
+    cmd = [sys.executable, "-c", "import time; time.sleep(30)"]
+    threading.Timer(0.2, token.cancel).start()
+    start = time.time()
+    with pytest.raises(ScanCancelled):
+        _run_nmap(cmd, token)
+    assert time.time() - start < 5
+
+
+def test_run_nmap_without_token_uses_subprocess_run():
+    proc = _run_nmap([sys.executable, "-c", "print('ok')"])
+    assert proc.stdout.strip() == "ok"
+    with pytest.raises(subprocess.CalledProcessError):
+        _run_nmap([sys.executable, "-c", "import sys; sys.exit(3)"], CancelToken())
+
+
+def test_async_concurrency_is_clamped_server_side():
+    import app as myapp
+
+    job = SimpleNamespace(id="j1", room="scan/j1", status="queued")
+    with myapp.app.test_client() as client, patch.object(myapp.scan_jobs, "submit", return_value=(job, True)) as submit:
+        client.post("/login", data={"username": "admin", "password": "admin123"})
+        resp = client.post("/api/scan/network", json={"network": "10.0.0.0/24", "engine": "async",
+                                                      "concurrency": 10 ** 6})
+        assert resp.status_code == 202
+        assert submit.call_args.args[0]["engine_opts"]["concurrency"] == myapp.SCAN_ASYNC_MAX_CONCURRENCY
+        client.post("/api/scan/network", json={"network": "10.0.0.0/24", "engine": "async", "concurrency": 16})
+        assert submit.call_args.args[0]["engine_opts"]["concurrency"] == 16
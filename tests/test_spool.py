@@ -0,0 +1,120 @@
+import os
+import time
+
+from services.spool import Spool
+from services.write_pipeline import BatchWriter
+
+
+class FlakyWriteApi:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.records = []
+
+    def write(self, bucket, record):
+        if self.fail:
+            raise ConnectionError("influx down")
+        self.records.append(record)
+
+    @property
+    def lines(self):
+        return [line for r in self.records for line in r.split("\n")]
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_append_rotate_read_commit_and_resume(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=100, fsync=False)
+    for i in range(10):
+        spool.append(f"m v={i}i {i}000000000")
+    assert spool.stats()["spool_segments"] > 1
+
+    lines, pos = spool.read(4)
+    assert lines == [f"m v={i}i {i}000000000" for i in range(4)]
+    spool.commit(pos)
+    assert spool.oldest_timestamp() == 4.0
+
+    # Redémarrage : la relecture reprend au dernier commit
+    reopened = Spool(str(tmp_path), segment_bytes=100, fsync=False)
+    lines, pos = reopened.read(100)
+    assert lines == [f"m v={i}i {i}000000000" for i in range(4, 10)]
+    reopened.commit(pos)
+    assert reopened.pending_bytes() == 0
+    assert reopened.read(10) == ([], pos)
+    assert reopened.stats()["spool_segments"] == 1
+
+
+def test_torn_tail_is_repaired(tmp_path):
+    spool = Spool(str(tmp_path), fsync=False)
+    spool.append("m v=1i 1\nm v=2i 2")
+    with open(os.path.join(str(tmp_path), "segment-000000000000.lp"), "ab") as f:
+        f.write(b"m v=3i")  # écriture interrompue par un crash
+    lines, _ = Spool(str(tmp_path), fsync=False).read(10)
+    assert lines == ["m v=1i 1", "m v=2i 2"]
+
+
+def test_cap_drops_oldest_segments(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=50, max_bytes=100, fsync=False)
+    for i in range(20):
+        spool.append(f"m v={i}i {i}")
+    stats = spool.stats()
+    assert stats["spool_bytes"] <= 100
+    assert stats["spool_dropped_bytes"] > 0
+    lines, _ = spool.read(100)
+    assert lines[-1] == "m v=19i 19"
+    assert lines[0] != "m v=0i 0"
+
+
+def test_outage_is_spooled_then_replayed(tmp_path):
+    api = FlakyWriteApi(fail=True)
+    spool = Spool(str(tmp_path), fsync=False)
+    writer = BatchWriter(api, "bucket", batch_size=10, flush_interval=0.05, spool=spool, replay_batch=25)
+    writer.start()
+    try:
+        for i in range(50):
+            writer.submit("m", {"v": i}, ts_ns=i)
+        assert wait_for(lambda: writer.spooled_points == 50)
+        assert writer.stats()["spool_pending_bytes"] > 0
+
+        api.fail = False
+        writer.submit("m", {"v": 99}, ts_ns=99)
+        assert wait_for(lambda: writer.replayed_points == 50)
+    finally:
+        writer.stop()
+
+    assert sorted(int(line.rsplit(" ", 1)[1]) for line in api.lines) == list(range(50)) + [99]
+    stats = writer.stats()
+    assert stats["spool_pending_bytes"] == 0
+    assert stats["spool_oldest_unsent_age_s"] == 0.0
+    # Gros lots : 50 points rejoués en 2 écritures, plus le point live
+    assert len(api.records) == 3
+
+
+def test_replay_is_rate_limited(tmp_path):
+    spool = Spool(str(tmp_path), fsync=False)
+    spool.append("\n".join(f"m v={i}i {i}" for i in range(300)))
+    api = FlakyWriteApi()
+    writer = BatchWriter(api, "bucket", flush_interval=0.05, spool=spool, replay_batch=100, replay_rate=1000)
+    start = time.perf_counter()
+    writer.start()
+    try:
+        assert wait_for(lambda: writer.replayed_points == 300)
+        elapsed = time.perf_counter() - start
+    finally:
+        writer.stop()
+    # 3 lots de 100 à 1000 points/s : deux pauses de 0,1 s avant le dernier lot
+    assert elapsed >= 0.18
+    assert len(api.records) == 3
+
+
+def test_offline_writer_spools_without_influx(tmp_path):
+    spool = Spool(str(tmp_path), fsync=False)
+    writer = BatchWriter(None, "bucket", spool=spool)
+    writer.submit("system_metrics", {"cpu_percent": 12.5}, {"host": "a"}, ts_ns=5)
+    writer.flush()
+    assert spool.read(10)[0] == ["system_metrics,host=a cpu_percent=12.5 5"]
+    assert writer.stats()["spooled_points"] == 1
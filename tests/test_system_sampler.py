@@ -0,0 +1,90 @@
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from services.system_sampler import SystemSampler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_psutil():
+    counters = {"sent": 1000, "recv": 2000, "read": 0, "write": 0}
+    with patch("services.system_sampler.psutil") as ps:
+        ps.cpu_percent.side_effect = lambda interval=None, percpu=False: [10.0, 30.0] if percpu else 20.0
+        ps.virtual_memory.return_value = SimpleNamespace(percent=40.0, used=2 * 1024**3)
+        ps.disk_usage.return_value = SimpleNamespace(percent=50.0, used=1024**3)
+        ps.net_io_counters.side_effect = lambda: SimpleNamespace(bytes_sent=counters["sent"], bytes_recv=counters["recv"])
+        ps.disk_io_counters.side_effect = lambda: SimpleNamespace(read_bytes=counters["read"], write_bytes=counters["write"])
+        yield ps, counters
+
+
+def test_rates_from_counter_deltas(fake_psutil):
+    ps, counters = fake_psutil
+    clock = FakeClock()
+    sampler = SystemSampler(interval=5)
+    with patch("services.system_sampler.time.monotonic", clock):
+        first = sampler.sample()
+        counters.update(sent=6000, recv=2000 + 10 * 1024, read=500)
+        clock.now += 5
+        second = sampler.sample()
+
+    assert first["net_sent_bytes_per_s"] == 0.0
+    assert second["net_sent_bytes_per_s"] == 1000.0
+    assert second["net_recv_bytes_per_s"] == 2048.0
+    assert second["disk_read_bytes_per_s"] == 100.0
+    assert second["net_bytes_sent"] == 6000
+    assert second["cpu_percent"] == 20.0
+    assert second["cpu0_percent"] == 10.0 and second["cpu1_percent"] == 30.0
+    assert second["cpu_count"] == 2
+    # Jamais d'appel bloquant
+    for call in ps.cpu_percent.call_args_list:
+        assert call.kwargs.get("interval") is None
+
+
+def test_counter_reset_gives_zero_rate(fake_psutil):
+    _, counters = fake_psutil
+    clock = FakeClock()
+    sampler = SystemSampler()
+    with patch("services.system_sampler.time.monotonic", clock):
+        sampler.sample()
+        counters["sent"] = 10
+        clock.now += 1
+        assert sampler.sample()["net_sent_bytes_per_s"] == 0.0
+
+
+def test_snapshot_is_immutable_and_shared(fake_psutil):
+    sampler = SystemSampler()
+    assert sampler.snapshot() is None
+    received = []
+    sampler.subscribe(received.append)
+    snap = sampler.sample()
+    sampler.publish(snap)
+
+    assert sampler.snapshot() is snap
+    assert received == [snap]
+    with pytest.raises(TypeError):
+        snap["cpu_percent"] = 99
+
+
+def test_run_publishes_at_cadence(fake_psutil):
+    sampler = SystemSampler(interval=0.1)
+    got = threading.Event()
+    sampler.subscribe(lambda snap: got.set())
+    t = threading.Thread(target=sampler.run, daemon=True)
+    t.start()
+    try:
+        assert got.wait(2)
+        assert sampler.snapshot()["memory_percent"] == 40.0
+    finally:
+        sampler.stop()
+        t.join(2)
+    assert not t.is_alive()
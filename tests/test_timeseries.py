@@ -0,0 +1,92 @@
+import pytest
+
+from services.timeseries import RingSeries, TimeSeriesStore
+
+
+def test_ring_series_wraps_and_keeps_order():
+    s = RingSeries(4)
+    for ts in range(10):
+        s.append(float(ts), ts * 10.0)
+    assert len(s) == 4
+    assert list(s.range(0, 100)) == [(6.0, 60.0), (7.0, 70.0), (8.0, 80.0), (9.0, 90.0)]
+    assert s.bisect_left(7.5) == 2
+    assert not s.append(1.0, 0.0)
+
+
+@pytest.mark.parametrize("agg,expected", [
+    ("avg", [[0.0, 1.5], [10.0, 11.5]]),
+    ("min", [[0.0, 0.0], [10.0, 10.0]]),
+    ("max", [[0.0, 3.0], [10.0, 13.0]]),
+    ("last", [[0.0, 3.0], [10.0, 13.0]]),
+])
+def test_ring_series_downsampling(agg, expected):
+    s = RingSeries(100)
+    for ts in (0, 1, 2, 3, 10, 11, 12, 13):
+        s.append(float(ts), float(ts))
+    assert s.query(0, 20, step=10, agg=agg) == expected
+
+
+def test_store_filters_by_field_and_tags():
+    store = TimeSeriesStore(retention_seconds=100, resolution_seconds=1)
+    store.record("system_metrics", {"cpu_percent": 10, "memory_percent": 50, "label": "x"}, {"host": "a"}, ts=1)
+    store.record("system_metrics", {"cpu_percent": 20}, {"host": "b"}, ts=2)
+
+    series = store.query("system_metrics", fields=["cpu_percent"], tags={"host": "b"}, start=0, end=10)
+    assert series == [{"measurement": "system_metrics", "field": "cpu_percent",
+                       "tags": {"host": "b"}, "points": [[2.0, 20.0]]}]
+    assert len(store.query("system_metrics", start=0, end=10)) == 3
+
+    with pytest.raises(ValueError):
+        store.query("system_metrics", agg="median")
+
+
+def test_history_endpoint(monkeypatch):
+    import app as myapp
+
+    store = TimeSeriesStore(retention_seconds=100, resolution_seconds=1)
+    store.record("system_metrics", {"cpu_percent": 42.0}, {"host": "h"}, ts=1000)
+    monkeypatch.setattr(myapp, "history_store", store)
+
+    myapp.app.config["TESTING"] = True
+    with myapp.app.test_client() as client:
+        client.post("/login", data={"username": "admin", "password": "admin123"})
+        resp = client.get("/api/metrics/history?fields=cpu_percent&range=100&end=1050&step=10&agg=max")
+        assert resp.status_code == 200
+        assert resp.get_json()["series"][0]["points"] == [[1000.0, 42.0]]
+
+        assert client.get("/api/metrics/history?agg=bogus").status_code == 400
+
+
+def test_fast_writes_are_merged_per_resolution_bucket():
+    store = TimeSeriesStore(retention_seconds=100, resolution_seconds=5)
+    # 1 échantillon par seconde pendant la rétention complète : 20 points de 5 s, pas 100
+    for ts in range(1000, 1100):
+        store.record("system_metrics", {"cpu_percent": ts % 5}, {"host": "a"}, ts=ts)
+    points = store.query("system_metrics", start=0, end=2000)[0]["points"]
+    assert len(points) == 20
+    assert points[0] == [1000.0, 2.0] and points[-1][0] == 1095.0
+
+
+def test_series_arrays_grow_on_demand():
+    s = RingSeries(4320, resolution=5)
+    for ts in range(0, 15, 5):
+        s.append(float(ts), 1.0)
+    assert s.allocated == 64
+    for ts in range(15, 65 * 5, 5):
+        s.append(float(ts), 1.0)
+    assert len(s) == 65 and s.allocated == 128
+
+
+def test_idle_series_are_evicted_to_make_room():
+    store = TimeSeriesStore(retention_seconds=100, resolution_seconds=1, max_series=2)
+    store.record("process_metrics", {"cpu_percent": 1}, {"name": "old"}, ts=0)
+    store.record("system_metrics", {"cpu_percent": 1}, {"host": "a"}, ts=50)
+    store.record("docker_container", {"cpu_percent": 1}, {"name": "c1"}, ts=60)
+    assert store.stats()["dropped_series"] == 1
+
+    # "old" n'a plus de point dans la fenêtre de rétention : retirée au profit de la nouvelle série
+    store.record("system_metrics", {"cpu_percent": 2}, {"host": "a"}, ts=120)
+    store.record("docker_container", {"cpu_percent": 1}, {"name": "c1"}, ts=121)
+    assert store.query("process_metrics", start=0, end=200) == []
+    assert store.query("docker_container", start=0, end=200)[0]["points"] == [[121.0, 1.0]]
+    assert store.stats()["evicted_series"] == 1
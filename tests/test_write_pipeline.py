@@ -0,0 +1,88 @@
+import time
+from unittest.mock import patch
+
+from services import metrics
+from services.write_pipeline import BatchWriter, encode_line
+
+
+class FakeWriteApi:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def write(self, bucket, record):
+        if self.fail:
+            raise ConnectionError("influx down")
+        self.calls.append((bucket, record))
+
+
+def test_encode_line_escaping_and_types():
+    line = encode_line(
+        "system metrics",
+        {"cpu": 12.5, "count": 3, "up": True, "name": 'a "b"'},
+        {"host": "srv 1", "zone": "a,b"},
+        ts_ns=123,
+    )
+    assert line == 'system\\ metrics,host=srv\\ 1,zone=a\\,b cpu=12.5,count=3i,up=true,name="a \\"b\\"" 123'
+
+
+def test_encode_line_without_fields_is_skipped():
+    assert encode_line("m", {"x": None}) is None
+
+
+def test_flush_on_batch_size():
+    api = FakeWriteApi()
+    writer = BatchWriter(api, "bucket", batch_size=3, flush_interval=60)
+    writer.start()
+    try:
+        for i in range(3):
+            writer.submit("m", {"v": i})
+        deadline = time.time() + 2
+        while not api.calls and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(api.calls) == 1
+        assert api.calls[0][1].count("\n") == 2
+        assert writer.stats()["written_points"] == 3
+    finally:
+        writer.stop()
+
+
+def test_flush_on_interval():
+    api = FakeWriteApi()
+    writer = BatchWriter(api, "bucket", batch_size=100, flush_interval=0.05)
+    writer.start()
+    try:
+        writer.submit("m", {"v": 1.0})
+        deadline = time.time() + 2
+        while not api.calls and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(api.calls) == 1
+    finally:
+        writer.stop()
+
+
+def test_bounded_queue_drops_points():
+    writer = BatchWriter(FakeWriteApi(), "bucket", batch_size=2, max_queue=2)
+    assert writer.submit("m", {"v": 1})
+    assert writer.submit("m", {"v": 2})
+    assert not writer.submit("m", {"v": 3})
+    stats = writer.stats()
+    assert stats["queue_depth"] == 2
+    assert stats["dropped_points"] == 1
+
+
+def test_failed_batch_is_counted():
+    writer = BatchWriter(FakeWriteApi(fail=True), "bucket", batch_size=10)
+    writer.submit("m", {"v": 1})
+    with patch("builtins.print"):
+        assert writer.flush() == 0
+    assert writer.stats()["failed_batches"] == 1
+
+
+def test_write_metrics_enqueues_when_initialised():
+    api = FakeWriteApi()
+    with patch("services.metrics.batch_writer", BatchWriter(api, "bucket")) as writer:
+        metrics.write_metrics("m", {"v": 1}, {"host": "h"})
+        assert writer.queue_depth == 1
+        writer.flush()
+    assert api.calls[0][1].startswith("m,host=h v=1i ")